@@ -16,7 +16,10 @@ from appium.options.android import UiAutomator2Options
 
 from common.utils import resource_path, get_today_count, refresh_power, start_appium, stop_appium, \
     calculate_activity_earliest_timezone_value, change_time_zone, recover_time_zone, week_day_kv, \
-    activities_start_kv, run_adb_command, TIMEZONE_KEYS, g_original_timezone, handle_timezone_key
+    activities_start_kv, run_adb_command, TIMEZONE_KEYS, g_original_timezone, handle_timezone_key, \
+    log_template_timings
+from common.AdbShellSession import close_all_sessions
+from common.DeviceSessionManager import DeviceSessionManager
 from scripts.base_script import ScriptBase
 
 
@@ -41,6 +44,9 @@ class App:
 
     ports_to_check = [16384, 62001]
 
+    # 多设备同时运行时，每台设备的 UiAutomator2 服务需要各自的本地转发端口
+    system_port_base = 8200
+
     def __init__(self, root):
         self.root = root
         self.root.title("Hanbly猫战工具集 ver2.1.2")
@@ -59,6 +65,10 @@ class App:
         self.common_option_vars = {}
         self.specific_option_vars = {}
 
+        self.session_manager = DeviceSessionManager(driver_factory=self.create_driver_for_device,
+                                                    log_callback=self.log_message)
+        self.system_ports = {}
+
         self.config_dir = "configs"
         self.ensure_config_dir()
 
@@ -82,6 +92,8 @@ class App:
             return {}
 
         self.log_message("正在准备ADB环境...")
+        # 重启 ADB 服务会断开所有常驻 shell 会话，先主动关闭
+        close_all_sessions()
         try:
             run_adb_command(self.adb_path, None, "kill-server")
             run_adb_command(self.adb_path, None, "start-server")
@@ -209,6 +221,7 @@ class App:
         functions_menu.add_command(label="单次刷新统率力", command=self.execute_refresh_power)
         functions_menu.add_command(label="查看活动时间段", command=self.show_activity_schedule_window)
         functions_menu.add_command(label="修改当前时区", command=self.show_change_timezone_window)
+        functions_menu.add_command(label="多设备运行", command=self.show_multi_device_window)
 
         config_menu = Menu(menubar, tearoff=0)
         menubar.add_cascade(label="配置选项", menu=config_menu)
@@ -440,6 +453,7 @@ class App:
             script_instance = script_class(self.driver, self.stop_event, self.log_message)
             status = script_instance.run(options)
             self.log_message(f"脚本执行完毕，状态: {status}")
+            log_template_timings(self.log_message, limit=5)
         except Exception as e:
             self.log_message(f"线程发生致命错误: {e}")
             import traceback
@@ -512,6 +526,85 @@ class App:
         close_button = ttk.Button(count_window, text="关闭", command=count_window.destroy)
         close_button.pack(pady=10)
 
+    def create_driver_for_device(self, device_serial, options):
+        """多设备运行时为单台设备创建 Appium driver（在该设备的会话线程中调用）。"""
+        caps = self.capabilities.copy()
+        caps["deviceName"] = device_serial
+        caps["appium:udid"] = device_serial
+        caps["platformVersion"] = self.running_emulators.get(device_serial, {}).get("version")
+        if device_serial not in self.system_ports:
+            self.system_ports[device_serial] = self.system_port_base + len(self.system_ports)
+        caps["appium:systemPort"] = self.system_ports[device_serial]
+        server = options.get('server')
+        if server == '台服':
+            caps['packageName'] = "jp.co.ponos.battlecatstw"
+        elif server == '日服':
+            caps['packageName'] = "jp.co.ponos.battlecats"
+        appium_options = UiAutomator2Options().load_capabilities(caps)
+        return webdriver.Remote("http://localhost:4723", options=appium_options)
+
+    def show_multi_device_window(self):
+        if not self.running_emulators:
+            messagebox.showinfo("提示", "未检测到正在运行的模拟器。")
+            return
+        if not self.current_script_class:
+            messagebox.showinfo("提示", "请先在下拉列表中选择一个脚本。")
+            return
+        multi_window = Toplevel(self.root)
+        multi_window.title("多设备运行")
+        multi_window.geometry("760x420")
+        multi_window.transient(self.root)
+
+        device_frame = ttk.LabelFrame(multi_window, text="选择设备", padding=10)
+        device_frame.pack(fill=tk.X, padx=10, pady=5)
+        device_vars = {}
+        for serial, info in self.running_emulators.items():
+            var = tk.BooleanVar(value=True)
+            ttk.Checkbutton(device_frame, text=f"{info['friendly_name']} ({serial})", variable=var).pack(anchor=tk.W)
+            device_vars[serial] = var
+
+        def selected_serials():
+            return [serial for serial, var in device_vars.items() if var.get()]
+
+        def handle_start():
+            serials = selected_serials()
+            if not serials:
+                messagebox.showerror("错误", "请至少选择一台设备。", parent=multi_window)
+                return
+            script_name = self.current_script_class.get_name()
+            options = self.script_settings.get(script_name, {}).copy()
+            options['adb_path'] = self.adb_path
+            self.log_message(f"在 {len(serials)} 台设备上启动脚本: {script_name}")
+            self.session_manager.start(serials, self.current_script_class, options)
+
+        button_frame = ttk.Frame(multi_window)
+        button_frame.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Button(button_frame, text="在选中设备上运行当前脚本", command=handle_start).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="停止选中设备",
+                   command=lambda: self.session_manager.stop(selected_serials())).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="全部停止", command=self.session_manager.stop).pack(side=tk.LEFT, padx=5)
+
+        columns = ("设备", "脚本", "状态", "已运行", "完成轮数", "最近日志")
+        status_table = ttk.Treeview(multi_window, columns=columns, show="headings", height=8)
+        for column, width in zip(columns, (120, 100, 70, 70, 70, 300)):
+            status_table.heading(column, text=column)
+            status_table.column(column, width=width, anchor=tk.W)
+        status_table.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        def refresh_status():
+            if not multi_window.winfo_exists():
+                return
+            status_table.delete(*status_table.get_children())
+            for serial, script_name, status, elapsed, rounds, last_message in self.session_manager.snapshot():
+                friendly_name = self.running_emulators.get(serial, {}).get("friendly_name", serial)
+                minutes, seconds = divmod(int(elapsed), 60)
+                status_table.insert("", tk.END, values=(friendly_name, script_name, status,
+                                                        f"{minutes // 60:02d}:{minutes % 60:02d}:{seconds:02d}",
+                                                        rounds, last_message))
+            multi_window.after(1000, refresh_status)
+
+        refresh_status()
+
     def show_change_timezone_window(self):
         if not self.device_serial:
             messagebox.showerror("错误", "未选择设备，无法执行时区操作。")
@@ -885,6 +978,9 @@ class App:
         for script_name, settings in self.script_settings.items():
             self.save_settings_to_file(script_name, settings)
         self.log_message("配置保存完毕。")
+        self.session_manager.stop()
+        self.session_manager.join(timeout=5)
+        close_all_sessions()
         self.root.destroy()
 
 
@@ -0,0 +1,77 @@
+# benchmarks/bench_detection_pool.py
+"""
+对比多台设备同时识别时，本进程线程匹配与 DetectionPool 多进程匹配的吞吐（每秒匹配次数）。
+每台模拟设备一个线程，循环在同一帧上用 match_many 评估一组模板；为了测到真实的匹配开销，关闭了 ROI 结果缓存与位置记忆。
+画面取 debug_images/ 中的第一张整帧截图，没有时用随机噪声画面。
+用法: python benchmarks/bench_detection_pool.py [服务器目录, 默认 images_tw] [每档秒数, 默认 3] [设备数列表, 默认 1,2,4,8]
+"""
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from bench_pyramid import load_frames  # noqa: E402
+from common.DetectionPool import DetectionPool  # noqa: E402
+from common.utils import ADB_COLOR_MODE, g_matching_engine, g_template_store, preload_templates  # noqa: E402
+
+ENGINE_OPTIONS = {'debug': False, 'skip_unchanged': False, 'location_memory': False}
+
+
+def pick_templates(image_folder):
+    names = sorted(os.path.splitext(f)[0] for f in os.listdir(os.path.join(ROOT, image_folder))
+                   if f.lower().endswith('.png'))
+    return [name for name in names if g_template_store.get(image_folder, name) is not None]
+
+
+def run_devices(engines, frame, templates, image_folder, seconds):
+    """每个 engine 一个线程（一台模拟设备），返回总匹配次数/秒。"""
+    counts = [0] * len(engines)
+    deadline = time.perf_counter() + seconds
+
+    def worker(index, engine):
+        while time.perf_counter() < deadline:
+            engine.match_many(frame, templates, image_folder, 0.8, color_mode=ADB_COLOR_MODE)
+            counts[index] += len(templates)
+
+    threads = [threading.Thread(target=worker, args=(i, engine)) for i, engine in enumerate(engines)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def main():
+    image_folder = sys.argv[1] if len(sys.argv) > 1 else 'images_tw'
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    device_counts = [int(n) for n in sys.argv[3].split(',')] if len(sys.argv) > 3 else [1, 2, 4, 8]
+
+    for name, value in ENGINE_OPTIONS.items():
+        setattr(g_matching_engine, name, value)
+    preload_templates(image_folder)
+    templates = pick_templates(image_folder)
+    frames = load_frames()
+    frame = next(iter(frames.values())) if frames else \
+        np.random.default_rng(0).integers(0, 256, (1080, 1920, 3), dtype=np.uint8)
+    cores = os.cpu_count() or 1
+    print(f"CPU 核数 {cores}，画面 {frame.shape[1]}x{frame.shape[0]}，每轮 {len(templates)} 个模板，每档 {seconds:g} 秒")
+    print(f"{'设备数':>6}{'本进程 次/秒':>14}{'进程池 次/秒':>14}{'进程数':>8}{'加速':>8}")
+
+    for devices in device_counts:
+        threaded = run_devices([g_matching_engine] * devices, frame, templates, image_folder, seconds)
+        processes = min(devices, cores)
+        with DetectionPool(processes=processes, engine_options=ENGINE_OPTIONS) as pool:
+            pool.warm_up(image_folder)
+            clients = [pool.client(f"sim-{i}") for i in range(devices)]
+            pooled = run_devices(clients, frame, templates, image_folder, seconds)
+        print(f"{devices:>6}{threaded:>14.1f}{pooled:>14.1f}{processes:>8}{pooled / max(threaded, 1e-6):>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
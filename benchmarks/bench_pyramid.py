@@ -0,0 +1,112 @@
+# benchmarks/bench_pyramid.py
+"""
+对比全分辨率匹配与金字塔匹配（PYRAMID_LEVELS）的耗时，并检查两者的命中位置是否一致。
+画面来自 debug_images/ 下的整帧截图；另外把每个模板贴到其 ROI 中心生成一张合成画面，保证每个模板都有真实命中可比。
+用法: python benchmarks/bench_pyramid.py [服务器目录, 默认 images_tw] [次数]
+"""
+import os
+import sys
+import time
+
+import cv2
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from common.MatchingEngine import MatchingEngine  # noqa: E402
+from common.utils import g_matching_engine, g_template_store, PYRAMID_LEVELS  # noqa: E402
+
+DEBUG_IMAGES_DIR = os.path.join(ROOT, 'debug_images')
+
+
+def load_frames():
+    """debug_images 中宽度不小于 960 的图片视为整帧截图。"""
+    frames = {}
+    if not os.path.isdir(DEBUG_IMAGES_DIR):
+        return frames
+    for filename in sorted(os.listdir(DEBUG_IMAGES_DIR)):
+        if not filename.lower().endswith('.png'):
+            continue
+        frame = cv2.imread(os.path.join(DEBUG_IMAGES_DIR, filename), cv2.IMREAD_COLOR)
+        if frame is not None and frame.shape[1] >= 960:
+            frames[filename] = frame
+    return frames
+
+
+def paste_template(engine, base_frame, image_folder, template_name, is_legend):
+    """把模板贴到其 ROI 中心，得到一张必然命中的合成画面。"""
+    entry = g_template_store.get(image_folder, template_name, is_legend)
+    frame_h, frame_w = base_frame.shape[:2]
+    roi = engine.scaled_roi(image_folder, template_name, frame_w, frame_h)
+    if entry is None or roi is None:
+        return None, None
+    x1, y1, x2, y2 = roi
+    if x2 - x1 < entry.width or y2 - y1 < entry.height:
+        return None, None
+    # 故意偏离 2 的整数倍，检验粗匹配坐标放大后的误差能否被验证窗口覆盖
+    left = x1 + (x2 - x1 - entry.width) // 2 + 3
+    top = y1 + (y2 - y1 - entry.height) // 2 + 1
+    left, top = min(left, x2 - entry.width), min(top, y2 - entry.height)
+    frame = base_frame.copy()
+    frame[top:top + entry.height, left:left + entry.width] = entry.bgr
+    return frame, (left + entry.width // 2, top + entry.height // 2)
+
+
+def time_match(engine, frame, template_name, image_folder, is_legend, color_mode, pyramid_level, rounds):
+    result = None
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = engine.match(frame, template_name, image_folder, 0.8, is_legend, color_mode, pyramid_level)
+    return (time.perf_counter() - start) * 1000 / rounds, result
+
+
+def main():
+    image_folder = sys.argv[1] if len(sys.argv) > 1 else 'images_tw'
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    engine = MatchingEngine(g_template_store, roi_resolver=g_matching_engine.roi_resolver,
+                            pyramid_levels=PYRAMID_LEVELS, location_memory=False)
+    frames = load_frames()
+    if not frames:
+        print(f"{DEBUG_IMAGES_DIR} 中没有可用的整帧截图。")
+        return
+    base_name, base_frame = next(iter(frames.items()))
+
+    mismatches = 0
+    total_full, total_pyramid = 0.0, 0.0
+    print(f"{'模板':<28}{'画面':<26}{'模式':<7}{'层':>3}{'全图 ms':>10}{'金字塔 ms':>11}{'加速':>7}  命中位置")
+    for template_name, level in PYRAMID_LEVELS.items():
+        is_legend = g_template_store.get(image_folder, template_name, False) is None
+        if g_template_store.get(image_folder, template_name, is_legend) is None:
+            continue
+
+        cases = list(frames.items())
+        synthetic, expected_center = paste_template(engine, base_frame, image_folder, template_name, is_legend)
+        if synthetic is not None:
+            cases.append((f"合成({base_name})", synthetic))
+
+        for frame_name, frame in cases:
+            for color_mode in (MatchingEngine.COLOR_MODE_GRAY, MatchingEngine.COLOR_MODE_COLOR):
+                full_ms, full = time_match(engine, frame, template_name, image_folder, is_legend, color_mode, 0,
+                                           rounds)
+                pyramid_ms, pyramid = time_match(engine, frame, template_name, image_folder, is_legend, color_mode,
+                                                 None, rounds)
+                total_full += full_ms
+                total_pyramid += pyramid_ms
+
+                same = full.found == pyramid.found and (not full.found or full.center == pyramid.center)
+                if frame_name.startswith("合成") and full.center != expected_center:
+                    same = False
+                if not same:
+                    mismatches += 1
+                position = f"{full.center if full.found else '-'} / {pyramid.center if pyramid.found else '-'}"
+                print(f"{template_name:<28}{frame_name[:24]:<26}{color_mode:<7}{level:>3}{full_ms:>10.2f}"
+                      f"{pyramid_ms:>11.2f}{full_ms / max(pyramid_ms, 1e-6):>6.1f}x  "
+                      f"{position}{'' if same else '  <-- 不一致'}")
+
+    print(f"\n合计: 全图 {total_full:.1f} ms, 金字塔 {total_pyramid:.1f} ms, "
+          f"加速 {total_full / max(total_pyramid, 1e-6):.2f}x, 命中位置不一致 {mismatches} 处")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/bench_rounds.py
+"""
+在假 adb（benchmarks/fake_adb）上端到端运行脚本，统计每小时完成的轮数，无需模拟器即可复现。
+用法: python benchmarks/bench_rounds.py [预设名, 默认 jama] [运行秒数, 默认 60] [sim] [server] [sendevent]
+预设定义了脚本类、场景文件与脚本配置；场景中带 count_round 的点击每触发一次记为完成一轮。
+加上 sim 时使用虚拟时钟（common/Clock.SimulatedClock）：脚本中的等待立即返回，假 adb 同步使用虚拟时间，
+运行秒数按虚拟时间计算，几秒内即可跑完数小时的流程（包括各种超时分支）。
+加上 server 时另外启动假 adb 的 adb server 协议服务，设备命令经 common/AdbClient.py 直连执行；
+否则关闭直连客户端，所有命令都启动假 adb 进程（也避免误连本机真实的 adb server）。
+加上 sendevent 时点击改用 sendevent 触摸模式（common/TouchInjector.py）。
+"""
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+FAKE_ADB_DIR = os.path.join(ROOT, 'benchmarks', 'fake_adb')
+sys.path.insert(0, ROOT)
+
+PRESETS = {
+    'jama': {
+        'script': ('scripts.JAMA_script', 'JamaScript'),
+        'scenario': 'jama_tw.json',
+        'options': {'server': '台服', 'max_loops': '0', 'window_title': '', 'kill_members_enabled': False,
+                    'run_mod': '兼容'},
+    },
+}
+
+
+def fake_adb_path():
+    return os.path.join(FAKE_ADB_DIR, 'adb.bat' if os.name == 'nt' else 'adb')
+
+
+def main():
+    preset_name = sys.argv[1] if len(sys.argv) > 1 else 'jama'
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 60.0
+    flags = set(sys.argv[3:])
+    simulated = 'sim' in flags
+    preset = PRESETS[preset_name]
+
+    work_dir = tempfile.mkdtemp(prefix='bench_rounds_')
+    os.environ['FAKE_ADB_SCENARIO'] = os.path.join(FAKE_ADB_DIR, preset['scenario'])
+    os.environ['FAKE_ADB_STATE'] = os.path.join(work_dir, 'state.json')
+    os.environ['FAKE_ADB_LOG'] = os.path.join(work_dir, 'adb.log')
+    # 脚本会在当前目录下写每日计数文件，放到临时目录里，避免污染仓库
+    os.chdir(work_dir)
+
+    from common.Clock import SimulatedClock, clock, set_clock
+    from common.utils import (run_adb_command, g_matching_engine, set_adb_server_client_enabled, set_touch_mode,
+                              TOUCH_MODE_SENDEVENT)
+    g_matching_engine.debug = False
+
+    if simulated:
+        clock_path = os.path.join(work_dir, 'clock_offset')
+        os.environ['FAKE_ADB_CLOCK'] = clock_path
+
+        def write_offset(offset):
+            # 先写临时文件再替换，假 adb 进程不会读到写了一半的内容
+            with open(clock_path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(repr(offset))
+            os.replace(clock_path + '.tmp', clock_path)
+
+        set_clock(SimulatedClock(on_advance=write_offset))
+
+    server = None
+    if 'server' in flags:
+        server = subprocess.Popen([sys.executable, os.path.join(FAKE_ADB_DIR, 'fake_adb.py'), 'fake-server', '0'],
+                                  stdout=subprocess.PIPE, text=True)
+        os.environ['ANDROID_ADB_SERVER_PORT'] = server.stdout.readline().strip()
+    else:
+        set_adb_server_client_enabled(False)
+
+    adb_path = fake_adb_path()
+    run_adb_command(adb_path, None, "fake-reset")
+    device_serial = run_adb_command(adb_path, None, "devices").split('\n')[1].split()[0]
+    if 'sendevent' in flags:
+        set_touch_mode(device_serial, TOUCH_MODE_SENDEVENT)
+
+    module_name, class_name = preset['script']
+    script_class = getattr(importlib.import_module(module_name), class_name)
+    options = dict(preset['options'], adb_path=adb_path, device_serial=device_serial)
+
+    stop_event = threading.Event()
+    logs = []
+    script = script_class(None, stop_event, logs.append)
+    worker = threading.Thread(target=script.run, args=(options,), daemon=True)
+
+    mode = "虚拟时间" if simulated else "真实时间"
+    channel = f"adb server 协议 :{os.environ['ANDROID_ADB_SERVER_PORT']}" if server else "adb 进程"
+    print(f"运行 {script_class.get_name()} {duration:.0f} 秒{mode}（设备 {device_serial}，{channel}，工作目录 {work_dir}）...")
+    real_started = time.perf_counter()
+    started = clock.time()
+    worker.start()
+    if simulated:
+        while worker.is_alive() and clock.time() - started < duration:
+            time.sleep(0.05)
+    else:
+        worker.join(duration)
+    stop_event.set()
+    worker.join(30)
+    elapsed = clock.time() - started
+    real_elapsed = time.perf_counter() - real_started
+    if server is not None:
+        server.terminate()
+
+    status = json.loads(run_adb_command(adb_path, None, "fake-status"))[device_serial]
+    rounds = status['rounds']
+    print(f"完成 {rounds} 轮，点击 {status['taps']} 次，用时 {elapsed:.1f} 秒 -> {rounds * 3600 / elapsed:.0f} 轮/小时")
+    if simulated:
+        print(f"实际耗时 {real_elapsed:.1f} 秒，加速 {elapsed / real_elapsed:.1f} 倍")
+    if rounds:
+        print(f"平均每轮 {elapsed / rounds:.2f} 秒")
+    print(f"adb 操作日志: {os.environ['FAKE_ADB_LOG']}")
+    warnings = [line for line in logs if '警告' in line or '错误' in line]
+    for line in warnings[-5:]:
+        print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# benchmarks/bench_screencap.py
+"""
+对比 PNG 截图（screencap -p + imdecode）与原始帧截图（exec-out screencap）的耗时。
+用法: python benchmarks/bench_screencap.py <adb路径> <设备序列号> [次数]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.utils import (get_adb_screenshot, set_screencap_mode,  # noqa: E402
+                          SCREENCAP_MODE_PNG, SCREENCAP_MODE_RAW)
+
+
+def bench_mode(adb_path, device_serial, mode, rounds):
+    set_screencap_mode(device_serial, mode)
+    get_adb_screenshot(adb_path, device_serial)  # 预热
+
+    costs = []
+    frame = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        frame = get_adb_screenshot(adb_path, device_serial)
+        costs.append((time.perf_counter() - start) * 1000)
+        if frame is None:
+            print(f"[{mode}] 截图失败，终止测试。")
+            return None, None
+    return costs, frame
+
+
+def main():
+    if len(sys.argv) < 3:
+        print(__doc__)
+        return
+    adb_path, device_serial = sys.argv[1], sys.argv[2]
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    results = {}
+    for mode in (SCREENCAP_MODE_PNG, SCREENCAP_MODE_RAW):
+        costs, frame = bench_mode(adb_path, device_serial, mode, rounds)
+        if costs is None:
+            return
+        results[mode] = frame
+        print(f"[{mode:>3}] {rounds} 次  平均 {np.mean(costs):7.1f} ms  "
+              f"中位 {np.median(costs):7.1f} ms  最快 {np.min(costs):7.1f} ms  分辨率 {frame.shape[1]}x{frame.shape[0]}")
+
+    png_frame, raw_frame = results[SCREENCAP_MODE_PNG], results[SCREENCAP_MODE_RAW]
+    if png_frame.shape == raw_frame.shape:
+        diff = np.abs(png_frame.astype(np.int16) - raw_frame.astype(np.int16)).mean()
+        print(f"两种模式画面平均像素差: {diff:.2f}（画面静止时应接近 0）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/bench_touch.py
+"""
+对比 `input` 命令与 sendevent（common/TouchInjector.py）两种触摸方式的单次点击耗时与每秒点击数。
+用法: python benchmarks/bench_touch.py <adb路径> <设备序列号> <x> <y> [次数]
+请选一个点击不会产生副作用的位置（例如空白区域）。
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.utils import (adb_tap, get_touch_injector, set_touch_mode,  # noqa: E402
+                          TOUCH_MODE_INPUT, TOUCH_MODE_SENDEVENT)
+
+
+def bench_mode(adb_path, device_serial, mode, x, y, rounds):
+    set_touch_mode(device_serial, mode)
+    if mode == TOUCH_MODE_SENDEVENT and get_touch_injector(adb_path, device_serial) is None:
+        print(f"[{mode}] 设备不支持，跳过。")
+        return None
+    adb_tap(x, y, adb_path, device_serial)  # 预热
+
+    costs = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        adb_tap(x, y, adb_path, device_serial)
+        costs.append((time.perf_counter() - start) * 1000)
+    return costs
+
+
+def main():
+    if len(sys.argv) < 5:
+        print(__doc__)
+        return
+    adb_path, device_serial = sys.argv[1], sys.argv[2]
+    x, y = int(sys.argv[3]), int(sys.argv[4])
+    rounds = int(sys.argv[5]) if len(sys.argv) > 5 else 20
+
+    for mode in (TOUCH_MODE_INPUT, TOUCH_MODE_SENDEVENT):
+        costs = bench_mode(adb_path, device_serial, mode, x, y, rounds)
+        if costs is None:
+            continue
+        print(f"[{mode:>9}] {rounds} 次  平均 {np.mean(costs):7.1f} ms  中位 {np.median(costs):7.1f} ms  "
+              f"最快 {np.min(costs):7.1f} ms  约 {1000 / np.mean(costs):5.1f} 次/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+@echo off
+rem 假 adb 的 Windows 启动器，把它的路径当作 adb_path 使用
+python "%~dp0fake_adb.py" %*
@@ -0,0 +1,787 @@
+# benchmarks/fake_adb/fake_adb.py
+"""
+离线基准测试用的假 adb，可直接替换 adb.exe 的路径使用（Windows 用同目录的 adb.bat，Linux/macOS 用 adb）。
+
+- 设备列表、截图、屏幕状态机都来自场景文件（JSON，见 jama_tw.json），通过环境变量 FAKE_ADB_SCENARIO 指定，
+  默认使用同目录的 jama_tw.json。
+- 截图按当前屏幕状态返回对应画面；点击落在状态配置的区域内时切换到下一个状态，也可以配置停留若干秒后自动切换。
+- 每条 input tap/swipe/keyevent、date、setprop、settings put 都带时间戳写入日志（FAKE_ADB_LOG）。
+- 模拟一个触摸设备（场景中的 touch，默认是竖屏自然方向、旋转 90 度的手机触摸屏），支持 getevent -pl、
+  dumpsys input 与 sendevent，sendevent 写入的按下/抬起同样按点击处理（common/TouchInjector.py 使用）。
+- 引用设备临时目录 /data/local/tmp 的命令（后台循环、pid/stop 文件等，common/DeviceTapLoop.py 使用）
+  交给主机的 /bin/sh 执行：该目录映射到状态文件旁的目录，input/sendevent 通过 PATH 中的转发脚本回到假 adb。
+  仅支持 Linux/macOS。
+- 设置 FAKE_ADB_CLOCK（一个保存“虚拟时间 - 真实时间”秒数的文件）后，设备时间、状态超时与日志都使用虚拟时间，
+  设备端的 sleep 与 swipe 时长不再真实等待，用于配合 common/Clock.SimulatedClock 加速运行。
+- 状态保存在 FAKE_ADB_STATE 指定的文件中，因此每次调用都是独立进程也能保持连续；
+  支持 `adb -s <序列号> shell` 的交互模式，常驻 shell 会话（AdbShellSession）可以直接使用。
+
+除标准 adb 命令外还提供以下辅助命令：
+    fake-reset          重置所有设备的状态（基准测试开始前调用）
+    fake-status         以 JSON 输出所有设备的当前状态、累计点击数与完成轮数
+    fake-server [端口]  以 adb server 协议监听本地端口（默认 5037，0 表示随机端口，第一行输出实际端口），
+                        供 common/AdbClient.py 直连；支持 host:version/devices/connect/transport 与
+                        shell:、shell,raw:（常驻 shell）、exec:、framebuffer: 服务
+"""
+import json
+import os
+import re
+import shlex
+import socketserver
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+RAW_FORMAT_RGBA_8888 = 1
+DEFAULT_DEVICE = {"serial": "127.0.0.1:16384", "model": "MuMu", "brand": "netease", "version": "12"}
+DEFAULT_PROPS = {"persist.sys.timezone": "Asia/Shanghai"}
+# 两点距离不超过该值的 swipe 视为一次按下-松开（adb_press_and_release 的实现方式）
+TAP_SWIPE_TOLERANCE = 10
+# 触摸设备的默认配置：自然方向为竖屏、坐标范围与分辨率不同（需要缩放），当前旋转 90 度（横屏游戏）
+DEFAULT_TOUCH = {"device": "/dev/input/event4", "max": [32767, 32767], "rotation": 1}
+DEVICE_TMP_DIR = '/data/local/tmp'
+# 在主机 shell 中执行时转发回假 adb 的设备命令
+FORWARDED_COMMANDS = ('input', 'sendevent')
+
+
+def scenario_path():
+    return os.environ.get('FAKE_ADB_SCENARIO', os.path.join(SCRIPT_DIR, 'jama_tw.json'))
+
+
+def default_work_path(suffix):
+    name = os.path.splitext(os.path.basename(scenario_path()))[0]
+    return os.path.join(tempfile.gettempdir(), f"fake_adb_{name}{suffix}")
+
+
+def state_path():
+    return os.environ.get('FAKE_ADB_STATE', default_work_path('.state.json'))
+
+
+def log_path():
+    return os.environ.get('FAKE_ADB_LOG', default_work_path('.log'))
+
+
+def clock_offset():
+    """虚拟时间相对真实时间的偏移（秒），未启用虚拟时间时为 None。"""
+    path = os.environ.get('FAKE_ADB_CLOCK')
+    if not path:
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return float(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0.0
+
+
+def now_ts():
+    return time.time() + (clock_offset() or 0.0)
+
+
+def device_sleep(seconds):
+    """设备端的等待；使用虚拟时间时由调用方的时钟负责推进，这里直接返回。"""
+    if clock_offset() is None and seconds > 0:
+        time.sleep(seconds)
+
+
+def load_scenario():
+    path = scenario_path()
+    with open(path, 'r', encoding='utf-8') as f:
+        scenario = json.load(f)
+    scenario['_dir'] = os.path.dirname(os.path.abspath(path))
+    scenario.setdefault('devices', [DEFAULT_DEVICE])
+    scenario.setdefault('screen_size', [1920, 1080])
+    touch = dict(DEFAULT_TOUCH, **scenario.get('touch', {}))
+    if 'natural_size' not in touch:
+        width, height = scenario['screen_size']
+        touch['natural_size'] = [height, width] if touch['rotation'] % 2 else [width, height]
+    scenario['touch'] = touch
+    return scenario
+
+
+# --- 状态文件 ---
+class StateFile:
+    """所有设备的可变状态，读改写由锁文件保护，多个假 adb 进程可以并发访问。"""
+
+    LOCK_TIMEOUT = 5.0
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + '.lock'
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.LOCK_TIMEOUT
+        while True:
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                return
+            except FileExistsError:
+                if time.monotonic() > deadline:
+                    # 持锁进程异常退出留下的旧锁
+                    try:
+                        os.remove(self.lock_path)
+                    except OSError:
+                        pass
+                    deadline = time.monotonic() + self.LOCK_TIMEOUT
+                time.sleep(0.002)
+
+    def _release(self):
+        try:
+            os.remove(self.lock_path)
+        except OSError:
+            pass
+
+    def read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, data):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.path)
+
+    def update(self, mutator):
+        self._acquire()
+        try:
+            data = self.read()
+            result = mutator(data)
+            self._write(data)
+            return result
+        finally:
+            self._release()
+
+
+class FakeDevice:
+    def __init__(self, scenario, serial, state_file):
+        self.scenario = scenario
+        self.serial = serial
+        self.state_file = state_file
+        self.info = next((d for d in scenario['devices'] if d['serial'] == serial), scenario['devices'][0])
+        self.last_return_code = 0
+        self.variables = {}
+
+    # --- 日志 ---
+    def log(self, message):
+        stamp = datetime.fromtimestamp(now_ts()).isoformat(timespec='milliseconds')
+        with open(log_path(), 'a', encoding='utf-8') as f:
+            f.write(f"{stamp} {self.serial} {message}\n")
+
+    # --- 状态机 ---
+    def _initial_device_state(self):
+        return {"state": self.scenario.get('initial_state'), "entered_at": now_ts(), "rounds": 0, "taps": 0,
+                "props": {}, "settings": {}, "clock_offset": 0.0}
+
+    def _device_state(self, data):
+        devices = data.setdefault('devices', {})
+        if self.serial not in devices:
+            devices[self.serial] = self._initial_device_state()
+        return devices[self.serial]
+
+    def _resolve(self, device_state, now):
+        """沿着 after 配置推进停留超时的状态，返回当前所处状态名。"""
+        states = self.scenario.get('states', {})
+        name, entered_at = device_state['state'], device_state['entered_at']
+        for _ in range(len(states) + 1):
+            after = states.get(name, {}).get('after')
+            if not after or now - entered_at < after['seconds']:
+                break
+            entered_at += after['seconds']
+            name = after['next']
+        device_state['state'], device_state['entered_at'] = name, entered_at
+        return name
+
+    def current_state(self):
+        device_state = self._device_state(self.state_file.read())
+        return self._resolve(device_state, now_ts())
+
+    def tap(self, x, y, action):
+        def mutate(data):
+            device_state = self._device_state(data)
+            now = now_ts()
+            name = self._resolve(device_state, now)
+            device_state['taps'] += 1
+            for tap in self.scenario.get('states', {}).get(name, {}).get('taps', []):
+                x1, y1, x2, y2 = tap['region']
+                if x1 <= x <= x2 and y1 <= y <= y2:
+                    device_state['state'], device_state['entered_at'] = tap['next'], now
+                    if tap.get('count_round'):
+                        device_state['rounds'] += 1
+                    return f"{name} -> {tap['next']}"
+            return name
+
+        transition = self.state_file.update(mutate)
+        self.log(f"{action} [{transition}]")
+
+    # --- 画面 ---
+    def _frame_cache_path(self, name, extension):
+        cache_dir = state_path() + '.frames'
+        os.makedirs(cache_dir, exist_ok=True)
+        return os.path.join(cache_dir, f"{name}.{extension}")
+
+    def _compose_frame(self, name):
+        import cv2
+        import numpy as np
+
+        width, height = self.scenario['screen_size']
+        spec = self.scenario.get('states', {}).get(name, {}).get('frame')
+        if isinstance(spec, str):
+            spec = {"base": spec}
+        spec = spec or {}
+
+        frame = None
+        if spec.get('base'):
+            frame = cv2.imread(os.path.join(self.scenario['_dir'], spec['base']), cv2.IMREAD_COLOR)
+        if frame is None:
+            frame = np.zeros((height, width, 3), np.uint8)
+        if frame.shape[1] != width or frame.shape[0] != height:
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+
+        for overlay in spec.get('overlays', []):
+            template = cv2.imread(os.path.join(self.scenario['_dir'], overlay['image']), cv2.IMREAD_UNCHANGED)
+            if template is None:
+                continue
+            x, y = overlay['at']
+            h, w = template.shape[:2]
+            h, w = min(h, height - y), min(w, width - x)
+            region = frame[y:y + h, x:x + w]
+            if template.ndim == 3 and template.shape[2] == 4:
+                alpha = template[:h, :w, 3:4].astype(np.float32) / 255.0
+                blended = template[:h, :w, :3].astype(np.float32) * alpha + region.astype(np.float32) * (1 - alpha)
+                frame[y:y + h, x:x + w] = blended.astype(np.uint8)
+            else:
+                frame[y:y + h, x:x + w] = template[:h, :w, :3]
+        return frame
+
+    def screenshot(self, as_png):
+        """画面按状态合成一次后缓存到磁盘，之后的截图直接读取缓存，开销接近真实设备的 screencap。"""
+        name = self.current_state() or 'blank'
+        path = self._frame_cache_path(name, 'png' if as_png else 'raw')
+        scenario_mtime = os.path.getmtime(scenario_path())
+        if not os.path.exists(path) or os.path.getmtime(path) < scenario_mtime:
+            import cv2
+            frame = self._compose_frame(name)
+            if as_png:
+                data = cv2.imencode('.png', frame)[1].tobytes()
+            else:
+                rgba = cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA)
+                data = struct.pack('<III', rgba.shape[1], rgba.shape[0], RAW_FORMAT_RGBA_8888) + rgba.tobytes()
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        with open(path, 'rb') as f:
+            return f.read()
+
+    # --- 属性、设置与时钟 ---
+    def _update_device(self, mutator):
+        return self.state_file.update(lambda data: mutator(self._device_state(data)))
+
+    def getprop(self, name=None):
+        props = {"ro.product.model": self.info.get('model', ''), "ro.product.brand": self.info.get('brand', ''),
+                 "ro.build.version.release": str(self.info.get('version', ''))}
+        props.update(DEFAULT_PROPS)
+        props.update(self._device_state(self.state_file.read())['props'])
+        if name is None:
+            return '\n'.join(f"[{k}]: [{v}]" for k, v in sorted(props.items()))
+        return props.get(name, '')
+
+    def emulator_now(self):
+        offset = self._device_state(self.state_file.read())['clock_offset']
+        return datetime.fromtimestamp(now_ts()) + timedelta(seconds=offset)
+
+    def date(self, args):
+        if args and not args[0].startswith('+'):
+            # toybox 格式: MMDDhhmm[[CC]YY][.ss]
+            match = re.fullmatch(r'(\d{2})(\d{2})(\d{2})(\d{2})(\d{2}|\d{4})?(?:\.(\d{2}))?', args[0])
+            if not match:
+                return 1, f"date: bad date '{args[0]}'"
+            month, day, hour, minute, year, second = match.groups()
+            now = datetime.fromtimestamp(now_ts())
+            year = int(year) if year and len(year) == 4 else (2000 + int(year) if year else now.year)
+            target = datetime(year, int(month), int(day), int(hour), int(minute), int(second or 0))
+
+            def mutate(device_state):
+                device_state['clock_offset'] = (target - datetime.fromtimestamp(now_ts())).total_seconds()
+            self._update_device(mutate)
+            self.log(f"date {args[0]}")
+            return 0, target.strftime('%a %b %d %H:%M:%S CST %Y')
+
+        fmt = args[0][1:] if args else '%a %b %d %H:%M:%S %Z %Y'
+        now = self.emulator_now()
+        tz_name = self.getprop('persist.sys.timezone')
+        try:
+            from zoneinfo import ZoneInfo
+            now = now.replace(tzinfo=ZoneInfo(tz_name))
+        except Exception:
+            pass
+        self.log(f"date +{fmt}")
+        return 0, now.strftime(fmt)
+
+    # --- shell 解释器 ---
+    def run_shell(self, command_line):
+        """
+        解释执行一行 shell 命令，支持 ; 与 && 串联、$? 与简单变量展开。
+        :return: (返回码, 文本或二进制输出)，文本输出每行以换行结尾
+        """
+        if DEVICE_TMP_DIR in command_line and os.name != 'nt':
+            return self._run_host_shell(command_line)
+        outputs = []
+        skip_next = False
+        for segment, operator in split_command_line(command_line):
+            if not skip_next and segment.strip():
+                self.last_return_code, output = self._run_simple(self._expand(segment))
+                if isinstance(output, bytes):
+                    return self.last_return_code, output
+                if output and not output.endswith('\n'):
+                    output += '\n'
+                outputs.append(output)
+            skip_next = operator == '&&' and self.last_return_code != 0
+        return self.last_return_code, ''.join(outputs)
+
+    def _run_host_shell(self, command_line):
+        fs_dir = state_path() + '.fs'
+        bin_dir = state_path() + '.bin'
+        os.makedirs(fs_dir, exist_ok=True)
+        os.makedirs(bin_dir, exist_ok=True)
+        for name in FORWARDED_COMMANDS:
+            path = os.path.join(bin_dir, name)
+            if not os.path.exists(path):
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.abspath(__file__)}" '
+                            f'-s "$FAKE_ADB_SERIAL" shell {name} "$@"\n')
+                os.chmod(path, 0o755)
+        env = dict(os.environ, PATH=bin_dir + os.pathsep + os.environ.get('PATH', ''), FAKE_ADB_SERIAL=self.serial)
+        result = subprocess.run(['/bin/sh', '-c', command_line.replace(DEVICE_TMP_DIR, fs_dir)],
+                                stdin=subprocess.DEVNULL, capture_output=True, env=env)
+        self.log(f"sh -c {command_line}")
+        return result.returncode, result.stdout.decode('utf-8', errors='ignore')
+
+    def _expand(self, segment):
+        segment = segment.replace('$?', str(self.last_return_code))
+        return re.sub(r'\$\{?([A-Za-z_][A-Za-z0-9_]*)\}?', lambda m: self.variables.get(m.group(1), ''), segment)
+
+    def _run_simple(self, segment):
+        try:
+            args = shlex.split(segment)
+        except ValueError as e:
+            return 2, f"sh: syntax error: {e}"
+        if not args:
+            return 0, ''
+
+        assignment = re.fullmatch(r'([A-Za-z_][A-Za-z0-9_]*)=(.*)', args[0])
+        if assignment and len(args) == 1:
+            self.variables[assignment.group(1)] = assignment.group(2)
+            return 0, ''
+
+        if '|' in args:
+            index = args.index('|')
+            self.last_return_code, output = self._run_args(args[:index])
+            return self._grep(args[index + 1:], output)
+        return self._run_args(args)
+
+    @staticmethod
+    def _grep(args, text):
+        """管道只支持一级 grep（-E/-i/-m N）。"""
+        if args[:1] != ['grep']:
+            return 127, f"/system/bin/sh: {args[0] if args else ''}: pipe not supported"
+        flags, limit, patterns, rest = 0, None, [], iter(args[1:])
+        for arg in rest:
+            if arg == '-i':
+                flags |= re.IGNORECASE
+            elif arg == '-m':
+                limit = int(next(rest))
+            elif arg != '-E':
+                patterns.append(arg)
+        lines = [line for line in str(text).splitlines() if re.search(patterns[0], line, flags)]
+        lines = lines[:limit] if limit else lines
+        return (0 if lines else 1), ''.join(line + '\n' for line in lines)
+
+    def _run_args(self, args):
+        name, rest = args[0], args[1:]
+        if name == 'echo':
+            return 0, ' '.join(rest) + '\n'
+        if name in ('true', ':'):
+            return 0, ''
+        if name == 'false':
+            return 1, ''
+        if name == 'sleep':
+            device_sleep(float(rest[0]) if rest else 0)
+            return 0, ''
+        if name == 'su':
+            # su -c 'cmd' / su 0 cmd ... / su 0 -c 'cmd'
+            inner = rest[1:] if rest[:1] == ['0'] else rest
+            if inner[:1] == ['-c']:
+                return self.run_shell(' '.join(inner[1:]))
+            return self.run_shell(shlex.join(inner))
+        if name == 'input':
+            return self._input(rest)
+        if name == 'screencap':
+            return 0, self.screenshot(as_png='-p' in rest)
+        if name == 'getprop':
+            return 0, self.getprop(rest[0] if rest else None)
+        if name == 'setprop' and len(rest) >= 2:
+            def mutate(device_state):
+                device_state['props'][rest[0]] = ' '.join(rest[1:])
+            self._update_device(mutate)
+            self.log(f"setprop {' '.join(rest)}")
+            return 0, ''
+        if name == 'settings':
+            return self._settings(rest)
+        if name == 'date':
+            return self.date(rest)
+        if name == 'wm' and rest[:1] == ['size']:
+            width, height = self.scenario['touch']['natural_size']
+            return 0, f"Physical size: {width}x{height}"
+        if name == 'getevent' and '-p' in ''.join(rest):
+            return 0, self._getevent_info()
+        if name == 'dumpsys' and rest[:1] == ['input']:
+            return 0, f"    Viewport INTERNAL: displayId=0, orientation={self.scenario['touch']['rotation']}\n" \
+                      f"      SurfaceOrientation: {self.scenario['touch']['rotation']}\n"
+        if name == 'sendevent':
+            return self._sendevent(rest)
+        if name in ('am', 'pm', 'monkey', 'killall', 'log'):
+            self.log(' '.join(args))
+            return 0, ''
+        return 127, f"/system/bin/sh: {name}: inaccessible or not found"
+
+    def _input(self, args):
+        action = 'input ' + ' '.join(args)
+        if args[:1] == ['tap'] and len(args) >= 3:
+            self.tap(float(args[1]), float(args[2]), action)
+            return 0, ''
+        if args[:1] == ['swipe'] and len(args) >= 5:
+            x1, y1, x2, y2 = (float(v) for v in args[1:5])
+            duration_ms = float(args[5]) if len(args) > 5 else 0
+            device_sleep(duration_ms / 1000)
+            if abs(x2 - x1) <= TAP_SWIPE_TOLERANCE and abs(y2 - y1) <= TAP_SWIPE_TOLERANCE:
+                self.tap(x1, y1, action)
+            else:
+                self.log(action)
+            return 0, ''
+        self.log(action)
+        return 0, ''
+
+    # --- 触摸设备 ---
+    def _getevent_info(self):
+        touch = self.scenario['touch']
+        max_x, max_y = touch['max']
+        return (f"add device 1: /dev/input/event0\n  name:     \"qwerty\"\n  events:\n    KEY (0001): KEY_HOME KEY_BACK\n"
+                f"add device 2: {touch['device']}\n  name:     \"fake_touchscreen\"\n  events:\n"
+                f"    KEY (0001): BTN_TOUCH\n"
+                f"    ABS (0003): ABS_MT_SLOT           : value 0, min 0, max 9, fuzz 0, flat 0, resolution 0\n"
+                f"                ABS_MT_POSITION_X     : value 0, min 0, max {max_x}, fuzz 0, flat 0, resolution 0\n"
+                f"                ABS_MT_POSITION_Y     : value 0, min 0, max {max_y}, fuzz 0, flat 0, resolution 0\n"
+                f"                ABS_MT_TRACKING_ID    : value 0, min 0, max 65535, fuzz 0, flat 0, resolution 0\n"
+                f"  input props:\n    INPUT_PROP_DIRECT\n")
+
+    def _raw_to_screen(self, raw_x, raw_y):
+        """触摸设备原始坐标 -> 当前方向下的屏幕像素坐标（与 Android InputReader 的换算一致）。"""
+        touch = self.scenario['touch']
+        width, height = touch['natural_size']
+        nx, ny = raw_x * width / (touch['max'][0] + 1), raw_y * height / (touch['max'][1] + 1)
+        rotation = touch['rotation'] % 4
+        if rotation == 1:
+            return ny, width - nx
+        if rotation == 2:
+            return width - nx, height - ny
+        if rotation == 3:
+            return height - ny, nx
+        return nx, ny
+
+    def _sendevent(self, args):
+        if len(args) != 4:
+            return 1, 'usage: sendevent DEVICE TYPE CODE VALUE'
+        if args[0] != self.scenario['touch']['device']:
+            return 1, f"sendevent: {args[0]}: No such file or directory"
+        event_type, code, value = (int(v) for v in args[1:])
+
+        def mutate(device_state):
+            # 触摸状态保存在状态文件里，后台循环中每条 sendevent 都是独立进程也能连续
+            touch = device_state.setdefault('touch', {"tracking_id": -1, "raw": [0, 0], "down_at": None})
+            if event_type == 3 and code == 57:
+                touch['tracking_id'] = value
+            elif event_type == 3 and code in (53, 54):
+                touch['raw'][code - 53] = value
+            elif event_type == 0:
+                if touch['tracking_id'] >= 0 and touch['down_at'] is None:
+                    touch['down_at'] = self._raw_to_screen(*touch['raw'])
+                elif touch['tracking_id'] < 0 and touch['down_at'] is not None:
+                    released = touch['down_at'], self._raw_to_screen(*touch['raw'])
+                    touch['down_at'] = None
+                    return released
+            return None
+
+        released = self._update_device(mutate)
+        if released:
+            (x1, y1), (x2, y2) = released
+            action = f"sendevent touch {x1:.0f},{y1:.0f} -> {x2:.0f},{y2:.0f}"
+            if abs(x2 - x1) <= TAP_SWIPE_TOLERANCE and abs(y2 - y1) <= TAP_SWIPE_TOLERANCE:
+                self.tap(x1, y1, action)
+            else:
+                self.log(action)
+        return 0, ''
+
+    def _settings(self, args):
+        if len(args) >= 4 and args[0] == 'put':
+            def mutate(device_state):
+                device_state['settings'][f"{args[1]}/{args[2]}"] = args[3]
+            self._update_device(mutate)
+            self.log(f"settings {' '.join(args)}")
+            return 0, ''
+        if len(args) >= 3 and args[0] == 'get':
+            settings = self._device_state(self.state_file.read())['settings']
+            return 0, settings.get(f"{args[1]}/{args[2]}", 'null')
+        return 1, 'settings: invalid arguments'
+
+
+def split_command_line(command_line):
+    """按引号之外的 ; 与 && 切分命令，返回 [(片段, 其后的运算符), ...]。"""
+    segments, current, quote, i = [], [], None, 0
+    while i < len(command_line):
+        char = command_line[i]
+        if quote:
+            if char == quote:
+                quote = None
+            current.append(char)
+        elif char in ('"', "'"):
+            quote = char
+            current.append(char)
+        elif char == ';' or char == '\n':
+            segments.append((''.join(current), ';'))
+            current = []
+        elif command_line.startswith('&&', i):
+            segments.append((''.join(current), '&&'))
+            current = []
+            i += 1
+        else:
+            current.append(char)
+        i += 1
+    segments.append((''.join(current), None))
+    return segments
+
+
+def write_output(output, pty=False):
+    if isinstance(output, str):
+        output = output.encode('utf-8')
+    if pty:
+        # 旧版 adb shell 经过 pty 会把 \n 转成 \r\n，utils.get_adb_screenshot_png 会再换回来
+        output = output.replace(b'\n', b'\r\n')
+    sys.stdout.buffer.write(output)
+    sys.stdout.buffer.flush()
+
+
+def interactive_shell(device):
+    """`adb shell` 交互模式：逐行读取 stdin 并执行，每行执行完立即刷新输出。"""
+    for raw_line in iter(sys.stdin.buffer.readline, b''):
+        line = raw_line.decode('utf-8', errors='ignore').strip()
+        if line in ('exit', 'exit 0'):
+            break
+        _, output = device.run_shell(line)
+        write_output(output)
+    return 0
+
+
+# --- adb server 协议 ---
+class FakeAdbServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port, scenario, state_file):
+        super().__init__(('127.0.0.1', port), FakeAdbRequestHandler)
+        self.scenario = scenario
+        self.state_file = state_file
+        self.serials = [d['serial'] for d in scenario['devices']]
+
+
+class FakeAdbRequestHandler(socketserver.StreamRequestHandler):
+    """一条连接：若干 host 请求，最多再接一个设备服务，服务结束后关闭连接。"""
+
+    # 常驻 shell 的每条命令由多次小块写入组成，关闭 Nagle 以免等待 ACK
+    disable_nagle_algorithm = True
+
+    def _read_request(self):
+        length = self.rfile.read(4)
+        if len(length) < 4:
+            return None
+        return self.rfile.read(int(length, 16)).decode('utf-8', errors='ignore')
+
+    def _okay(self, payload=None):
+        data = b'OKAY'
+        if payload is not None:
+            encoded = payload.encode('utf-8')
+            data += b'%04x' % len(encoded) + encoded
+        self.wfile.write(data)
+        self.wfile.flush()
+
+    def _fail(self, message):
+        encoded = message.encode('utf-8')
+        self.wfile.write(b'FAIL' + b'%04x' % len(encoded) + encoded)
+        self.wfile.flush()
+
+    def handle(self):
+        serial = None
+        while True:
+            request = self._read_request()
+            if request is None:
+                return
+            if request == 'host:version':
+                self._okay('0029')
+            elif request in ('host:devices', 'host:devices-l'):
+                self._okay(''.join(f"{device_serial}\tdevice\n" for device_serial in self.server.serials))
+            elif request.startswith('host:connect:'):
+                target = request[len('host:connect:'):]
+                if target in self.server.serials:
+                    self._okay(f"already connected to {target}")
+                else:
+                    self._okay(f"cannot connect to {target}")
+            elif request.startswith('host:transport'):
+                if request == 'host:transport-any':
+                    serial = self.server.serials[0]
+                else:
+                    serial = request[len('host:transport:'):]
+                    if serial not in self.server.serials:
+                        self._fail(f"device '{serial}' not found")
+                        return
+                self._okay()
+            elif serial is None:
+                self._fail(f"unknown host service {request}")
+                return
+            else:
+                self._device_service(FakeDevice(self.server.scenario, serial, self.server.state_file), request)
+                return
+
+    def _device_service(self, device, request):
+        service, _, command = request.partition(':')
+        name, *options = service.split(',')
+        if name == 'shell' and not command:
+            self._okay()
+            pty = 'raw' not in options
+            for raw_line in iter(self.rfile.readline, b''):
+                line = raw_line.decode('utf-8', errors='ignore').strip()
+                if line in ('exit', 'exit 0'):
+                    break
+                self._send(device.run_shell(line)[1], pty)
+        elif name == 'shell' and 'v2' in options:
+            # shell,v2: 输出按数据包发送：1 字节类型（1 标准输出、3 返回码）+ 小端 uint32 长度 + 内容
+            self._okay()
+            return_code, output = device.run_shell(command)
+            if isinstance(output, str):
+                output = output.encode('utf-8')
+            if output:
+                self.wfile.write(struct.pack('<BI', 1, len(output)) + output)
+            self.wfile.write(struct.pack('<BIB', 3, 1, return_code & 0xFF))
+            self.wfile.flush()
+        elif name in ('shell', 'exec'):
+            self._okay()
+            self._send(device.run_shell(command)[1])
+        elif name == 'framebuffer':
+            _, raw = device.run_shell('screencap')
+            width, height, _ = struct.unpack_from('<III', raw, 0)
+            pixels = raw[12:]
+            # version 2, 32bpp, colorspace, size, width, height, RGBA 各通道的 offset/length（顺序为 r, b, g, a）
+            header = struct.pack('<14I', 2, 32, 0, len(pixels), width, height, 0, 8, 16, 8, 8, 8, 24, 8)
+            self._okay()
+            self.wfile.write(header + pixels)
+        else:
+            self._fail(f"unknown service {request}")
+
+    def _send(self, output, pty=False):
+        if isinstance(output, str):
+            output = output.encode('utf-8')
+        if pty:
+            output = output.replace(b'\n', b'\r\n')
+        self.wfile.write(output)
+        self.wfile.flush()
+
+
+def serve(port, scenario, state_file):
+    with FakeAdbServer(port, scenario, state_file) as server:
+        print(server.server_address[1], flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+def main(argv):
+    scenario = load_scenario()
+    state_file = StateFile(state_path())
+    serials = [d['serial'] for d in scenario['devices']]
+
+    serial = None
+    while argv and argv[0] in ('-s', '-P', '-H'):
+        if argv[0] == '-s':
+            serial = argv[1]
+        argv = argv[2:]
+    if not argv:
+        print("fake adb: 缺少命令", file=sys.stderr)
+        return 1
+    command, args = argv[0], argv[1:]
+
+    if command in ('kill-server', 'start-server'):
+        return 0
+    if command == 'connect':
+        target = args[0] if args else ''
+        if target in serials:
+            print(f"already connected to {target}")
+        else:
+            print(f"cannot connect to {target}: 由于目标计算机积极拒绝，无法连接。 (10061)")
+        return 0
+    if command == 'devices':
+        print("List of devices attached")
+        for device_serial in serials:
+            print(f"{device_serial}\tdevice")
+        print()
+        return 0
+    if command == 'fake-reset':
+        for path in (state_path(), log_path()):
+            if os.path.exists(path):
+                os.remove(path)
+        return 0
+    if command == 'fake-server':
+        return serve(int(args[0]) if args else 5037, scenario, state_file)
+    if command == 'fake-status':
+        data = state_file.read()
+        for device_serial in serials:
+            device = FakeDevice(scenario, device_serial, state_file)
+            device._resolve(device._device_state(data), now_ts())
+        print(json.dumps(data['devices'], ensure_ascii=False, indent=2))
+        return 0
+
+    if serial is None:
+        if len(serials) != 1:
+            print("adb: more than one device/emulator", file=sys.stderr)
+            return 1
+        serial = serials[0]
+    if serial not in serials:
+        print(f"adb: device '{serial}' not found", file=sys.stderr)
+        return 1
+    device = FakeDevice(scenario, serial, state_file)
+
+    if command == 'shell':
+        if not args:
+            return interactive_shell(device)
+        return_code, output = device.run_shell(' '.join(args))
+        write_output(output, pty=isinstance(output, bytes))
+        return return_code
+    if command == 'exec-out':
+        return_code, output = device.run_shell(' '.join(args))
+        write_output(output)
+        return return_code
+
+    print(f"fake adb: 不支持的命令 {command}", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,76 @@
+# benchmarks/profile_replay.py
+"""
+离线回放录制的画面（截图目录或录屏视频），逐帧评估一组模板，统计识别流程的耗时与命中情况。
+用法: python benchmarks/profile_replay.py <画面来源> <服务器目录> [模板 ...]
+  画面来源: 截图目录、视频文件，或 dir:/video: 前缀形式（见 common/FrameSource.open_frame_source）
+  模板:     模板名；传说关卡模板写作 legend/模板名；省略时评估该服务器所有配置了 ROI 的模板
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from common.Frame import Frame  # noqa: E402
+from common.FrameSource import open_frame_source  # noqa: E402
+from common.utils import g_matching_engine, g_template_store, GDI_COLOR_MODE  # noqa: E402
+
+
+def parse_templates(image_folder, names):
+    if not names:
+        names = sorted(g_matching_engine.roi_resolver(image_folder))
+    templates = []
+    for name in names:
+        if name.startswith('legend/'):
+            templates.append((name[len('legend/'):], True))
+        elif g_template_store.get(image_folder, name, False) is not None:
+            templates.append((name, False))
+        elif g_template_store.get(image_folder, name, True) is not None:
+            templates.append((name, True))
+    return templates
+
+
+def main():
+    if len(sys.argv) < 3:
+        print(__doc__)
+        return
+    source = open_frame_source(sys.argv[1])
+    image_folder = sys.argv[2]
+    templates = parse_templates(image_folder, sys.argv[3:])
+    g_matching_engine.debug = False
+
+    frame_count, total_ms, previous_hits = 0, 0.0, None
+    with source:
+        # 实时来源（ADB/GDI）没有 exhausted，按 Ctrl+C 结束
+        try:
+            while not getattr(source, 'exhausted', False):
+                image = source.get_latest_frame()
+                if image is None or getattr(source, 'exhausted', False):
+                    break
+                frame_count += 1
+                start = time.perf_counter()
+                hits = g_matching_engine.match_many(Frame(image, frame_id=frame_count), templates, image_folder,
+                                                    color_mode=GDI_COLOR_MODE)
+                total_ms += (time.perf_counter() - start) * 1000
+
+                hit_names = sorted(hits)
+                if hit_names != previous_hits:
+                    print(f"第 {frame_count:5d} 帧: {', '.join(hit_names) if hit_names else '(无命中)'}")
+                    previous_hits = hit_names
+        except KeyboardInterrupt:
+            pass
+
+    if not frame_count:
+        print("没有读取到任何画面。")
+        return
+    stats = g_matching_engine.stats
+    print(f"\n{frame_count} 帧 x {len(templates)} 个模板，总耗时 {total_ms:.1f} ms，"
+          f"平均每帧 {total_ms / frame_count:.2f} ms，画面未变化跳过 {stats['skipped']}/{stats['matches']} 次匹配")
+    print("最耗时的模板:")
+    for key, count, avg_ms, max_ms, mask_kind in g_matching_engine.timing_report(10):
+        print(f"  {key:<40}{count:>6} 次  平均 {avg_ms:7.2f} ms  最大 {max_ms:7.2f} ms  {mask_kind}")
+
+
+if __name__ == "__main__":
+    main()
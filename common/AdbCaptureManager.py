@@ -0,0 +1,125 @@
+# common/AdbCaptureManager.py
+import threading
+
+from common.Clock import clock
+from common.Frame import Frame
+from common.FrameSubscriptions import FrameSubscriptions
+from common.utils import get_adb_screenshot
+
+
+class AdbCaptureManager:
+    """
+    基于 ADB 截图的后台截图管理器，接口与 ScreenCaptureManager 相同（start/stop/get_latest_frame）。
+    后台线程不停地拉取截图，识别时直接读取最新一帧，不必每次等待一次同步 screencap；
+    不依赖窗口标题、DirectX 渲染模式，模拟器窗口可以缩放、最小化或被遮挡。
+    截图方式跟随 set_screencap_mode 为该设备设置的模式，建议配合原始帧模式使用。
+    """
+
+    def __init__(self, adb_path, device_serial, interval=0.0, log_callback=None, capture_callable=None):
+        """
+        :param interval: 两次截图之间的额外间隔（秒），0 表示截完立即截下一张
+        :param capture_callable: 无参数的截图函数，返回 BGR 图像或 None；默认使用 get_adb_screenshot
+        """
+        self.log = log_callback if log_callback else print
+
+        self.adb_path = adb_path
+        self.device_serial = device_serial
+        self.interval = interval
+        self.capture_callable = capture_callable
+
+        self.latest_frame = None
+        self.sequence = 0  # 每成功截到一帧加 1
+        self.timestamp = None  # 最新一帧截图完成时的 clock.time()
+        self.failures = 0  # 连续截图失败次数
+        self.lock = threading.Lock()
+        self.new_frame_condition = threading.Condition(self.lock)
+        self.is_running = False
+        self.capture_thread = None
+        self.subscriptions = FrameSubscriptions(log_callback=self.log)
+
+    def capture_frame(self):
+        if self.capture_callable is not None:
+            return self.capture_callable()
+        return get_adb_screenshot(self.adb_path, self.device_serial)
+
+    def _capture_loop(self):
+        while self.is_running:
+            frame = self.capture_frame()
+            if frame is not None:
+                with self.lock:
+                    self.latest_frame = frame
+                    self.sequence += 1
+                    sequence = self.sequence
+                    self.timestamp = clock.time()
+                    self.failures = 0
+                    self.new_frame_condition.notify_all()
+                if self.subscriptions:
+                    self.subscriptions.evaluate(frame, sequence)
+            else:
+                self.failures += 1
+                if self.failures == 1:
+                    self.log(f"警告: 设备 {self.device_serial} 后台截图失败，正在重试...")
+                clock.sleep(0.5)
+            if self.interval > 0:
+                clock.sleep(self.interval)
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self.capture_thread.start()
+
+    def stop(self):
+        if not self.is_running:
+            return
+        self.is_running = False
+        with self.lock:
+            self.new_frame_condition.notify_all()
+        if self.capture_thread:
+            self.capture_thread.join()
+
+    def subscribe(self, templates, image_folder, confidence_threshold=0.8, is_legend=False, color_mode=None,
+                  callback=None, location_key=None):
+        """
+        订阅模板出现事件：之后每截到一帧都在截图线程中评估这些模板，详见 common/FrameSubscriptions.py。
+        :param location_key: 位置记忆的区分键，默认使用设备序列号
+        :return: Subscription，可用作 with 语句，退出时自动取消
+        """
+        if location_key is None:
+            location_key = self.device_serial
+        return self.subscriptions.subscribe(templates, image_folder, confidence_threshold, is_legend, color_mode,
+                                            callback, location_key)
+
+    def get_latest_frame(self):
+        with self.lock:
+            return self.latest_frame.copy() if self.latest_frame is not None else None
+
+    def get_latest_frame_info(self):
+        """
+        :return: (帧, 序号, 时间戳)；尚未截到任何画面时返回 (None, 0, None)。
+                 返回的帧不做拷贝，调用方不应原地修改它。
+        """
+        with self.lock:
+            return self.latest_frame, self.sequence, self.timestamp
+
+    def get_latest(self):
+        """返回最新一帧的 Frame 包装（frame_id 为截图序号），同一帧上多次匹配时可共享灰度转换与 ROI 缓存。"""
+        frame, sequence, _ = self.get_latest_frame_info()
+        return Frame(frame, frame_id=sequence) if frame is not None else None
+
+    def wait_for_frame(self, after_sequence=0, timeout=5.0):
+        """
+        等待一帧序号大于 after_sequence 的新画面，用于在点击之后确保拿到的不是点击前截的旧图。
+        :return: (帧, 序号, 时间戳)；超时或管理器已停止时帧为 None
+        """
+        deadline = clock.monotonic() + timeout
+        with self.lock:
+            while self.is_running and self.sequence <= after_sequence:
+                remaining = deadline - clock.monotonic()
+                if remaining <= 0:
+                    break
+                self.new_frame_condition.wait(remaining)
+            if self.sequence <= after_sequence:
+                return None, self.sequence, self.timestamp
+            return self.latest_frame, self.sequence, self.timestamp
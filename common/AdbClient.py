@@ -0,0 +1,251 @@
+# common/AdbClient.py
+"""
+直接与 adb server（默认 127.0.0.1:5037）通信的客户端，实现 adb 的 host 协议，执行命令时不再启动 adb.exe 进程。
+
+协议要点：
+- 请求为 4 位十六进制长度 + 内容，server 回复 OKAY，或 FAIL + 带长度前缀的错误信息。
+- host:version / host:devices 等 host 服务的结果是一个带长度前缀的字符串。
+- host:transport:<序列号> 成功后，这条连接就绑定到该设备，接着可以打开一个设备服务
+  （shell: / exec: / framebuffer:），服务的输出一直读到连接关闭为止。
+- shell,v2: 服务把输出分成数据包：1 字节类型（1 标准输出、2 标准错误、3 返回码）+ 小端 uint32 长度 + 内容，
+  因此能拿到命令的返回码（需要 Android 7 及以上）。
+每条连接只能承载一个服务；按设备复用的是常驻 shell 流（见 AdbShellSession.AdbSocketShellSession），
+其余请求各自打开一条本地 TCP 连接，代价远小于创建进程，多台设备的请求也可以并发进行。
+adb server 端口可以用环境变量 ANDROID_ADB_SERVER_PORT 指定，与 adb 本身一致。
+"""
+import os
+import socket
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 5037
+# 连接 adb server 失败后，这段时间内直接判定不可用，调用方回退到 adb 进程，避免每条命令都重复尝试
+RETRY_INTERVAL = 10.0
+
+# shell,v2: 协议的数据包类型
+SHELL_V2_STDOUT = 1
+SHELL_V2_STDERR = 2
+SHELL_V2_EXIT = 3
+
+
+class AdbClientError(Exception):
+    """与 adb server 通信失败（连接不上、连接中断、超时、协议数据异常等）。"""
+    pass
+
+
+class AdbServerError(AdbClientError):
+    """adb server 明确返回了 FAIL，例如设备不存在、服务不受支持。"""
+    pass
+
+
+class AdbStreamError(AdbClientError):
+    """设备服务已经打开（命令已送达设备）之后读取输出失败。命令可能已经执行，调用方不应再重发。"""
+    pass
+
+
+class AdbClient:
+    def __init__(self, host=None, port=None, timeout=10.0):
+        self.host = host or DEFAULT_HOST
+        self.port = int(port or os.environ.get('ANDROID_ADB_SERVER_PORT') or DEFAULT_PORT)
+        self.timeout = timeout
+        self._unavailable_until = 0.0
+
+    @property
+    def address(self):
+        return self.host, self.port
+
+    def is_available(self):
+        """最近一次连接失败后的 RETRY_INTERVAL 秒内返回 False。"""
+        return time.monotonic() >= self._unavailable_until
+
+    # --- 底层收发 ---
+    def _connect(self, timeout=None):
+        if not self.is_available():
+            raise AdbClientError(f"adb server {self.host}:{self.port} 暂不可用")
+        try:
+            sock = socket.create_connection(self.address, timeout=self.timeout if timeout is None else timeout)
+        except OSError as e:
+            self._unavailable_until = time.monotonic() + RETRY_INTERVAL
+            raise AdbClientError(f"无法连接 adb server {self.host}:{self.port}: {e}")
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    @staticmethod
+    def _read_exact(sock, size):
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            count = sock.recv_into(view[received:])
+            if count == 0:
+                raise AdbClientError(f"adb server 提前关闭了连接（需要 {size} 字节，收到 {received} 字节）")
+            received += count
+        return bytes(buffer)
+
+    @staticmethod
+    def _read_all(sock):
+        chunks = []
+        while True:
+            chunk = sock.recv(1 << 20)
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+
+    def _read_string(self, sock):
+        length = self._read_exact(sock, 4)
+        try:
+            size = int(length, 16)
+        except ValueError:
+            raise AdbClientError(f"无法识别的长度前缀: {length!r}")
+        return self._read_exact(sock, size).decode('utf-8', errors='ignore')
+
+    def _request(self, sock, request):
+        """发送一个请求并读取状态，FAIL 时抛出 AdbServerError。"""
+        payload = request.encode('utf-8')
+        sock.sendall(b'%04x' % len(payload) + payload)
+        status = self._read_exact(sock, 4)
+        if status == b'OKAY':
+            return
+        if status == b'FAIL':
+            raise AdbServerError(f"{request}: {self._read_string(sock)}")
+        raise AdbClientError(f"{request}: 无法识别的响应 {status!r}")
+
+    # --- host 服务 ---
+    def host_request(self, request):
+        """执行一个返回字符串的 host 服务（host:version、host:devices 等）。"""
+        sock = self._connect()
+        try:
+            self._request(sock, request)
+            return self._read_string(sock)
+        except OSError as e:
+            raise AdbClientError(f"{request}: {e}")
+        finally:
+            sock.close()
+
+    def version(self):
+        return int(self.host_request('host:version'), 16)
+
+    def devices(self):
+        """:return: [(序列号, 状态), ...]，状态如 device / offline / unauthorized。"""
+        devices = []
+        for line in self.host_request('host:devices').splitlines():
+            parts = line.split()
+            if len(parts) >= 2:
+                devices.append((parts[0], parts[1]))
+        return devices
+
+    def connect(self, address):
+        """等价于 `adb connect <address>`，返回 server 的提示文本。"""
+        return self.host_request(f'host:connect:{address}')
+
+    # --- 设备服务 ---
+    def open_stream(self, device_serial, service, timeout=None):
+        """
+        切换到指定设备并打开一个设备服务，返回已就绪的 socket，调用方负责关闭。
+        device_serial 为 None 时等价于不带 -s 的 adb（只有一台设备时可用）。
+        """
+        sock = self._connect(timeout)
+        try:
+            transport = f'host:transport:{device_serial}' if device_serial else 'host:transport-any'
+            self._request(sock, transport)
+            self._request(sock, service)
+            return sock
+        except OSError as e:
+            sock.close()
+            raise AdbClientError(f"{service}: {e}")
+        except AdbClientError:
+            sock.close()
+            raise
+
+    def _run_service(self, device_serial, service, timeout=None):
+        sock = self.open_stream(device_serial, service, timeout)
+        try:
+            return self._read_all(sock)
+        except OSError as e:
+            raise AdbStreamError(f"{service}: {e}")
+        finally:
+            sock.close()
+
+    def shell(self, device_serial, command, timeout=None):
+        """`adb shell <command>`，返回原始输出（bytes）。带命令的 shell: 服务不分配 pty，二进制输出不会被改写。"""
+        return self._run_service(device_serial, f'shell:{command}', timeout)
+
+    def shell_v2(self, device_serial, command, timeout=None):
+        """
+        通过 shell,v2: 服务执行命令，与 `adb shell <command>` 一样能拿到返回码。
+        :return: (返回码, 标准输出 bytes, 标准错误 bytes)
+        """
+        service = f'shell,v2,raw:{command}'
+        sock = self.open_stream(device_serial, service, timeout)
+        stdout, stderr = [], []
+        try:
+            while True:
+                packet_id, size = struct.unpack('<BI', self._read_exact(sock, 5))
+                data = self._read_exact(sock, size) if size else b''
+                if packet_id == SHELL_V2_STDOUT:
+                    stdout.append(data)
+                elif packet_id == SHELL_V2_STDERR:
+                    stderr.append(data)
+                elif packet_id == SHELL_V2_EXIT:
+                    return (data[0] if data else -1), b''.join(stdout), b''.join(stderr)
+        except (OSError, AdbClientError) as e:
+            raise AdbStreamError(f"{service}: {e}")
+        finally:
+            sock.close()
+
+    def exec_out(self, device_serial, command, timeout=None):
+        """`adb exec-out <command>`，返回原始输出（bytes）。"""
+        return self._run_service(device_serial, f'exec:{command}', timeout)
+
+    def framebuffer(self, device_serial, timeout=None):
+        """
+        通过 framebuffer: 服务截图，返回 BGR 图像。
+        头部为小端 uint32：version, bpp, [colorspace（仅 version 2）], size, width, height，
+        以及 red/blue/green/alpha 各自的 offset 与 length。
+        """
+        sock = self.open_stream(device_serial, 'framebuffer:', timeout)
+        try:
+            version = struct.unpack('<I', self._read_exact(sock, 4))[0]
+            if version not in (1, 2):
+                raise AdbClientError(f"不支持的 framebuffer 版本: {version}")
+            field_count = 13 if version == 2 else 12
+            fields = struct.unpack(f'<{field_count}I', self._read_exact(sock, field_count * 4))
+            if version == 2:
+                fields = fields[:1] + fields[2:]  # 去掉 colorspace
+            bpp, size, width, height, red_offset = fields[:5]
+            data = self._read_exact(sock, size)
+        except OSError as e:
+            raise AdbClientError(f"framebuffer: {e}")
+        finally:
+            sock.close()
+
+        if bpp == 16:
+            pixels = np.frombuffer(data, np.uint8, count=width * height * 2).reshape((height, width, 2))
+            return cv2.cvtColor(pixels, cv2.COLOR_BGR5652BGR)
+        if bpp != 32:
+            raise AdbClientError(f"不支持的 framebuffer 像素位数: {bpp}")
+        pixels = np.frombuffer(data, np.uint8, count=width * height * 4).reshape((height, width, 4))
+        if red_offset == 16:
+            return cv2.cvtColor(pixels, cv2.COLOR_BGRA2BGR)
+        return cv2.cvtColor(pixels, cv2.COLOR_RGBA2BGR)
+
+
+# --- 按 server 地址共享的客户端 ---
+g_clients = {}
+g_clients_lock = threading.Lock()
+
+
+def get_client(host=None, port=None):
+    """获取（必要时创建）连接到指定 adb server 的客户端；端口默认取 ANDROID_ADB_SERVER_PORT 或 5037。"""
+    key = (host or DEFAULT_HOST, int(port or os.environ.get('ANDROID_ADB_SERVER_PORT') or DEFAULT_PORT))
+    with g_clients_lock:
+        client = g_clients.get(key)
+        if client is None:
+            client = AdbClient(*key)
+            g_clients[key] = client
+        return client
@@ -0,0 +1,222 @@
+# common/AdbShellSession.py
+import os
+import queue
+import socket
+import subprocess
+import threading
+import uuid
+
+from common.AdbClient import AdbClientError
+
+
+class AdbShellError(Exception):
+    """常驻 shell 通道本身出错（进程退出、超时等），与命令自身的返回码无关。"""
+    pass
+
+
+class AdbShellReadError(AdbShellError):
+    """命令已写入后等待输出失败（超时或通道断开）。命令可能已在设备上执行，调用方不应再重发。"""
+    pass
+
+
+class AdbShellSession:
+    """
+    为单个设备维护一个常驻的 `adb shell` 进程。
+    - 命令通过 stdin 逐条写入，每条命令后追加一行带返回码的哨兵，读到哨兵即视为该命令输出结束。
+    - 通道断开或超时后，下一次调用会自动重新建立连接。
+    """
+
+    def __init__(self, adb_path, device_serial, timeout=10.0, log_callback=None):
+        self.log = log_callback if log_callback else print
+
+        self.adb_path = adb_path
+        self.device_serial = device_serial
+        self.timeout = timeout
+
+        self.process = None
+        self._lines = None
+        self._reader_thread = None
+        self._reader_closed = None  # 读取线程读到 EOF（对端关闭）时置位
+        self._marker = f"__HANBLY_{uuid.uuid4().hex}__"
+        self.lock = threading.Lock()
+
+    def _build_command(self):
+        command = [self.adb_path]
+        if self.device_serial:
+            command += ['-s', self.device_serial]
+        command.append('shell')
+        return command
+
+    def _spawn(self):
+        adb_directory = os.path.dirname(self.adb_path) or None
+        self.process = subprocess.Popen(
+            self._build_command(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=adb_directory,
+            creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+        )
+        self._start_reader(self.process.stdout)
+
+    def _start_reader(self, stream):
+        self._lines = queue.Queue()
+        self._reader_closed = threading.Event()
+        self._reader_thread = threading.Thread(target=self._read_loop, args=(stream, self._lines, self._reader_closed),
+                                               daemon=True)
+        self._reader_thread.start()
+
+    @staticmethod
+    def _read_loop(stream, lines, closed):
+        # 独立线程负责读取，主线程才能对单条命令设置超时
+        try:
+            for line in iter(stream.readline, b''):
+                lines.put(line)
+        except (OSError, ValueError):
+            pass
+        finally:
+            closed.set()
+            lines.put(None)
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def _ensure_connected(self):
+        if not self.is_alive():
+            self._close_process()
+            self._spawn()
+
+    def _close_process(self):
+        if self.process is None:
+            return
+        try:
+            if self.process.poll() is None:
+                try:
+                    self.process.stdin.write(b"exit\n")
+                    self.process.stdin.flush()
+                    self.process.wait(timeout=1)
+                except (OSError, ValueError, subprocess.TimeoutExpired):
+                    self.process.kill()
+        finally:
+            self.process = None
+            self._lines = None
+            self._reader_thread = None
+
+    def _write(self, data):
+        self.process.stdin.write(data)
+        self.process.stdin.flush()
+
+    def execute(self, command, timeout=None):
+        """
+        在常驻 shell 中执行一条命令。
+        :return: (返回码, 输出文本)
+        :raises AdbShellError: 连接或写入失败，命令未送达（此时连接已被丢弃，下次调用会自动重连）
+        :raises AdbShellReadError: 命令已写入，但读取输出时超时或通道断开
+        """
+        timeout = self.timeout if timeout is None else timeout
+        with self.lock:
+            self._ensure_connected()
+            # 先保存返回码，再补一个换行，保证哨兵一定独占一行
+            payload = f"{command}\n__rc=$?; echo; echo {self._marker} $__rc\n"
+            try:
+                self._write(payload.encode('utf-8'))
+            except (OSError, ValueError) as e:
+                self._close_process()
+                raise AdbShellError(f"写入 adb shell 失败: {e}")
+
+            output = []
+            while True:
+                try:
+                    line = self._lines.get(timeout=timeout)
+                except queue.Empty:
+                    self._close_process()
+                    raise AdbShellReadError(f"等待命令输出超时 ({timeout}s): {command}")
+                if line is None:
+                    self._close_process()
+                    raise AdbShellReadError(f"adb shell 进程已退出: {command}")
+
+                text = line.decode('utf-8', errors='ignore').rstrip('\r\n')
+                if text.startswith(self._marker):
+                    try:
+                        return_code = int(text[len(self._marker):].strip())
+                    except ValueError:
+                        return_code = -1
+                    return return_code, '\n'.join(output)
+                output.append(text)
+
+    def close(self):
+        with self.lock:
+            self._close_process()
+
+
+class AdbSocketShellSession(AdbShellSession):
+    """
+    与 AdbShellSession 相同的常驻 shell，但直接通过 adb server 协议（AdbClient）打开 shell 流，不需要 adb 进程。
+    使用 `shell,raw:` 服务：不分配 pty，输入不会回显，换行也不会被改写成 CRLF（需要 Android 7 及以上）。
+    """
+
+    def __init__(self, client, device_serial, timeout=10.0, log_callback=None):
+        super().__init__(None, device_serial, timeout, log_callback)
+        self.client = client
+        self.stream = None
+
+    def _spawn(self):
+        try:
+            self.stream = self.client.open_stream(self.device_serial, 'shell,raw:')
+        except AdbClientError as e:
+            raise AdbShellError(f"无法通过 adb server 打开 shell: {e}")
+        # 命令自身的超时由 execute 控制，读取线程阻塞等待即可
+        self.stream.settimeout(None)
+        self._start_reader(self.stream.makefile('rb'))
+
+    def is_alive(self):
+        # adb server 或设备关闭了 shell 流时读取线程会读到 EOF，写入前据此重新连接，而不是把命令写进断开的连接
+        return self.stream is not None and not self._reader_closed.is_set()
+
+    def _write(self, data):
+        self.stream.sendall(data)
+
+    def _close_process(self):
+        if self.stream is None:
+            return
+        try:
+            self.stream.sendall(b"exit\n")
+            # makefile() 持有底层连接的引用，先 shutdown 才能让读取线程立即结束
+            self.stream.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        finally:
+            self.stream.close()
+            self.stream = None
+            self._lines = None
+            self._reader_thread = None
+
+
+# --- 按设备复用的会话池 ---
+g_sessions = {}
+g_sessions_lock = threading.Lock()
+
+
+def get_session(adb_path, device_serial, client=None):
+    """
+    获取（必要时创建）某台设备的常驻 shell 会话。
+    给出 client（AdbClient）时返回直接走 adb server 协议的会话，否则返回基于 adb 进程的会话。
+    """
+    key = (adb_path, device_serial) if client is None else (client.address, device_serial)
+    with g_sessions_lock:
+        session = g_sessions.get(key)
+        if session is None:
+            if client is None:
+                session = AdbShellSession(adb_path, device_serial)
+            else:
+                session = AdbSocketShellSession(client, device_serial)
+            g_sessions[key] = session
+        return session
+
+
+def close_all_sessions():
+    with g_sessions_lock:
+        sessions = list(g_sessions.values())
+        g_sessions.clear()
+    for session in sessions:
+        session.close()
@@ -0,0 +1,117 @@
+# common/Clock.py
+"""
+脚本逻辑使用的时钟。utils.py 与 scripts/ 中所有等待、超时与计时都通过模块级的 clock 完成，
+默认是真实时间；基准测试可用 set_clock(SimulatedClock()) 换成虚拟时间，sleep 立即返回并推进虚拟时间，
+配合假 adb（benchmarks/fake_adb）即可在几秒内跑完数小时的脚本逻辑与超时分支。
+"""
+import threading
+import time
+from datetime import datetime
+
+
+class RealClock:
+    """真实时间。"""
+
+    simulated = False
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def now(self):
+        return datetime.now()
+
+
+class SimulatedClock:
+    """
+    虚拟时间：sleep 不阻塞，直接把虚拟时间向前推进。
+    include_real_time=True（默认）时，两次 sleep 之间真实流逝的时间（ADB 调用、图像匹配等）也计入虚拟时间，
+    既保留了真实的处理开销，也保证没有 sleep 的轮询循环仍会走到超时；为 False 时虚拟时间只随 sleep 前进。
+    多个线程共用同一条时间线，任一线程的 sleep 都会推进所有线程看到的时间。
+    """
+
+    simulated = True
+
+    def __init__(self, start=None, include_real_time=True, on_advance=None):
+        """
+        :param start: 虚拟时间起点（time.time() 格式），默认取当前真实时间
+        :param on_advance: 每次 sleep 推进时间后的回调 on_advance(虚拟时间 - 真实时间)，
+                           用于把时间偏移同步给假设备等外部组件
+        """
+        self._start = time.time() if start is None else start
+        self._real_origin = time.monotonic()
+        self._skipped = 0.0  # sleep 累计跳过的秒数
+        self.include_real_time = include_real_time
+        self.on_advance = on_advance
+        self.lock = threading.Lock()
+        if on_advance:
+            on_advance(self.time() - time.time())
+
+    def _elapsed(self):
+        real_elapsed = time.monotonic() - self._real_origin if self.include_real_time else 0.0
+        return real_elapsed + self._skipped
+
+    def time(self):
+        with self.lock:
+            return self._start + self._elapsed()
+
+    def monotonic(self):
+        with self.lock:
+            return self._elapsed()
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def now(self):
+        return datetime.fromtimestamp(self.time())
+
+    def advance(self, seconds):
+        if seconds <= 0:
+            return
+        with self.lock:
+            self._skipped += seconds
+        if self.on_advance:
+            self.on_advance(self.time() - time.time())
+
+
+class ClockProxy:
+    """转发到当前生效的时钟，各模块在导入时拿到的 clock 对象在 set_clock 之后依然有效。"""
+
+    def __init__(self, target):
+        self.target = target
+
+    @property
+    def simulated(self):
+        """当前是否为虚拟时钟（sleep 不真实等待）。"""
+        return getattr(self.target, 'simulated', False)
+
+    def time(self):
+        return self.target.time()
+
+    def monotonic(self):
+        return self.target.monotonic()
+
+    def sleep(self, seconds):
+        self.target.sleep(seconds)
+
+    def now(self):
+        return self.target.now()
+
+
+clock = ClockProxy(RealClock())
+
+
+def set_clock(new_clock):
+    """切换全局时钟，传 None 恢复真实时间。返回之前生效的时钟。"""
+    previous = clock.target
+    clock.target = new_clock if new_clock is not None else RealClock()
+    return previous
+
+
+def get_clock():
+    return clock.target
@@ -0,0 +1,160 @@
+# common/DetectionPool.py
+"""
+多进程模板匹配后端：多台设备在同一进程中运行时，各自的模板匹配、颜色转换都在争抢同一个 GIL。
+DetectionPool 把匹配交给若干工作进程，每台设备一块共享内存（multiprocessing.shared_memory）存放当前帧，
+主进程只写入像素并发送模板名等少量参数，工作进程直接在共享内存上构造图像并匹配，只把匹配结果传回。
+
+两种用法：
+    共享进程池：pool = DetectionPool(processes=4)，所有设备共用，按 pool.client(device_serial) 取各自的客户端
+    每设备一个进程：每台设备各建一个 DetectionPool(processes=1)
+客户端与 MatchingEngine 有相同的 match / match_many / find 接口，通过 utils.set_detection_backend 按设备启用。
+工作进程使用与主进程相同配置的 utils.g_matching_engine（模板各自加载一次，ROI 结果缓存也在工作进程内生效）。
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+from common.Frame import Frame
+from common.MatchingEngine import MatchingEngine
+
+# 工作进程最多同时保持映射的共享内存块数；客户端换帧尺寸时会新建共享内存，旧的由这里淘汰
+WORKER_ATTACHED_LIMIT = 32
+
+g_worker_engine = None
+g_worker_attached = OrderedDict()  # 共享内存名 -> SharedMemory（工作进程内）
+
+
+def _init_worker(engine_options):
+    global g_worker_engine
+    from common.utils import g_matching_engine
+    g_worker_engine = g_matching_engine
+    for name, value in engine_options.items():
+        setattr(g_worker_engine, name, value)
+
+
+def _attach(name):
+    shm = g_worker_attached.get(name)
+    if shm is None:
+        shm = shared_memory.SharedMemory(name=name)
+        g_worker_attached[name] = shm
+        while len(g_worker_attached) > WORKER_ATTACHED_LIMIT:
+            g_worker_attached.popitem(last=False)[1].close()
+    else:
+        g_worker_attached.move_to_end(name)
+    return shm
+
+
+def _worker_run(name, shape, dtype, frame_id, method, args):
+    """在工作进程中执行 g_worker_engine.<method>(frame, *args)，frame 直接引用共享内存。"""
+    shm = _attach(name)
+    image = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    return getattr(g_worker_engine, method)(Frame(image, frame_id), *args)
+
+
+class DetectionPool:
+    """管理匹配工作进程，并为每台设备分配共享内存帧槽。"""
+
+    def __init__(self, processes=None, engine_options=None):
+        """
+        :param processes: 工作进程数，默认等于 CPU 核数
+        :param engine_options: 覆盖工作进程中匹配引擎的属性，例如 {'debug': False, 'skip_unchanged': False}
+        """
+        self.processes = processes or os.cpu_count() or 1
+        # 统一使用 spawn：与 Windows 下的行为一致，也避免 fork 带走主进程中运行的线程与锁
+        self.executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=get_context('spawn'),
+                                            initializer=_init_worker, initargs=(engine_options or {},))
+        self.clients = {}
+        self.lock = threading.Lock()
+
+    def client(self, device_serial):
+        """取得（或创建）某台设备的客户端。"""
+        with self.lock:
+            client = self.clients.get(device_serial)
+            if client is None:
+                client = DetectionClient(self, device_serial)
+                self.clients[device_serial] = client
+            return client
+
+    def submit(self, name, shape, dtype, frame_id, method, args):
+        return self.executor.submit(_worker_run, name, shape, dtype, frame_id, method, args)
+
+    def warm_up(self, image_folder=None):
+        """启动全部工作进程（可选预加载模板），避免第一次匹配时才付出进程启动与模板加载的开销。"""
+        from common.utils import preload_templates
+        if image_folder:
+            futures = [self.executor.submit(preload_templates, image_folder) for _ in range(self.processes)]
+        else:
+            futures = [self.executor.submit(int) for _ in range(self.processes)]
+        for future in futures:
+            future.result()
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        with self.lock:
+            for client in self.clients.values():
+                client.release()
+            self.clients.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class DetectionClient:
+    """
+    一台设备的多进程匹配入口，接口与 MatchingEngine 相同。
+    同一客户端的调用是串行的（帧槽只有一块）；不同设备的客户端之间互不阻塞，由进程池并行处理。
+    """
+
+    def __init__(self, pool, device_serial):
+        self.pool = pool
+        self.device_serial = device_serial
+        self.shm = None
+        self.lock = threading.Lock()
+
+    def _ensure_slot(self, nbytes):
+        if self.shm is not None and self.shm.size >= nbytes:
+            return
+        self.release()
+        self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+
+    def _call(self, frame, method, args):
+        frame = Frame.wrap(frame)
+        image = np.ascontiguousarray(frame.image)
+        with self.lock:
+            self._ensure_slot(image.nbytes)
+            np.ndarray(image.shape, dtype=image.dtype, buffer=self.shm.buf)[...] = image
+            future = self.pool.submit(self.shm.name, image.shape, image.dtype.str, frame.frame_id, method, args)
+            # 结果返回前不能释放帧槽，下一帧要等工作进程读完这一帧
+            return future.result()
+
+    def match(self, frame, template_name, image_folder, confidence_threshold=0.8, is_legend=False, color_mode=None,
+              pyramid_level=None, location_key=None):
+        if frame is None:
+            return None
+        return self._call(frame, 'match', (template_name, image_folder, confidence_threshold, is_legend, color_mode,
+                                           pyramid_level, location_key))
+
+    def match_many(self, frame, templates, image_folder, confidence_threshold=0.8, is_legend=False, color_mode=None,
+                   location_key=None):
+        if frame is None:
+            return {}
+        return self._call(frame, 'match_many', (templates, image_folder, confidence_threshold, is_legend,
+                                                color_mode, location_key))
+
+    def find(self, frame_source, template_name, image_folder, confidence_threshold=0.8, is_legend=False,
+             color_mode=None, location_key=None):
+        return self.match(MatchingEngine.read_frame(frame_source), template_name, image_folder, confidence_threshold,
+                          is_legend, color_mode, location_key=location_key)
+
+    def release(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
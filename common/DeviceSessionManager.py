@@ -0,0 +1,165 @@
+# common/DeviceSessionManager.py
+"""
+多设备并行运行脚本：每台设备一个 DeviceSession，各自拥有独立的脚本实例、停止事件、日志通道、
+Appium driver 与计数；截图管理器等由脚本实例在自己的线程里创建，同样互不共享。
+识别与 ADB 通信大部分时间不持有 GIL（OpenCV 与 socket/子进程 I/O），总吞吐随设备数增长。
+"""
+import threading
+import traceback
+from collections import deque
+
+from common.Clock import clock
+
+STATUS_PENDING = '等待中'
+STATUS_CONNECTING = '连接中'
+STATUS_RUNNING = '运行中'
+STATUS_STOPPING = '正在停止'
+STATUS_FINISHED = '已结束'
+STATUS_ERROR = '出错'
+
+LOG_HISTORY = 200
+
+
+class DeviceSession:
+    """一台设备上的一次脚本运行。"""
+
+    def __init__(self, device_serial, script_class, options, driver_factory=None, log_callback=None):
+        """
+        :param options: 脚本配置，device_serial 会被替换为本设备
+        :param driver_factory: driver_factory(device_serial, options) -> Appium driver，None 表示不需要 driver
+        :param log_callback: 汇总日志的回调，消息带有 [设备序列号] 前缀
+        """
+        self.device_serial = device_serial
+        self.script_class = script_class
+        self.options = dict(options, device_serial=device_serial)
+        self.driver_factory = driver_factory
+        self.log_callback = log_callback
+
+        self.stop_event = threading.Event()
+        self.status = STATUS_PENDING
+        self.result = None
+        self.started_at = None
+        self.finished_at = None
+        self.logs = deque(maxlen=LOG_HISTORY)
+        self.script = None
+        self.driver = None
+        self.thread = None
+
+    def log(self, message):
+        message = str(message)
+        self.logs.append(message)
+        if self.log_callback:
+            self.log_callback(f"[{self.device_serial}] {message}")
+
+    @property
+    def last_message(self):
+        return self.logs[-1] if self.logs else ''
+
+    @property
+    def rounds(self):
+        return self.script.rounds if self.script is not None else 0
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or clock.time()) - self.started_at
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        self.stop_event.clear()
+        self.status = STATUS_CONNECTING if self.driver_factory else STATUS_RUNNING
+        self.started_at, self.finished_at = clock.time(), None
+        self.thread = threading.Thread(target=self._run, daemon=True, name=f"session-{self.device_serial}")
+        self.thread.start()
+
+    def stop(self):
+        if self.is_running():
+            self.status = STATUS_STOPPING
+            self.log("收到停止请求，将在当前操作后安全退出...")
+        self.stop_event.set()
+
+    def _run(self):
+        try:
+            if self.driver_factory:
+                self.driver = self.driver_factory(self.device_serial, self.options)
+                self.log("设备连接成功！")
+            self.script = self.script_class(self.driver, self.stop_event, self.log)
+            self.status = STATUS_RUNNING if not self.stop_event.is_set() else STATUS_STOPPING
+            self.result = self.script.run(self.options)
+            self.status = STATUS_FINISHED
+            self.log(f"脚本执行完毕，状态: {self.result}")
+        except Exception as e:
+            self.status = STATUS_ERROR
+            self.result = "ERROR"
+            self.log(f"线程发生致命错误: {e}")
+            self.log(traceback.format_exc())
+        finally:
+            self.finished_at = clock.time()
+            if self.driver is not None:
+                try:
+                    self.driver.quit()
+                except Exception as e:
+                    self.log(f"关闭driver时出错: {e}")
+                self.driver = None
+
+
+class DeviceSessionManager:
+    """管理所有设备的会话；同一台设备同时只能有一个运行中的会话。"""
+
+    def __init__(self, driver_factory=None, log_callback=None):
+        self.driver_factory = driver_factory
+        self.log = log_callback if log_callback else print
+        self.sessions = {}  # device_serial -> DeviceSession（保留已结束的会话以便查看状态）
+        self.lock = threading.Lock()
+
+    def start(self, device_serials, script_class, options, per_device_options=None):
+        """
+        在每台设备上启动一个独立的脚本实例。
+        :param per_device_options: {device_serial: {配置项: 值}}，覆盖个别设备的配置（例如 GDI 模式的窗口标题）
+        :return: 实际启动的会话列表（已有会话在运行的设备会被跳过）
+        """
+        started = []
+        with self.lock:
+            for serial in device_serials:
+                current = self.sessions.get(serial)
+                if current is not None and current.is_running():
+                    self.log(f"[{serial}] 已有脚本在运行，跳过。")
+                    continue
+                device_options = dict(options, **(per_device_options or {}).get(serial, {}))
+                session = DeviceSession(serial, script_class, device_options, driver_factory=self.driver_factory,
+                                        log_callback=self.log)
+                self.sessions[serial] = session
+                started.append(session)
+        for session in started:
+            session.start()
+        return started
+
+    def stop(self, device_serials=None):
+        """停止指定设备（默认全部）的会话。"""
+        with self.lock:
+            sessions = [s for serial, s in self.sessions.items() if device_serials is None or serial in device_serials]
+        for session in sessions:
+            session.stop()
+
+    def join(self, timeout=None):
+        """等待所有会话结束，返回是否全部结束。"""
+        deadline = clock.monotonic() + timeout if timeout is not None else None
+        for session in list(self.sessions.values()):
+            if session.thread is None:
+                continue
+            remaining = None if deadline is None else max(0.0, deadline - clock.monotonic())
+            session.thread.join(remaining)
+        return not self.any_running()
+
+    def any_running(self):
+        return any(session.is_running() for session in list(self.sessions.values()))
+
+    def snapshot(self):
+        """状态表数据：[(设备, 脚本名, 状态, 已运行秒数, 完成轮数, 最近日志), ...]"""
+        with self.lock:
+            sessions = list(self.sessions.values())
+        return [(s.device_serial, s.script_class.get_name(), s.status, s.elapsed, s.rounds, s.last_message)
+                for s in sessions]
@@ -0,0 +1,99 @@
+# common/DeviceTapLoop.py
+"""
+在设备上后台运行的点击循环：把 InputMacro 编译成 shell 循环推送到设备，用 nohup 脱离当前 shell 运行，
+之后每次点击都不再经过主机与 adb，主机只负责启动、查询与停止。
+适合抽转蛋、战斗中反复出击这类不需要识别画面的重复点击。
+
+设备端文件都在 /data/local/tmp/hanbly_<name>.* 下：
+    .pid    循环进程的 pid，停止时 kill
+    .stop   存在即退出循环（kill 失败时的兜底）
+    .count  已完成的循环次数
+"""
+from common.Clock import clock
+
+DEVICE_DIR = '/data/local/tmp'
+
+
+class DeviceTapLoop:
+    """
+    用法:
+        loop = DeviceTapLoop(adb_path, device_serial, InputMacro().tap(1565, 906).sleep(0.25))
+        loop.start()
+        running, iterations = loop.status()
+        loop.stop()
+    或者 loop.run_until(stop_event)：启动后定期查询，stop_event 置位、次数达到上限或循环异常退出时停止并返回。
+    """
+
+    def __init__(self, adb_path, device_serial, macro, name='tap_loop', max_iterations=0, log_callback=None):
+        """
+        :param macro: 每轮循环执行的 InputMacro
+        :param max_iterations: 循环次数上限，0 表示一直运行到 stop()
+        """
+        self.log = log_callback if log_callback else print
+
+        self.adb_path = adb_path
+        self.device_serial = device_serial
+        self.macro = macro
+        self.max_iterations = max_iterations
+        self.base_path = f"{DEVICE_DIR}/hanbly_{name}"
+
+    def _shell(self, command):
+        # 脚本里的 $n、$!、$(cat ...) 必须在设备上展开，不能交给主机的 shell
+        from common.utils import run_adb_shell
+        return run_adb_shell(self.adb_path, self.device_serial, command)
+
+    def _loop_script(self):
+        from common.utils import get_touch_injector
+        body = self.macro.compile(get_touch_injector(self.adb_path, self.device_serial))
+        condition = f"[ ! -f {self.base_path}.stop ]"
+        if self.max_iterations > 0:
+            condition += f" && [ $n -lt {int(self.max_iterations)} ]"
+        return f"n=0; while {condition}; do {body}; n=$((n+1)); echo $n > {self.base_path}.count; done"
+
+    def start(self):
+        """启动设备端循环；已有同名循环在运行时先将其停止。"""
+        if not len(self.macro):
+            raise ValueError("点击循环的宏为空")
+        self.stop()
+        base = self.base_path
+        self._shell(f"rm -f {base}.stop {base}.count; "
+                    f"nohup sh -c '{self._loop_script()}' > /dev/null 2>&1 & echo $! > {base}.pid")
+        self.log(f"设备端点击循环已启动（{base}）。")
+
+    def stop(self):
+        """停止设备端循环：kill 循环进程，并留下 stop 文件确保循环在当前一轮结束后退出。"""
+        base = self.base_path
+        self._shell(f"touch {base}.stop; [ -f {base}.pid ] && kill $(cat {base}.pid) 2>/dev/null; rm -f {base}.pid; true")
+
+    def status(self):
+        """:return: (是否在运行, 已完成的循环次数)"""
+        base = self.base_path
+        output = self._shell(f"cat {base}.count 2>/dev/null || echo 0; "
+                             f"[ -f {base}.pid ] && kill -0 $(cat {base}.pid) 2>/dev/null && echo running; true")
+        lines = (output or '').split()
+        try:
+            iterations = int(lines[0]) if lines else 0
+        except ValueError:
+            iterations = 0
+        return 'running' in lines, iterations
+
+    def is_running(self):
+        return self.status()[0]
+
+    def run_until(self, stop_event, poll_interval=1.0):
+        """
+        启动循环并阻塞等待：频繁检查 stop_event，每 poll_interval 秒查询一次设备端状态。
+        :return: 已完成的循环次数
+        """
+        self.start()
+        next_poll = clock.monotonic() + poll_interval
+        try:
+            while not stop_event.is_set():
+                clock.sleep(0.1)
+                if clock.monotonic() >= next_poll:
+                    if not self.is_running():
+                        break
+                    next_poll = clock.monotonic() + poll_interval
+        finally:
+            self.stop()
+        return self.status()[1]
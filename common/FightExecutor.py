@@ -0,0 +1,102 @@
+# common/FightExecutor.py
+"""
+战斗中的出击点击与战斗结束检测并行进行：后台线程按出击顺序循环点击，调用线程持续截图检测 return_map，
+一旦检测到就取消点击。检测不再夹在每次点击之间，点击也不会在战斗结束后还把一整轮打完。
+点击走常驻 shell，截图走 exec-out/screencap，两者互不阻塞。
+"""
+import threading
+
+from common.Clock import clock
+from common.utils import adb_tap, get_tap_interval, if_image_on_screen
+
+# 两次检测之间的最短间隔；ADB 截图本身就比这慢，主要防止自定义的快速检测函数空转
+MIN_DETECT_INTERVAL = 0.05
+
+
+class FightExecutor:
+    """
+    出击点击与战斗结束检测并行：点击在后台线程中循环进行，主线程检测到 end_template 即结束战斗。
+    用法:
+        FightExecutor(adb_path, device_serial, image_folder).run(positions_to_tap, self.stop_event)
+    """
+
+    def __init__(self, adb_path, device_serial, image_folder, end_template="return_map", confidence_threshold=0.7,
+                 tap_interval=None, timeout=None, detector=None, capture_manager=None, log_callback=None):
+        """
+        :param tap_interval: 相邻两次出击点击的间隔，默认按设备触摸模式取 utils.get_tap_interval
+        :param timeout: 战斗最长持续时间（秒），None 表示不限
+        :param detector: 自定义的战斗结束检测函数（无参数，返回 bool），默认用 ADB 截图匹配 end_template
+        :param capture_manager: 已启动的截图管理器；给出时订阅 end_template，由截图线程在每一帧上检测，
+                                检测到的那一帧就结束战斗，不再另外截图
+        """
+        self.log = log_callback if log_callback else print
+
+        self.adb_path = adb_path
+        self.device_serial = device_serial
+        self.tap_interval = get_tap_interval(device_serial) if tap_interval is None else tap_interval
+        self.timeout = timeout
+        self.capture_manager = capture_manager
+        self.end_template = end_template
+        self.image_folder = image_folder
+        self.confidence_threshold = confidence_threshold
+        self.subscription = None
+        if capture_manager is not None and detector is None:
+            detector = self._subscription_detector
+        self.detector = detector or (lambda: if_image_on_screen(adb_path, device_serial, end_template, image_folder,
+                                                                confidence_threshold=confidence_threshold))
+        self.taps = 0
+        self.cancel_event = threading.Event()
+
+    def _subscription_detector(self):
+        return self.subscription.wait(timeout=MIN_DETECT_INTERVAL) is not None
+
+    def _tap_loop(self, positions_to_tap):
+        try:
+            while not self.cancel_event.is_set():
+                for pos in positions_to_tap:
+                    if self.cancel_event.is_set():
+                        return
+                    adb_tap(pos[0], pos[1], self.adb_path, self.device_serial)
+                    self.taps += 1
+                    clock.sleep(self.tap_interval)
+        except Exception as e:
+            self.log(f"出击点击线程出错: {e}")
+
+    def run(self, positions_to_tap, stop_event=None):
+        """
+        开始点击并等待战斗结束。
+        :return: 是否检测到战斗结束（被 stop_event 中断或超时返回 False）
+        """
+        self.cancel_event.clear()
+        self.taps = 0
+        if self.capture_manager is not None:
+            self.subscription = self.capture_manager.subscribe(self.end_template, self.image_folder,
+                                                               self.confidence_threshold)
+        worker = None
+        if positions_to_tap:
+            worker = threading.Thread(target=self._tap_loop, args=(positions_to_tap,), daemon=True)
+            worker.start()
+
+        deadline = clock.monotonic() + self.timeout if self.timeout else None
+        finished = False
+        try:
+            while not (stop_event is not None and stop_event.is_set()):
+                started = clock.monotonic()
+                if self.detector():
+                    finished = True
+                    break
+                if deadline is not None and clock.monotonic() > deadline:
+                    self.log(f"警告: 战斗超过 {self.timeout} 秒仍未结束。")
+                    break
+                remaining = MIN_DETECT_INTERVAL - (clock.monotonic() - started)
+                if remaining > 0:
+                    clock.sleep(remaining)
+        finally:
+            if self.subscription is not None:
+                self.subscription.cancel()
+                self.subscription = None
+            self.cancel_event.set()
+            if worker is not None:
+                # 最多等正在进行的一次点击结束，保证返回后不会再有出击点击落到结算画面上
+                worker.join(timeout=5)
+        return finished
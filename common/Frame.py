@@ -0,0 +1,109 @@
+# common/Frame.py
+import itertools
+import threading
+import zlib
+
+import cv2
+import numpy as np
+
+g_frame_ids = itertools.count(1)
+
+
+class Frame:
+    """
+    一帧截图及其派生图像的缓存。
+    灰度图、ROI 裁剪、金字塔缩小图都在第一次用到时计算并保存，同一帧上匹配多个模板时每种转换最多只做一次。
+    匹配接口同时接受 Frame 与普通的 numpy 图像；需要在同一帧上多次匹配时，先包装成 Frame 再传入。
+    """
+
+    COLOR_MODE_COLOR = 'color'
+    COLOR_MODE_GRAY = 'gray'
+
+    def __init__(self, image, frame_id=None):
+        """
+        :param image: BGR 或灰度图像，包装后不应再被原地修改
+        :param frame_id: 帧编号，省略时自动分配一个进程内唯一的递增编号
+        """
+        self.image = image
+        self.frame_id = frame_id if frame_id is not None else next(g_frame_ids)
+        self.height, self.width = image.shape[:2]
+
+        self._views = {}
+        self._crops = {}
+        self._pyramids = {}
+        self._checksums = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def wrap(cls, frame):
+        """把 numpy 图像包装成 Frame；已经是 Frame 或为 None 时原样返回。"""
+        if frame is None or isinstance(frame, Frame):
+            return frame
+        return cls(frame)
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    @property
+    def gray(self):
+        return self.view(self.COLOR_MODE_GRAY)
+
+    def view(self, color_mode):
+        """整帧的彩色或灰度版本。"""
+        view = self._views.get(color_mode)
+        if view is None:
+            with self.lock:
+                view = self._views.get(color_mode)
+                if view is None:
+                    view = self._convert(color_mode)
+                    self._views[color_mode] = view
+        return view
+
+    def _convert(self, color_mode):
+        if color_mode == self.COLOR_MODE_COLOR:
+            return self.image if self.image.ndim == 3 else cv2.cvtColor(self.image, cv2.COLOR_GRAY2BGR)
+        return cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY) if self.image.ndim == 3 else self.image
+
+    def crop(self, color_mode, roi):
+        """
+        :param roi: (x1, y1, x2, y2)，已按当前分辨率缩放
+        """
+        key = (color_mode, roi)
+        crop = self._crops.get(key)
+        if crop is None:
+            x1, y1, x2, y2 = roi
+            crop = self.view(color_mode)[y1:y2, x1:x2]
+            self._crops[key] = crop
+        return crop
+
+    def pyramid(self, color_mode, roi, level):
+        """ROI 裁剪缩小到 1/2^level 后的图像；level 为 0 时就是裁剪本身。"""
+        if level <= 0:
+            return self.crop(color_mode, roi)
+        key = (color_mode, roi, level)
+        small = self._pyramids.get(key)
+        if small is None:
+            crop = self.crop(color_mode, roi)
+            factor = 1 << level
+            small = cv2.resize(crop, (crop.shape[1] // factor, crop.shape[0] // factor),
+                               interpolation=cv2.INTER_AREA)
+            with self.lock:
+                small = self._pyramids.setdefault(key, small)
+        return small
+
+    def checksum(self, roi):
+        """
+        ROI 的变化指纹：对原图 ROI 的全部像素计算 CRC32（任何一个像素变化都会反映出来）。
+        两帧同一 ROI 的校验和相同即视为画面未变化，匹配引擎据此复用上一次的匹配结果。
+        CRC32 只受内存带宽限制，整帧 ROI 约 2 毫秒，仍远低于它省下的匹配。
+        """
+        value = self._checksums.get(roi)
+        if value is None:
+            x1, y1, x2, y2 = roi
+            value = zlib.crc32(np.ascontiguousarray(self.image[y1:y2, x1:x2]))
+            self._checksums[roi] = value
+        return value
+
+    def __repr__(self):
+        return f"Frame(id={self.frame_id}, {self.width}x{self.height})"
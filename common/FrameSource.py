@@ -0,0 +1,251 @@
+# common/FrameSource.py
+"""
+统一的画面来源接口：start() / stop() / get_latest_frame()，与 ScreenCaptureManager、AdbCaptureManager 一致，
+识别函数（if_image_on_screen_GDI、MatchingEngine.find 等）可以直接使用任意一种来源。
+
+- GdiFrameSource:            Windows GDI 窗口截图（仅 Windows，使用时才导入 pywin32）
+- AdbRawFrameSource:         ADB 原始帧截图（exec-out screencap）
+- AdbPngFrameSource:         ADB PNG 截图（screencap -p）
+- AdbFramebufferFrameSource: 直连 adb server 的 framebuffer: 服务截图（common/AdbClient.py，不需要 adb 进程）
+- ImageDirectoryFrameSource: 按文件名顺序回放目录中的截图
+- VideoFrameSource:          逐帧回放录屏视频（cv2.VideoCapture）
+
+录制的画面可通过 utils.set_frame_source 替换某台设备的 ADB 截图，脚本与识别流程即可在任何平台离线全速运行。
+"""
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import cv2
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+class FrameSource(ABC):
+    """画面来源基类。子类至少实现 get_latest_frame()；start()/stop() 默认什么都不做。"""
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    @abstractmethod
+    def get_latest_frame(self):
+        pass
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+class GdiFrameSource(FrameSource):
+    """Windows GDI 截图，委托给 ScreenCaptureManager。"""
+
+    def __init__(self, window_title=None, class_name=None, log_callback=None):
+        from common.ScreenCaptureManager import ScreenCaptureManager
+        self.manager = ScreenCaptureManager(window_title, class_name, log_callback=log_callback)
+
+    def start(self):
+        self.manager.start()
+
+    def stop(self):
+        self.manager.stop()
+
+    def get_latest_frame(self):
+        return self.manager.get_latest_frame()
+
+
+class AdbFrameSource(FrameSource):
+    """
+    ADB 截图来源。background=True 时由 AdbCaptureManager 在后台线程持续截图，
+    否则每次 get_latest_frame() 同步截一张。
+    """
+
+    def __init__(self, adb_path, device_serial, background=False, log_callback=None):
+        self.adb_path = adb_path
+        self.device_serial = device_serial
+        self.manager = None
+        if background:
+            from common.AdbCaptureManager import AdbCaptureManager
+            self.manager = AdbCaptureManager(adb_path, device_serial, log_callback=log_callback,
+                                             capture_callable=self.capture_frame)
+
+    @abstractmethod
+    def capture_frame(self):
+        """同步截取一帧，由具体的截图方式实现。"""
+        pass
+
+    def start(self):
+        if self.manager:
+            self.manager.start()
+
+    def stop(self):
+        if self.manager:
+            self.manager.stop()
+
+    def get_latest_frame(self):
+        if self.manager:
+            return self.manager.get_latest_frame()
+        return self.capture_frame()
+
+
+class AdbRawFrameSource(AdbFrameSource):
+    def capture_frame(self):
+        from common.utils import get_adb_screenshot_raw_bgr
+        return get_adb_screenshot_raw_bgr(self.adb_path, self.device_serial)
+
+
+class AdbPngFrameSource(AdbFrameSource):
+    def capture_frame(self):
+        from common.utils import get_adb_screenshot_png
+        return get_adb_screenshot_png(self.adb_path, self.device_serial)
+
+
+class AdbFramebufferFrameSource(AdbFrameSource):
+    def capture_frame(self):
+        from common.AdbClient import AdbClientError, get_client
+        try:
+            return get_client().framebuffer(self.device_serial)
+        except AdbClientError as e:
+            print(f"framebuffer 截图失败: {e}")
+            return None
+
+
+class ReplayFrameSource(FrameSource):
+    """
+    录制画面回放的公共逻辑。
+    - fps 为 None：每调用一次 get_latest_frame() 前进一帧，离线全速回放。
+    - fps 给定：按 start() 之后经过的时间选帧，模拟真实的画面节奏。
+    回放结束后 loop=True 从头开始，否则一直返回最后一帧；exhausted 标记是否已经播完。
+    """
+
+    def __init__(self, fps=None, loop=False):
+        self.fps = fps
+        self.loop = loop
+        self.position = 0  # 下一次要返回的帧序号
+        self.exhausted = False
+        self._started_at = None
+        self._last_frame = None
+        self.lock = threading.Lock()
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+    @abstractmethod
+    def _read_frame(self, index):
+        pass
+
+    def start(self):
+        self._started_at = time.monotonic()
+
+    def rewind(self):
+        with self.lock:
+            self.position = 0
+            self.exhausted = False
+            self._last_frame = None
+            self._started_at = time.monotonic()
+
+    def get_latest_frame(self):
+        with self.lock:
+            total = len(self)
+            if total == 0:
+                return None
+
+            if self.fps:
+                if self._started_at is None:
+                    self._started_at = time.monotonic()
+                index = int((time.monotonic() - self._started_at) * self.fps)
+            else:
+                index = self.position
+                self.position += 1
+
+            if index >= total:
+                if self.loop:
+                    index %= total
+                else:
+                    self.exhausted = True
+                    return self._last_frame.copy() if self._last_frame is not None else None
+
+            frame = self._read_frame(index)
+            if frame is not None:
+                self._last_frame = frame
+            return frame.copy() if frame is not None else None
+
+
+class ImageDirectoryFrameSource(ReplayFrameSource):
+    """按文件名顺序回放目录中的截图（png/jpg/bmp），每张图片只解码一次。"""
+
+    def __init__(self, directory, fps=None, loop=False):
+        super().__init__(fps, loop)
+        self.directory = directory
+        self.paths = [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                      if name.lower().endswith(IMAGE_EXTENSIONS)]
+        self._cache = {}
+
+    def __len__(self):
+        return len(self.paths)
+
+    def _read_frame(self, index):
+        frame = self._cache.get(index)
+        if frame is None:
+            frame = cv2.imread(self.paths[index], cv2.IMREAD_COLOR)
+            self._cache[index] = frame
+        return frame
+
+
+class VideoFrameSource(ReplayFrameSource):
+    """逐帧回放录屏视频。fps 为 None 时每次读取前进一帧；给定 fps 时按时间跳帧。"""
+
+    def __init__(self, path, fps=None, loop=False):
+        super().__init__(fps, loop)
+        self.path = path
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise ValueError(f"无法打开视频文件: {path}")
+        self.frame_count = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        self._next_index = 0
+
+    def __len__(self):
+        return self.frame_count
+
+    def _read_frame(self, index):
+        # 顺序读取最快；只有跳帧或循环回到开头时才需要 seek
+        if index != self._next_index:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+        ok, frame = self.capture.read()
+        self._next_index = index + 1
+        return frame if ok else None
+
+    def stop(self):
+        self.capture.release()
+
+
+def open_frame_source(spec, adb_path=None, **kwargs):
+    """
+    根据描述字符串创建画面来源，便于命令行工具使用：
+        dir:<目录>、video:<文件>、adb-raw:<设备序列号>、adb-png:<设备序列号>、adb-fb:<设备序列号>、gdi:<窗口标题>
+    不带前缀时按路径类型推断：目录视为截图目录，文件视为视频。
+    """
+    kind, _, target = spec.partition(':')
+    if not target or len(kind) == 1:  # 没有前缀，或是 Windows 盘符（如 D:\\...）
+        kind, target = ('dir' if os.path.isdir(spec) else 'video'), spec
+
+    if kind == 'dir':
+        return ImageDirectoryFrameSource(target, **kwargs)
+    if kind == 'video':
+        return VideoFrameSource(target, **kwargs)
+    if kind == 'adb-raw':
+        return AdbRawFrameSource(adb_path, target, **kwargs)
+    if kind == 'adb-png':
+        return AdbPngFrameSource(adb_path, target, **kwargs)
+    if kind == 'adb-fb':
+        return AdbFramebufferFrameSource(adb_path, target, **kwargs)
+    if kind == 'gdi':
+        return GdiFrameSource(target, **kwargs)
+    raise ValueError(f"未知的画面来源类型: {kind}")
@@ -0,0 +1,150 @@
+# common/FrameSubscriptions.py
+"""
+模板出现订阅：脚本登记关心的模板，截图线程每截到一帧就只评估这些模板，
+模板出现时通过回调或队列把事件（含帧序号）推给脚本，脚本不必再自己取帧、同步匹配。
+事件是边沿触发的：模板从“不在画面上”变为“在画面上”的那一帧产生一次事件，持续存在不会重复推送。
+模板的搜索区域沿用 ROIS_tw / ROIS_jp 中的配置。
+"""
+import threading
+from queue import Queue, Empty
+
+from common.Clock import clock
+from common.Frame import Frame
+
+
+class TemplateEvent:
+    def __init__(self, template_name, center, score, frame_id, timestamp):
+        self.template_name = template_name
+        self.center = center
+        self.score = score
+        self.frame_id = frame_id  # 截图管理器的帧序号
+        self.timestamp = timestamp  # 产生事件时的 clock.time()
+
+    def __repr__(self):
+        return f"TemplateEvent({self.template_name!r}, center={self.center}, frame={self.frame_id})"
+
+
+class Subscription:
+    """
+    一组模板的订阅。没有回调时事件进入队列，由 poll() / wait() 取出。
+    用法:
+        with capture_manager.subscribe(["YES"], image_folder, 0.8) as sub:
+            event = sub.wait(timeout=10, stop_event=self.stop_event)
+    """
+
+    def __init__(self, owner, templates, image_folder, confidence_threshold=0.8, is_legend=False, color_mode=None,
+                 callback=None, location_key=None):
+        """
+        :param templates: 模板列表，元素为模板名或 (模板名, is_legend)
+        :param confidence_threshold: 统一阈值，或 {模板名: 阈值} 字典
+        :param color_mode: 匹配方式，None 表示匹配引擎的默认方式（灰度，与 *_GDI 识别函数一致）
+        :param callback: callback(TemplateEvent)，在截图线程中调用，应尽快返回
+        :param location_key: 匹配引擎位置记忆的区分键（通常是设备序列号）
+        """
+        self.owner = owner
+        self.templates = [templates] if isinstance(templates, (str, tuple)) else list(templates)
+        self.image_folder = image_folder
+        self.confidence_threshold = confidence_threshold
+        self.is_legend = is_legend
+        self.color_mode = color_mode
+        self.callback = callback
+        self.location_key = location_key
+        self.events = Queue()
+        self.present = set()  # 上一帧中在画面上的模板
+        self.last_frame_id = None
+
+    def evaluate(self, engine, frame):
+        hits = engine.match_many(frame, self.templates, self.image_folder, self.confidence_threshold, self.is_legend,
+                                 self.color_mode, location_key=self.location_key)
+        self.last_frame_id = frame.frame_id
+        now = clock.time()
+        for template_name, (center, score) in hits.items():
+            if template_name in self.present:
+                continue
+            event = TemplateEvent(template_name, center, score, frame.frame_id, now)
+            if self.callback:
+                self.callback(event)
+            else:
+                self.events.put(event)
+        self.present = set(hits)
+
+    def poll(self):
+        """取出一个事件，没有时立即返回 None。"""
+        try:
+            return self.events.get_nowait()
+        except Empty:
+            return None
+
+    def wait(self, timeout=None, stop_event=None, check_interval=0.1):
+        """
+        等待下一个事件。
+        :return: TemplateEvent；超时或 stop_event 置位时返回 None
+        """
+        deadline = clock.monotonic() + timeout if timeout is not None else None
+        while not (stop_event is not None and stop_event.is_set()):
+            remaining = check_interval if deadline is None else min(check_interval, deadline - clock.monotonic())
+            if remaining <= 0:
+                return self.poll()
+            try:
+                return self.events.get(timeout=remaining)
+            except Empty:
+                continue
+        return None
+
+    def clear(self):
+        """丢弃尚未取出的事件，并把所有模板视为不在画面上（下一帧仍在画面上的会重新产生事件）。"""
+        while self.poll() is not None:
+            pass
+        self.present = set()
+
+    def cancel(self):
+        self.owner.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cancel()
+
+
+class FrameSubscriptions:
+    """截图管理器持有的订阅表，截图线程每截到一帧调用一次 evaluate。"""
+
+    def __init__(self, engine=None, log_callback=None):
+        """:param engine: MatchingEngine，默认使用 utils.g_matching_engine"""
+        self.log = log_callback if log_callback else print
+        self.engine = engine
+        self.subscriptions = []
+        self.lock = threading.Lock()
+
+    def subscribe(self, templates, image_folder, confidence_threshold=0.8, is_legend=False, color_mode=None,
+                  callback=None, location_key=None):
+        if self.engine is None:
+            from common.utils import g_matching_engine
+            self.engine = g_matching_engine
+        subscription = Subscription(self, templates, image_folder, confidence_threshold, is_legend, color_mode,
+                                    callback, location_key)
+        with self.lock:
+            self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            if subscription in self.subscriptions:
+                self.subscriptions.remove(subscription)
+
+    def __bool__(self):
+        return bool(self.subscriptions)
+
+    def evaluate(self, image, frame_id):
+        """在新的一帧上评估所有订阅；同一帧的灰度转换与 ROI 裁剪在各订阅之间共享。"""
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+        if not subscriptions:
+            return
+        frame = Frame(image, frame_id=frame_id)
+        for subscription in subscriptions:
+            try:
+                subscription.evaluate(self.engine, frame)
+            except Exception as e:
+                self.log(f"评估模板订阅 {subscription.templates} 时出错: {e}")
@@ -0,0 +1,119 @@
+# common/InputMacro.py
+"""
+把一串点击、滑动与等待编译成一条设备端 shell 命令（`input tap ...; sleep 0.05; input tap ...`），
+一次往返执行完，而不是每个动作各走一次 ADB。
+设备处于 sendevent 触摸模式（utils.set_touch_mode）时，点击与滑动编译成 TouchInjector 的 sendevent 序列。
+"""
+import threading
+
+from common.Clock import clock
+
+# 单条命令在设备上的最长执行时间；超过时拆成多条依次执行，避免触发常驻 shell 的等待超时（默认 10 秒）
+MAX_CHUNK_SECONDS = 8.0
+# 动作本身的启动开销：每条 `input` 命令都要启动一次 app_process（约 0.3 秒），每条 sendevent 约 0.01 秒
+INPUT_COMMAND_SECONDS = 0.3
+SENDEVENT_SECONDS = 0.01
+
+
+class InputMacro:
+    """
+    用法:
+        macro = InputMacro().press(1600, 146).sleep(0.05).press(1600, 155)
+        macro.run(adb_path, device_serial)          # 阻塞到设备执行完
+        worker = macro.start(adb_path, device_serial)  # 后台执行，主机端可以继续识别，worker.join() 等待结束
+    """
+
+    def __init__(self):
+        self.steps = []  # [(动作, 参数, 预计耗时秒数), ...]
+
+    def __len__(self):
+        return len(self.steps)
+
+    def tap(self, x, y):
+        self.steps.append(('tap', (int(x), int(y)), 0.0))
+        return self
+
+    def swipe(self, x1, y1, x2, y2, duration_ms=300):
+        self.steps.append(('swipe', (int(x1), int(y1), int(x2), int(y2), int(duration_ms)), duration_ms / 1000))
+        return self
+
+    def press(self, x, y, press_time_ms=50):
+        """与 utils.adb_press_and_release 相同：原地的短 swipe，比 tap 更稳定。"""
+        return self.swipe(x, y, x, y, press_time_ms)
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.steps.append(('sleep', (seconds,), seconds))
+        return self
+
+    @property
+    def duration(self):
+        """所有 sleep 与 swipe 时长之和（秒），不含命令启动开销；用于拆分命令的设备端耗时估计见 estimate()。"""
+        return sum(seconds for _, _, seconds in self.steps)
+
+    @staticmethod
+    def _step_seconds(action, seconds, compiled):
+        """一个动作在设备上的预计耗时：动作时长加上命令启动开销。"""
+        if action == 'sleep':
+            return seconds
+        if 'sendevent ' in compiled:
+            return seconds + compiled.count('sendevent ') * SENDEVENT_SECONDS
+        return seconds + INPUT_COMMAND_SECONDS
+
+    def estimate(self, injector=None):
+        """设备端执行的预计耗时（秒），含每条 input / sendevent 命令的启动开销。"""
+        return sum(self._step_seconds(action, seconds, self._compile_step(action, args, injector))
+                   for action, args, seconds in self.steps)
+
+    @staticmethod
+    def _compile_step(action, args, injector):
+        if action == 'sleep':
+            return f"sleep {args[0]:g}"
+        if injector is not None:
+            return injector.tap_command(*args) if action == 'tap' else injector.swipe_command(*args)
+        return f"input {action} {' '.join(str(v) for v in args)}"
+
+    def compile(self, injector=None):
+        """:param injector: 给出 TouchInjector 时点击与滑动编译为 sendevent 序列，否则为 input 命令。"""
+        return '; '.join(self._compile_step(action, args, injector) for action, args, _ in self.steps)
+
+    def _chunks(self, injector):
+        chunk, chunk_seconds = [], 0.0
+        for action, args, seconds in self.steps:
+            compiled = self._compile_step(action, args, injector)
+            step_seconds = self._step_seconds(action, seconds, compiled)
+            if chunk and chunk_seconds + step_seconds > MAX_CHUNK_SECONDS:
+                yield '; '.join(chunk)
+                chunk, chunk_seconds = [], 0.0
+            chunk.append(compiled)
+            chunk_seconds += step_seconds
+        if chunk:
+            yield '; '.join(chunk)
+
+    def run(self, adb_path, device_serial):
+        """
+        在设备上执行整个宏，返回时宏已执行完毕。
+        真实设备上批量命令执行完才返回，不再额外等待；虚拟时钟（假 adb 不真实等待）下
+        由这里把虚拟时间推进到宏中 sleep 与 swipe 的总时长，脚本的时序保持一致。
+        命令启动开销不计入：假 adb 对单条命令同样不计这部分时间，否则批量宏在基准测试中反而显得更慢。
+        """
+        from common.utils import run_adb_command, get_touch_injector
+        if not self.steps:
+            return
+        started = clock.monotonic()
+        for command in self._chunks(get_touch_injector(adb_path, device_serial)):
+            run_adb_command(adb_path, device_serial, f'shell "{command}"')
+        if not clock.simulated:
+            return
+        remaining = self.duration - (clock.monotonic() - started)
+        if remaining > 0:
+            clock.sleep(remaining)
+
+    def start(self, adb_path, device_serial):
+        """
+        在后台线程执行宏并立即返回该线程，主机端可以同时继续截图识别。
+        执行期间该设备的其他 shell 文本命令会排在宏之后（常驻 shell 会话是串行的），截图不受影响。
+        """
+        worker = threading.Thread(target=self.run, args=(adb_path, device_serial), daemon=True)
+        worker.start()
+        return worker
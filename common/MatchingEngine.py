@@ -0,0 +1,481 @@
+# common/MatchingEngine.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from common.Frame import Frame
+from common.TemplateStore import TemplateEntry
+
+
+class MatchResult:
+    """一次模板匹配的完整结果。found 为 True 表示达到阈值且位于 ROI 之内。"""
+
+    def __init__(self, template_name, score, top_left, size, found, threshold):
+        self.template_name = template_name
+        self.score = score
+        self.top_left = top_left
+        self.size = size  # (宽, 高)
+        self.found = found
+        self.threshold = threshold
+
+    @property
+    def center(self):
+        if self.top_left is None:
+            return None
+        return self.top_left[0] + self.size[0] // 2, self.top_left[1] + self.size[1] // 2
+
+    def __repr__(self):
+        return f"MatchResult({self.template_name!r}, score={self.score:.4f}, center={self.center}, found={self.found})"
+
+
+class MatchingEngine:
+    """
+    ADB 与 GDI 两条识别路径共用的模板匹配引擎。
+    负责：模板缓存（TemplateStore）、ROI 缩放与裁剪、彩色/灰度匹配方式选择、NaN 处理、调试图像导出与结果汇报。
+    if_image_on_screen / find_and_click_image / fast_find_template 及其 GDI 版本都只是它的薄封装。
+    """
+
+    # ROIS 坐标系的基准分辨率
+    BASE_WIDTH = 1920.0
+    BASE_HEIGHT = 1080.0
+
+    COLOR_MODE_COLOR = Frame.COLOR_MODE_COLOR
+    COLOR_MODE_GRAY = Frame.COLOR_MODE_GRAY
+
+    # 金字塔匹配：粗匹配时模板缩小后的最短边下限，低于它会自动减少层数
+    PYRAMID_MIN_TEMPLATE_SIDE = 12
+    # 每次粗匹配最多保留的候选位置数
+    PYRAMID_CANDIDATES = 3
+    # 粗匹配分数低于 (阈值 - 该余量) 的次要候选不再做全分辨率验证
+    PYRAMID_COARSE_MARGIN = 0.25
+
+    # 二值遮罩等价算法中，遮罩内像素方差低于该值（约 0.5 灰度级的标准差）的窗口视为纯色，直接判为不匹配
+    FLAT_WINDOW_VARIANCE = 0.25
+
+    # 画面未变化时复用的匹配结果条数上限（按最近使用淘汰）
+    RESULT_CACHE_SIZE = 256
+
+    # 位置记忆：先在上次命中位置四周各扩展这么多像素的小窗口内匹配，达到阈值就不再扫描整个 ROI。
+    # 注意：ROI 内同时有多处达到阈值时，返回的是上次位置附近的那一处，而不一定是全图匹配度最高的那一处；
+    # 需要全局最高点的场景（例如在多个相同按钮中挑最像的）不传 location_key，或使用 location_memory=False 的引擎
+    LOCAL_SEARCH_MARGIN = 24
+
+    def __init__(self, template_store, roi_resolver, default_color_mode=COLOR_MODE_GRAY, pyramid_levels=None,
+                 skip_unchanged=True, location_memory=True, debug=False, debug_template=None, debug_path=None,
+                 log_callback=None):
+        """
+        :param template_store: TemplateStore 实例
+        :param roi_resolver: 函数 image_folder -> {模板名: (x, y, w, h)}，坐标基于 1920x1080
+        :param pyramid_levels: {模板名: 金字塔层数}，n 层表示先在 1/2^n 分辨率上粗匹配；未列出的模板不使用金字塔
+        :param skip_unchanged: ROI 校验和与上次相同时直接复用上次的匹配结果，不再重新计算
+        :param location_memory: 记住每个模板（按 location_key 区分设备）上次命中的位置，优先在其附近搜索
+        """
+        self.log = log_callback if log_callback else print
+
+        self.template_store = template_store
+        self.roi_resolver = roi_resolver
+        self.default_color_mode = default_color_mode
+        self.pyramid_levels = pyramid_levels if pyramid_levels is not None else {}
+
+        self.debug = debug
+        self.debug_template = debug_template
+        self.debug_path = debug_path
+
+        self.skip_unchanged = skip_unchanged
+        # (模板键, 匹配方式, ROI, 金字塔层数, 阈值) -> (ROI 校验和, TemplateEntry, 最高匹配度, 最高点坐标)
+        self._result_cache = OrderedDict()
+        self._result_cache_lock = threading.Lock()
+
+        self.location_memory = location_memory
+        # (模板键, 匹配方式, ROI, location_key) -> 上次命中位置在 ROI 裁剪图中的左上角坐标
+        # 只记忆给出了 location_key（设备序列号）的匹配，不同设备的命中位置互不影响
+        self._last_locations = {}
+        # 保护 _last_locations、stats 与 template_timings：脚本线程、出击线程与截图线程会同时调用同一个引擎
+        self._state_lock = threading.Lock()
+
+        # local_hits: 在上次位置附近直接命中；local_fallbacks: 附近未达阈值，回退到整个 ROI
+        self.stats = {'matches': 0, 'found': 0, 'skipped': 0, 'local_hits': 0, 'local_fallbacks': 0}
+        # 模板键 -> {'count', 'total', 'max', 'mask_kind'}，耗时单位为秒，只统计匹配计算本身
+        self.template_timings = {}
+
+    @staticmethod
+    def read_frame(frame_source):
+        """
+        从任意画面来源取一帧：
+        带 get_latest_frame() 的截图管理器、无参可调用对象，或直接传入的图像本身（numpy 图像或 Frame）。
+        """
+        if frame_source is None:
+            return None
+        if hasattr(frame_source, 'get_latest_frame'):
+            return frame_source.get_latest_frame()
+        if callable(frame_source):
+            return frame_source()
+        return frame_source
+
+    def scaled_roi(self, image_folder, template_name, frame_width, frame_height):
+        """
+        计算模板在当前分辨率下的搜索区域 (x1, y1, x2, y2)。
+        模板没有自定义 ROI 时返回整帧；ROI 完全落在画面之外时返回 None。
+        """
+        rois = self.roi_resolver(image_folder) if self.roi_resolver else {}
+        if template_name not in rois:
+            return 0, 0, frame_width, frame_height
+
+        scale_x = frame_width / self.BASE_WIDTH
+        scale_y = frame_height / self.BASE_HEIGHT
+        x, y, w, h = rois[template_name]
+        scaled_x, scaled_y = int(x * scale_x), int(y * scale_y)
+        scaled_w, scaled_h = int(w * scale_x), int(h * scale_y)
+
+        x1, y1 = max(0, scaled_x), max(0, scaled_y)
+        x2, y2 = min(frame_width, scaled_x + scaled_w), min(frame_height, scaled_y + scaled_h)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return x1, y1, x2, y2
+
+    def _template_for(self, entry, color_mode):
+        """按匹配方式选出模板的对应版本；画面一侧的转换由 Frame 负责缓存。"""
+        return entry.bgr if color_mode == self.COLOR_MODE_COLOR else entry.gray
+
+    def _effective_pyramid_level(self, level, template_w, template_h):
+        """模板缩得太小时粗匹配会失真，逐层回退直到缩小后的模板仍有足够细节。"""
+        while level > 0 and min(template_w, template_h) >> level < self.PYRAMID_MIN_TEMPLATE_SIDE:
+            level -= 1
+        return level
+
+    @classmethod
+    def _correlate(cls, screen_to_search, template, mask, mask_kind):
+        """按遮罩类型选择最快的 TM_CCOEFF_NORMED 计算方式，返回完整的匹配度图。"""
+        if mask is None:
+            return cv2.matchTemplate(screen_to_search, template, cv2.TM_CCOEFF_NORMED)
+        if mask_kind == TemplateEntry.MASK_BINARY:
+            return cls._binary_masked_ccoeff_normed(screen_to_search, template, mask)
+        return cv2.matchTemplate(screen_to_search, template, cv2.TM_CCOEFF_NORMED, mask=mask)
+
+    @classmethod
+    def _binary_masked_ccoeff_normed(cls, screen_to_search, template, mask):
+        """
+        二值遮罩下 TM_CCOEFF_NORMED 的等价算法，只用无遮罩的 TM_CCORR（OpenCV 会自动走 DFT），比带遮罩匹配快数倍。
+        设遮罩内像素数为 n，模板在遮罩内去均值后为 T'（遮罩外为 0），则每个窗口：
+            分子 = Σ T'·I                    （T' 总和为 0，画面均值项自然消掉）
+            分母 = sqrt(ΣT'² · (Σ_M I² - (Σ_M I)² / n))
+        每个通道需要 3 次相关运算，多通道时分子分母分别按通道累加，与 OpenCV 的多通道定义一致。
+        """
+        mask_f = (mask > 0).astype(np.float32)
+        n = float(cv2.countNonZero(mask_f))
+        if n == 0:
+            result_h = screen_to_search.shape[0] - template.shape[0] + 1
+            result_w = screen_to_search.shape[1] - template.shape[1] + 1
+            return np.full((result_h, result_w), -1.0, np.float32)
+
+        # 画面先减去 128，降低平方和的量级，减少 float32 相减时的精度损失
+        haystack = screen_to_search.astype(np.float32) - 128.0
+        template_f = template.astype(np.float32)
+        if haystack.ndim == 2:
+            haystack, template_f = haystack[..., None], template_f[..., None]
+
+        numerator, image_variance, template_energy = 0.0, 0.0, 0.0
+        for channel in range(haystack.shape[2]):
+            image_c = np.ascontiguousarray(haystack[..., channel])
+            template_c = template_f[..., channel]
+            template_zero_mean = (template_c - float((template_c * mask_f).sum()) / n) * mask_f
+            template_energy += float((template_zero_mean * template_zero_mean).sum())
+
+            numerator = numerator + cv2.matchTemplate(image_c, template_zero_mean, cv2.TM_CCORR)
+            window_sum = cv2.matchTemplate(image_c, mask_f, cv2.TM_CCORR)
+            window_sq_sum = cv2.matchTemplate(image_c * image_c, mask_f, cv2.TM_CCORR)
+            image_variance = image_variance + (window_sq_sum - window_sum * window_sum / n)
+
+        flat_limit = cls.FLAT_WINDOW_VARIANCE * n * haystack.shape[2]
+        if template_energy <= flat_limit:
+            return np.full(numerator.shape, -1.0, np.float32)
+        valid = image_variance > flat_limit
+        denominator = np.sqrt(np.where(valid, image_variance, 1.0) * template_energy)
+        return np.where(valid, numerator / denominator, -1.0).astype(np.float32)
+
+    @classmethod
+    def _match_full(cls, screen_to_search, template, mask, mask_kind):
+        res = cls._correlate(screen_to_search, template, mask, mask_kind)
+        # 带遮罩匹配时，纯色区域会算出 nan/inf；只把这些位置视为不匹配，而不是让整次匹配失败
+        res = np.nan_to_num(res, nan=-1.0, posinf=-1.0, neginf=-1.0)
+        _, max_val, _, max_loc = cv2.minMaxLoc(res)
+        return max_val, max_loc
+
+    def _match_local(self, screen_to_search, template, mask, mask_kind, last_loc, confidence_threshold):
+        """
+        只在上次命中位置附近的小窗口内匹配。窗口内达到阈值即返回，不与 ROI 其余位置比较匹配度。
+        :return: 达到阈值时返回 (匹配度, 在 ROI 裁剪图中的左上角坐标)，否则返回 None
+        """
+        search_h, search_w = screen_to_search.shape[:2]
+        template_h, template_w = template.shape[:2]
+        margin = self.LOCAL_SEARCH_MARGIN
+        wx1, wy1 = max(0, last_loc[0] - margin), max(0, last_loc[1] - margin)
+        wx2 = min(search_w, last_loc[0] + template_w + margin)
+        wy2 = min(search_h, last_loc[1] + template_h + margin)
+        if wx2 - wx1 < template_w or wy2 - wy1 < template_h:
+            return None
+        val, (lx, ly) = self._match_full(screen_to_search[wy1:wy2, wx1:wx2], template, mask, mask_kind)
+        if not np.isfinite(val) or val < confidence_threshold:
+            return None
+        return val, (lx + wx1, ly + wy1)
+
+    def _match_pyramid(self, frame, color_mode, roi, template, mask, mask_kind, level, confidence_threshold):
+        """
+        先在 1/2^level 分辨率上粗匹配找出若干候选，再回到原分辨率，仅在每个候选附近的小窗口内精确匹配。
+        缩小后的 ROI 由 Frame 缓存，同一 ROI 的多个模板（如 legend_range 内的传说关卡模板）共用一份。
+        返回值与全图匹配一致：(最高匹配度, 最高点在 ROI 裁剪图中的左上角坐标)。
+        """
+        factor = 1 << level
+        screen_to_search = frame.crop(color_mode, roi)
+        search_h, search_w = screen_to_search.shape[:2]
+        template_h, template_w = template.shape[:2]
+
+        small_search = frame.pyramid(color_mode, roi, level)
+        small_size = (template_w // factor, template_h // factor)
+        small_template = cv2.resize(template, small_size, interpolation=cv2.INTER_AREA)
+        small_mask = cv2.resize(mask, small_size, interpolation=cv2.INTER_NEAREST) if mask is not None else None
+
+        # 最近邻缩放不会产生新的遮罩取值，二值遮罩缩小后仍是二值
+        coarse = self._correlate(small_search, small_template, small_mask, mask_kind)
+        coarse = np.nan_to_num(coarse, nan=-1.0, posinf=-1.0, neginf=-1.0)
+
+        # 取前若干个局部峰值作为候选，每取一个就把它周围一个模板大小的区域压掉
+        candidates = []
+        suppress_w, suppress_h = max(1, small_size[0] // 2), max(1, small_size[1] // 2)
+        for _ in range(self.PYRAMID_CANDIDATES):
+            _, coarse_val, _, (cx, cy) = cv2.minMaxLoc(coarse)
+            if candidates and coarse_val < confidence_threshold - self.PYRAMID_COARSE_MARGIN:
+                break
+            candidates.append((cx, cy))
+            coarse[max(0, cy - suppress_h):cy + suppress_h + 1, max(0, cx - suppress_w):cx + suppress_w + 1] = -1.0
+
+        # 粗匹配坐标放大回原分辨率后误差在 factor 像素以内，窗口四周各留 2*factor 像素余量
+        pad = 2 * factor
+        best_val, best_loc = -1.0, (0, 0)
+        for cx, cy in candidates:
+            wx1, wy1 = max(0, cx * factor - pad), max(0, cy * factor - pad)
+            wx2 = min(search_w, cx * factor + template_w + pad)
+            wy2 = min(search_h, cy * factor + template_h + pad)
+            if wx2 - wx1 < template_w or wy2 - wy1 < template_h:
+                continue
+            val, (lx, ly) = self._match_full(screen_to_search[wy1:wy2, wx1:wx2], template, mask, mask_kind)
+            if np.isfinite(val) and val > best_val:
+                best_val, best_loc = val, (lx + wx1, ly + wy1)
+        return best_val, best_loc
+
+    def match(self, frame, template_name, image_folder, confidence_threshold=0.8, is_legend=False, color_mode=None,
+              pyramid_level=None, location_key=None):
+        """
+        在一帧画面中匹配单个模板。
+        :param frame: Frame 或 numpy 图像；同一帧要匹配多个模板时传 Frame，灰度转换与 ROI 缩放只做一次
+        :param pyramid_level: 金字塔层数，None 表示使用 pyramid_levels 中的配置，0 表示强制全分辨率匹配
+        :param location_key: 位置记忆的区分键（通常是设备序列号），不同设备上同一模板的位置分开记忆；None 表示不使用位置记忆
+        :return: MatchResult；画面为空或模板无法加载时返回 None
+        """
+        if frame is None:
+            return None
+        frame = Frame.wrap(frame)
+        color_mode = color_mode or self.default_color_mode
+        if pyramid_level is None:
+            pyramid_level = self.pyramid_levels.get(template_name, 0)
+
+        entry = self.template_store.get(image_folder, template_name, is_legend)
+        if entry is None:
+            if self.debug:
+                print(f"[错误] 无法加载模板: {self.template_store.make_key(image_folder, template_name, is_legend)}")
+            return None
+
+        frame_height, frame_width = frame.height, frame.width
+        # template_w/h 是裁剪掉透明边缘后实际参与匹配的尺寸，结果仍按原模板的尺寸与位置汇报
+        template_h, template_w = entry.height, entry.width
+        full_size = (entry.full_width, entry.full_height)
+        not_found = MatchResult(template_name, 0.0, None, full_size, False, confidence_threshold)
+
+        roi = self.scaled_roi(image_folder, template_name, frame_width, frame_height)
+        if roi is None:
+            return not_found
+        x1, y1, x2, y2 = roi
+        if x2 - x1 < template_w or y2 - y1 < template_h:
+            if self.debug:
+                print(f"DEBUG: '{template_name}' 的搜索区域小于模板尺寸，已跳过。")
+            return not_found
+
+        template = self._template_for(entry, color_mode)
+        screen_to_search = frame.crop(color_mode, roi)
+
+        pyramid_level = self._effective_pyramid_level(pyramid_level, template_w, template_h)
+        template_key = self.template_store.make_key(image_folder, template_name, is_legend)
+        # 金字塔的候选筛选与阈值有关，阈值也要算进缓存键
+        cache_key = (template_key, color_mode, roi, pyramid_level, confidence_threshold)
+        checksum = frame.checksum(roi) if self.skip_unchanged else None
+        cached = self._cached_result(cache_key, checksum, entry)
+        local = None
+        if cached is not None:
+            max_val, max_loc = cached
+            self._count('skipped')
+        else:
+            start = time.perf_counter()
+            remember = self.location_memory and location_key is not None
+            memory_key = (template_key, color_mode, roi, location_key)
+            with self._state_lock:
+                last_loc = self._last_locations.get(memory_key) if remember else None
+            if last_loc is not None:
+                local = self._match_local(screen_to_search, template, entry.mask, entry.mask_kind, last_loc,
+                                          confidence_threshold)
+                self._count('local_hits' if local is not None else 'local_fallbacks')
+            if local is not None:
+                max_val, max_loc = local
+            elif pyramid_level > 0:
+                max_val, max_loc = self._match_pyramid(frame, color_mode, roi, template, entry.mask, entry.mask_kind,
+                                                       pyramid_level, confidence_threshold)
+            else:
+                max_val, max_loc = self._match_full(screen_to_search, template, entry.mask, entry.mask_kind)
+            self._record_timing(template_key, entry, time.perf_counter() - start)
+            if remember and np.isfinite(max_val) and max_val >= confidence_threshold:
+                with self._state_lock:
+                    self._last_locations[memory_key] = max_loc
+            if checksum is not None:
+                self._store_result(cache_key, checksum, entry, max_val, max_loc)
+        # 防止 nan 或 inf，将无效值视为匹配失败
+        if not np.isfinite(max_val):
+            max_val = 0.0
+
+        matched_left, matched_top = max_loc[0] + x1, max_loc[1] + y1
+        in_roi = (matched_left >= x1 and matched_top >= y1 and
+                  matched_left + template_w <= x2 and matched_top + template_h <= y2)
+        top_left = (matched_left - entry.offset[0], matched_top - entry.offset[1])
+        found = max_val >= confidence_threshold and in_roi
+
+        self._count('matches')
+        if found:
+            self._count('found')
+
+        if self.debug:
+            pyramid_note = f", 金字塔 {pyramid_level} 层" if pyramid_level > 0 else ""
+            cached_note = ", 画面未变化" if cached is not None else ", 上次位置附近" if local is not None else ""
+            print(f"DEBUG: 查找 '{template_name}' ({color_mode}, 遮罩 {entry.mask_kind}{pyramid_note}{cached_note})，"
+                  f"最高匹配度: {max_val:.4f}")
+            if max_val >= confidence_threshold and not in_roi:
+                print(f"DEBUG: 找到 '{template_name}'，但其位置超出其自定义ROI范围，已忽略。")
+            if template_name == self.debug_template:
+                self._dump_debug_images(frame.image, template, entry.mask, screen_to_search)
+
+        return MatchResult(template_name, max_val, top_left, full_size, found, confidence_threshold)
+
+    def _cached_result(self, cache_key, checksum, entry):
+        """ROI 校验和一致且模板未被重新加载时，返回上次的 (最高匹配度, 最高点坐标)，否则返回 None。"""
+        if checksum is None:
+            return None
+        with self._result_cache_lock:
+            cached = self._result_cache.get(cache_key)
+            if cached is None or cached[0] != checksum or cached[1] is not entry:
+                return None
+            self._result_cache.move_to_end(cache_key)
+            return cached[2], cached[3]
+
+    def _store_result(self, cache_key, checksum, entry, max_val, max_loc):
+        with self._result_cache_lock:
+            self._result_cache[cache_key] = (checksum, entry, max_val, max_loc)
+            self._result_cache.move_to_end(cache_key)
+            while len(self._result_cache) > self.RESULT_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
+
+    def clear_result_cache(self):
+        with self._result_cache_lock:
+            self._result_cache.clear()
+
+    def clear_location_memory(self):
+        with self._state_lock:
+            self._last_locations.clear()
+
+    def _count(self, name):
+        with self._state_lock:
+            self.stats[name] += 1
+
+    def _record_timing(self, key, entry, elapsed):
+        with self._state_lock:
+            timing = self.template_timings.get(key)
+            if timing is None:
+                timing = {'count': 0, 'total': 0.0, 'max': 0.0, 'mask_kind': entry.mask_kind}
+                self.template_timings[key] = timing
+            timing['count'] += 1
+            timing['total'] += elapsed
+            timing['max'] = max(timing['max'], elapsed)
+            timing['mask_kind'] = entry.mask_kind
+
+    def timing_report(self, limit=None):
+        """
+        按累计耗时从高到低列出各模板的匹配开销，用于找出代价高的素材。
+        :return: [(模板键, 次数, 平均毫秒, 最大毫秒, 遮罩类型), ...]
+        """
+        with self._state_lock:
+            rows = [(key, t['count'], t['total'] * 1000 / t['count'], t['max'] * 1000, t['mask_kind'])
+                    for key, t in self.template_timings.items() if t['count']]
+        rows.sort(key=lambda row: row[1] * row[2], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def find(self, frame_source, template_name, image_folder, confidence_threshold=0.8, is_legend=False,
+             color_mode=None, location_key=None):
+        """从画面来源取一帧后执行 match。"""
+        frame = self.read_frame(frame_source)
+        if frame is None:
+            if self.debug:
+                print(f"警告: 查找 '{template_name}' 时无法获取画面。")
+            return None
+        return self.match(frame, template_name, image_folder, confidence_threshold, is_legend, color_mode,
+                          location_key=location_key)
+
+    def match_many(self, frame, templates, image_folder, confidence_threshold=0.8, is_legend=False, color_mode=None,
+                   location_key=None):
+        """
+        在同一帧画面上依次评估多个模板。
+        :param templates: 模板列表，元素为模板名，或 (模板名, is_legend) 元组
+        :param confidence_threshold: 统一阈值，或 {模板名: 阈值} 字典（未列出的模板使用 0.8）
+        :return: {模板名: ((center_x, center_y), 匹配度)}，只包含达到阈值的模板
+        """
+        hits = {}
+        if frame is None:
+            return hits
+        frame = Frame.wrap(frame)
+
+        for template in templates:
+            if isinstance(template, tuple):
+                template_name, template_is_legend = template
+            else:
+                template_name, template_is_legend = template, is_legend
+
+            if isinstance(confidence_threshold, dict):
+                threshold = confidence_threshold.get(template_name, 0.8)
+            else:
+                threshold = confidence_threshold
+
+            try:
+                result = self.match(frame, template_name, image_folder, threshold, template_is_legend, color_mode,
+                                    location_key=location_key)
+            except cv2.error as e:
+                if self.debug:
+                    print(f"在match_many中评估 '{template_name}' 时发生错误: {e}")
+                continue
+
+            if result is not None and result.found:
+                hits[template_name] = (result.center, result.score)
+        return hits
+
+    def _dump_debug_images(self, haystack_frame, template, mask, screen_to_search):
+        try:
+            if not os.path.exists(self.debug_path):
+                os.makedirs(self.debug_path)
+            cv2.imwrite(os.path.join(self.debug_path, "DEBUG_01_HAYSTACK_FULL.png"), haystack_frame)
+            if template is not None:
+                cv2.imwrite(os.path.join(self.debug_path, "DEBUG_02_TEMPLATE_YES.png"), template)
+            if mask is not None:
+                cv2.imwrite(os.path.join(self.debug_path, "DEBUG_03_TEMPLATE_MASK.png"), mask)
+            if screen_to_search is not None:
+                cv2.imwrite(os.path.join(self.debug_path, "DEBUG_04_HAYSTACK_ROI.png"), screen_to_search)
+            print(f"--- 调试图像已保存至 {self.debug_path} ---")
+        except Exception as e:
+            print(f"!!! 保存调试图像时出错: {e} !!!")
@@ -11,6 +11,8 @@ import win32con
 import win32gui
 import win32ui
 
+from common.FrameSubscriptions import FrameSubscriptions
+
 user32 = ctypes.windll.user32
 user32.PrintWindow.argtypes = [wintypes.HWND, wintypes.HDC, wintypes.UINT]
 user32.PrintWindow.restype = wintypes.BOOL
@@ -95,9 +97,11 @@ class ScreenCaptureManager:
         self._capture_method = self._dispatch_capture_method_by_title(window_title)
 
         self.latest_frame = None
+        self.sequence = 0  # 每成功截到一帧加 1
         self.lock = threading.Lock()
         self.is_running = False
         self.capture_thread = None
+        self.subscriptions = FrameSubscriptions(log_callback=self.log)
 
     def _dispatch_capture_method_by_title(self, title):
         """
@@ -215,6 +219,10 @@ class ScreenCaptureManager:
             if frame is not None:
                 with self.lock:
                     self.latest_frame = frame
+                    self.sequence += 1
+                    sequence = self.sequence
+                if self.subscriptions:
+                    self.subscriptions.evaluate(frame, sequence)
             else:
                 time.sleep(0.5)
             time.sleep(0.01)
@@ -232,6 +240,18 @@ class ScreenCaptureManager:
         if self.capture_thread:
             self.capture_thread.join()
 
+    def subscribe(self, templates, image_folder, confidence_threshold=0.8, is_legend=False, color_mode=None,
+                  callback=None, location_key=None):
+        """
+        订阅模板出现事件：之后每截到一帧都在截图线程中评估这些模板，详见 common/FrameSubscriptions.py。
+        :param location_key: 位置记忆的区分键，默认使用窗口标题
+        :return: Subscription，可用作 with 语句，退出时自动取消
+        """
+        if location_key is None:
+            location_key = self.window_title
+        return self.subscriptions.subscribe(templates, image_folder, confidence_threshold, is_legend, color_mode,
+                                            callback, location_key)
+
     def get_latest_frame(self):
         with self.lock:
             return self.latest_frame.copy() if self.latest_frame is not None else None
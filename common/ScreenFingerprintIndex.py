@@ -0,0 +1,166 @@
+# common/ScreenFingerprintIndex.py
+"""
+已知界面的指纹索引：脚本等待的界面（带 start_fight_map 按钮的地图、JAMA 的 YES 确认框、领奖界面等）
+每次出现时画面几乎一样，用感知哈希就能认出候选界面，不必逐个评估所有模板。
+
+指纹由两部分组成：
+    整帧 dHash —— 缩小到 9x8 灰度后相邻像素比较得到的 64 位哈希，用于快速查找候选；
+    若干区域 dHash —— 界面标志模板所在位置，以及可能盖在它上面的弹窗区域的同样哈希，用于确认
+    （弹窗只占画面一部分，整帧哈希变化不大，只看标志区域又会把“地图 + 弹窗”认成地图）。
+查找时先精确查哈希表，再用多索引哈希（64 位拆成 4 段 16 位，半径不超过 3 时至少有一段完全相同）查找汉明半径内的候选。
+索引由模板匹配确认过的结果自动填充；哈希相近不保证界面相同，命中后调用方仍应以一次标志模板匹配确认，未命中时回退到完整的模板匹配。
+"""
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+HASH_BITS = 64
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+
+def dhash(image):
+    """64 位差值哈希：缩小到 9x8 灰度，比较水平相邻像素。"""
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA)
+    return int.from_bytes(np.packbits(small[:, 1:] > small[:, :-1]).tobytes(), 'big')
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class FingerprintEntry:
+    def __init__(self, frame_hash, rois, roi_hashes, value):
+        self.frame_hash = frame_hash
+        self.rois = rois  # 需要一并确认的区域 ((x1, y1, x2, y2), ...)
+        self.roi_hashes = roi_hashes
+        self.value = value  # 调用方保存的识别结果（例如 ScreenState）
+        self.hits = 0
+
+
+class ScreenFingerprintIndex:
+    """
+    用法:
+        index = ScreenFingerprintIndex()
+        value = index.lookup(frame)           # 命中返回当初 add 的 value，否则 None
+        index.add(frame, [marker_roi, popup_roi], value)   # 模板匹配确认后登记
+    """
+
+    # 两帧整帧哈希与每个区域哈希的汉明距离都不超过这两个值时视为同一界面
+    FRAME_RADIUS = 3
+    ROI_RADIUS = 4
+    # 最多保存的指纹条数（按最近命中淘汰）
+    MAX_ENTRIES = 512
+
+    def __init__(self, frame_radius=None, roi_radius=None, max_entries=None):
+        self.frame_radius = self.FRAME_RADIUS if frame_radius is None else frame_radius
+        self.roi_radius = self.ROI_RADIUS if roi_radius is None else roi_radius
+        self.max_entries = max_entries or self.MAX_ENTRIES
+        # 多索引哈希只在半径小于段数时保证不漏查
+        self.frame_radius = min(self.frame_radius, CHUNKS - 1)
+
+        self._entries = OrderedDict()  # (整帧哈希, 区域元组) -> FingerprintEntry
+        self._chunk_tables = [{} for _ in range(CHUNKS)]  # 第 i 段的值 -> {(整帧哈希, 区域元组), ...}
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'added': 0}
+
+    @staticmethod
+    def _chunks(frame_hash):
+        return [(frame_hash >> (CHUNK_BITS * i)) & CHUNK_MASK for i in range(CHUNKS)]
+
+    @staticmethod
+    def _roi_hash(image, roi, cache):
+        value = cache.get(roi)
+        if value is None:
+            x1, y1, x2, y2 = roi
+            value = dhash(image[y1:y2, x1:x2])
+            cache[roi] = value
+        return value
+
+    def _candidates(self, frame_hash):
+        keys = set()
+        for table, chunk in zip(self._chunk_tables, self._chunks(frame_hash)):
+            keys.update(table.get(chunk, ()))
+        return keys
+
+    def lookup(self, frame):
+        """
+        :param frame: Frame 或 numpy 图像
+        :return: 命中条目的 value；没有足够相似的已知界面时返回 None
+        """
+        image = getattr(frame, 'gray', None)
+        if image is None:
+            image = frame
+        frame_hash = dhash(image)
+        with self.lock:
+            candidates = [self._entries[key] for key in self._candidates(frame_hash)]
+        best, best_distance = None, None
+        roi_hashes = {}
+        for entry in candidates:
+            distance = hamming(frame_hash, entry.frame_hash)
+            if distance > self.frame_radius:
+                continue
+            for roi, roi_hash in zip(entry.rois, entry.roi_hashes):
+                roi_distance = hamming(self._roi_hash(image, roi, roi_hashes), roi_hash)
+                if roi_distance > self.roi_radius:
+                    break
+                distance += roi_distance
+            else:
+                if best is None or distance < best_distance:
+                    best, best_distance = entry, distance
+        with self.lock:
+            if best is None:
+                self.stats['misses'] += 1
+                return None
+            best.hits += 1
+            self.stats['hits'] += 1
+            key = (best.frame_hash, best.rois)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return best.value
+
+    def add(self, frame, rois, value):
+        """
+        登记一个已确认的界面。
+        :param rois: 需要一并确认的区域 [(x1, y1, x2, y2), ...]，按当前分辨率；通常是标志模板的位置与可能的弹窗区域
+        """
+        image = getattr(frame, 'gray', None)
+        if image is None:
+            image = frame
+        frame_hash = dhash(image)
+        rois = tuple(rois)
+        cache = {}
+        entry = FingerprintEntry(frame_hash, rois, tuple(self._roi_hash(image, roi, cache) for roi in rois), value)
+        key = (frame_hash, rois)
+        with self.lock:
+            if key not in self._entries:
+                for table, chunk in zip(self._chunk_tables, self._chunks(frame_hash)):
+                    table.setdefault(chunk, set()).add(key)
+                self.stats['added'] += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        self._entries.pop(key)
+        for table, chunk in zip(self._chunk_tables, self._chunks(key[0])):
+            bucket = table.get(chunk)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del table[chunk]
+
+    def clear(self):
+        with self.lock:
+            self._entries.clear()
+            for table in self._chunk_tables:
+                table.clear()
+
+    def __len__(self):
+        return len(self._entries)
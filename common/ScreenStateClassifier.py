@@ -0,0 +1,173 @@
+# common/ScreenStateClassifier.py
+"""
+一次截图判断“当前在哪个界面”。
+脚本原来依次轮询 start_fight_map、act_timeout、power_limited、return_map，每次都要截图 + 匹配；
+这里在同一帧上按代价从低到高评估各界面的标志模板（复用 ROIS_tw/ROIS_jp 与模板仓库），
+一旦命中的界面优先级不低于所有尚未评估的界面就提前结束。
+弹窗类界面（统率力不足、活动结束、确认框）覆盖在地图之上，优先级高于地图等底层界面。
+给出 ScreenFingerprintIndex 时先按感知哈希查已知界面，命中后只在该界面标志模板的 ROI 内做一次匹配确认，
+省去其余模板的评估（坐标也取自这次匹配，不用缓存的旧坐标）；模板确认的结果自动登记进索引。
+指纹索引应按设备各建一个，不同设备的画面不共用。
+"""
+from common.Frame import Frame
+
+STATE_UNKNOWN = 'UNKNOWN'
+STATE_TITLE = 'TITLE'
+STATE_MAP = 'MAP'
+STATE_BATTLE = 'BATTLE'
+STATE_RESULT = 'RESULT'
+STATE_POWER_LIMITED = 'POWER_LIMITED'
+STATE_ACT_TIMEOUT = 'ACT_TIMEOUT'
+STATE_YES_DIALOG = 'YES_DIALOG'
+
+
+class StateRule:
+    """一个界面及其标志模板。priority 越大越优先（弹窗 > 底层界面）。"""
+
+    def __init__(self, label, template_name, priority, confidence_threshold=0.7, is_legend=False):
+        self.label = label
+        self.template_name = template_name
+        self.priority = priority
+        self.confidence_threshold = confidence_threshold
+        self.is_legend = is_legend
+
+
+# 战斗中的界面目前没有可区分的标志模板（return_map 只在结算时出现），因此默认规则中没有 STATE_BATTLE；
+# 有了战斗界面的模板及其 ROI 后，追加 StateRule(STATE_BATTLE, <模板名>, 10) 即可。
+DEFAULT_RULES = [
+    StateRule(STATE_ACT_TIMEOUT, "act_timeout", 30, is_legend=True),
+    StateRule(STATE_POWER_LIMITED, "power_limited", 30),
+    StateRule(STATE_YES_DIALOG, "YES", 20),
+    StateRule(STATE_RESULT, "return_map", 10),
+    StateRule(STATE_MAP, "start_fight_map", 10),
+    StateRule(STATE_TITLE, "start_game", 10),
+]
+
+
+class ScreenState:
+    def __init__(self, label, confidence=0.0, center=None, template_name=None, evaluated=0, from_fingerprint=False):
+        self.label = label
+        self.confidence = confidence  # 标志模板的匹配度，UNKNOWN 时为 0
+        self.center = center  # 标志模板的中心坐标，可直接用于点击
+        self.template_name = template_name
+        self.evaluated = evaluated  # 本次实际匹配的模板数
+        self.from_fingerprint = from_fingerprint  # 是否由指纹索引直接认出
+
+    def __eq__(self, other):
+        if isinstance(other, str):
+            return self.label == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.label)
+
+    def __repr__(self):
+        source = ", fingerprint" if self.from_fingerprint else ""
+        return (f"ScreenState({self.label}, confidence={self.confidence:.3f}, center={self.center}, "
+                f"evaluated={self.evaluated}{source})")
+
+
+class ScreenStateClassifier:
+    """
+    用法:
+        classifier = ScreenStateClassifier(g_matching_engine, "images_tw/", color_mode=ADB_COLOR_MODE)
+        state = classifier.classify(frame)
+        if state == STATE_POWER_LIMITED: ...
+    """
+
+    def __init__(self, engine, image_folder, rules=None, color_mode=None, fingerprints=None):
+        """
+        :param engine: MatchingEngine
+        :param rules: StateRule 列表，默认 DEFAULT_RULES；模板在该服务器目录下不存在的规则自动忽略
+        :param fingerprints: ScreenFingerprintIndex，None 表示每次都做模板匹配
+        """
+        self.engine = engine
+        self.image_folder = image_folder
+        self.rules = list(rules if rules is not None else DEFAULT_RULES)
+        self.color_mode = color_mode
+        self.fingerprints = fingerprints
+        self._orders = {}  # (宽, 高) -> 按代价排序后的 [(代价, 规则), ...]
+        self._rules_by_label = {rule.label: rule for rule in self.rules}
+
+    def _cost(self, rule, frame_width, frame_height):
+        """匹配代价的估算：候选位置数 × 模板像素数，金字塔每层缩小 4 倍。模板或 ROI 不可用时返回 None。"""
+        entry = self.engine.template_store.get(self.image_folder, rule.template_name, rule.is_legend)
+        if entry is None:
+            return None
+        roi = self.engine.scaled_roi(self.image_folder, rule.template_name, frame_width, frame_height)
+        if roi is None:
+            return None
+        x1, y1, x2, y2 = roi
+        positions = max(0, x2 - x1 - entry.width + 1) * max(0, y2 - y1 - entry.height + 1)
+        if positions == 0:
+            return None
+        level = self.engine.pyramid_levels.get(rule.template_name, 0)
+        return positions * entry.width * entry.height / (4 ** level)
+
+    def _order_for(self, frame_width, frame_height):
+        order = self._orders.get((frame_width, frame_height))
+        if order is None:
+            costs = [(self._cost(rule, frame_width, frame_height), rule) for rule in self.rules]
+            order = sorted([(cost, rule) for cost, rule in costs if cost is not None], key=lambda item: item[0])
+            # 有规则因模板缺失或无法加载被跳过时不缓存，模板文件补上后（模板仓库按修改时间重新加载）下次即可生效
+            if len(order) == len(self.rules):
+                self._orders[(frame_width, frame_height)] = order
+        return order
+
+    def _fingerprint_rois(self, frame, rule, result):
+        """标志模板命中的位置，加上所有可能盖在该界面上的更高优先级界面的搜索区域。"""
+        left, top = max(0, result.top_left[0]), max(0, result.top_left[1])
+        right = min(frame.width, result.top_left[0] + result.size[0])
+        bottom = min(frame.height, result.top_left[1] + result.size[1])
+        rois = [(left, top, right, bottom)]
+        for other in self.rules:
+            if other.priority > rule.priority:
+                roi = self.engine.scaled_roi(self.image_folder, other.template_name, frame.width, frame.height)
+                if roi is not None and roi not in rois:
+                    rois.append(roi)
+        return rois
+
+    def classify(self, frame, location_key=None):
+        """
+        :param frame: Frame 或 numpy 图像
+        :param location_key: 匹配引擎位置记忆的区分键（通常是设备序列号）
+        :return: ScreenState；画面为空或没有任何界面命中时 label 为 STATE_UNKNOWN
+        """
+        if frame is None:
+            return ScreenState(STATE_UNKNOWN)
+        frame = Frame.wrap(frame)
+        if self.fingerprints is not None:
+            known = self.fingerprints.lookup(frame)
+            rule = self._rules_by_label.get(known.label) if known is not None else None
+            if rule is not None:
+                # 哈希相近不代表界面相同（例如同一弹窗盖在不同背景上），用一次标志模板匹配确认
+                result = self.engine.match(frame, rule.template_name, self.image_folder, rule.confidence_threshold,
+                                           rule.is_legend, self.color_mode, location_key=location_key)
+                if result is not None and result.found:
+                    return ScreenState(rule.label, result.score, result.center, rule.template_name, 1,
+                                       from_fingerprint=True)
+        order = self._order_for(frame.width, frame.height)
+
+        best = None
+        evaluated = 0
+        for index, (_, rule) in enumerate(order):
+            if best is not None and rule.priority <= best[0].priority:
+                # 剩余规则中只要还有更高优先级的就继续，否则已经可以下结论
+                if all(other.priority <= best[0].priority for _, other in order[index:]):
+                    break
+                continue
+            result = self.engine.match(frame, rule.template_name, self.image_folder, rule.confidence_threshold,
+                                       rule.is_legend, self.color_mode, location_key=location_key)
+            evaluated += 1
+            if result is None or not result.found:
+                continue
+            if best is None or rule.priority > best[0].priority or result.score > best[1].score:
+                best = (rule, result)
+
+        if best is None:
+            return ScreenState(STATE_UNKNOWN, evaluated=evaluated)
+        rule, result = best
+        state = ScreenState(rule.label, result.score, result.center, rule.template_name, evaluated)
+        if self.fingerprints is not None:
+            self.fingerprints.add(frame, self._fingerprint_rois(frame, rule, result), state)
+        return state
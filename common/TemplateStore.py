@@ -0,0 +1,179 @@
+# common/TemplateStore.py
+import os
+import threading
+import time
+
+import cv2
+
+
+class TemplateEntry:
+    """
+    一张模板图片预处理后的所有变体，供彩色/灰度两种匹配方式直接使用。
+    带 Alpha 通道的模板已裁剪到不透明区域的外接矩形：bgr/gray/mask 是裁剪后的图像，
+    offset 与 full_width/full_height 记录裁剪前的几何信息，用于还原原模板的位置与中心点。
+    """
+
+    MASK_NONE = 'none'  # 无遮罩（不带 Alpha 或完全不透明）
+    MASK_BINARY = 'binary'  # 只有全透明/全不透明两种像素，可走无遮罩相关的等价算法
+    MASK_SOFT = 'soft'  # 含半透明像素，只能使用 OpenCV 的带遮罩匹配
+
+    def __init__(self, path, mtime, bgr, gray, mask, offset=(0, 0), full_size=None):
+        self.path = path
+        self.mtime = mtime
+        self.bgr = bgr
+        self.gray = gray
+        self.mask = mask  # 裁剪后的 Alpha 通道，不需要遮罩时为 None
+        self.height, self.width = bgr.shape[:2]
+        self.offset = offset  # 裁剪区域左上角在原模板中的坐标 (x, y)
+        self.full_width, self.full_height = full_size if full_size else (self.width, self.height)
+        self.mask_kind = self._classify_mask(mask)
+        self.checked_at = time.monotonic()
+
+    @classmethod
+    def _classify_mask(cls, mask):
+        if mask is None:
+            return cls.MASK_NONE
+        if cv2.countNonZero(cv2.inRange(mask, 1, 254)) == 0:
+            return cls.MASK_BINARY
+        return cls.MASK_SOFT
+
+
+class TemplateStore:
+    """
+    ADB 与 GDI 两条识别路径共用的模板仓库。
+    - 第一次访问某个服务器目录（如 images_tw/）时，会把该目录及其 legend/ 子目录下的模板全部预加载。
+    - 同一模板最多每 check_interval 秒检查一次文件修改时间，文件被替换后自动重新加载；
+      除此之外的访问完全命中内存，不产生任何磁盘 I/O。
+    """
+
+    LEGEND_SUBFOLDER = 'legend'
+
+    def __init__(self, path_resolver=None, check_interval=2.0, log_callback=None):
+        self.log = log_callback if log_callback else print
+
+        self.path_resolver = path_resolver if path_resolver else os.path.abspath
+        self.check_interval = check_interval
+
+        self._entries = {}  # 相对路径 -> TemplateEntry / None(文件不存在或无法解码)
+        self._missing_checked_at = {}
+        self._preloaded_folders = set()
+        self.lock = threading.RLock()
+
+        self.stats = {'hits': 0, 'loads': 0, 'reloads': 0}
+
+    @staticmethod
+    def make_key(image_folder, template_name, is_legend=False):
+        relative_folder = os.path.join(image_folder, TemplateStore.LEGEND_SUBFOLDER) if is_legend else image_folder
+        return os.path.normpath(os.path.join(relative_folder, f"{template_name}.png"))
+
+    @staticmethod
+    def _decode(path):
+        """
+        解码模板并做匹配前的预处理：
+        裁剪到 Alpha 不透明区域的外接矩形；裁剪后完全不透明的模板直接丢弃遮罩，走更快的无遮罩匹配。
+        :return: (bgr, gray, mask, offset, full_size)；无法解码时返回 None
+        """
+        template_raw = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if template_raw is None:
+            return None
+
+        mask = None
+        if template_raw.ndim == 2:
+            bgr = cv2.cvtColor(template_raw, cv2.COLOR_GRAY2BGR)
+        elif template_raw.shape[2] == 4:
+            mask = template_raw[:, :, 3]
+            bgr = cv2.cvtColor(template_raw, cv2.COLOR_BGRA2BGR)
+        else:
+            bgr = template_raw
+
+        full_height, full_width = bgr.shape[:2]
+        offset = (0, 0)
+        if mask is not None:
+            # 完全透明的模板无法裁剪，保持原样交给匹配阶段判定为不匹配
+            x, y, w, h = cv2.boundingRect(mask)
+            if w > 0 and h > 0:
+                bgr = bgr[y:y + h, x:x + w].copy()
+                mask = mask[y:y + h, x:x + w].copy()
+                offset = (x, y)
+            if cv2.countNonZero(cv2.compare(mask, 255, cv2.CMP_NE)) == 0:
+                mask = None
+
+        gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        return bgr, gray, mask, offset, (full_width, full_height)
+
+    def _load(self, key):
+        path = self.path_resolver(key)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            self._entries[key] = None
+            self._missing_checked_at[key] = time.monotonic()
+            return None
+
+        decoded = self._decode(path)
+        if decoded is None:
+            self.log(f"[错误] 无法加载模板: {path}")
+            self._entries[key] = None
+            self._missing_checked_at[key] = time.monotonic()
+            return None
+
+        entry = TemplateEntry(path, mtime, *decoded)
+        self._entries[key] = entry
+        self._missing_checked_at.pop(key, None)
+        self.stats['loads'] += 1
+        return entry
+
+    def _is_stale(self, key, entry):
+        now = time.monotonic()
+        if entry is None:
+            return now - self._missing_checked_at.get(key, 0) >= self.check_interval
+        if now - entry.checked_at < self.check_interval:
+            return False
+        entry.checked_at = now
+        try:
+            return os.path.getmtime(entry.path) != entry.mtime
+        except OSError:
+            return True
+
+    def get(self, image_folder, template_name, is_legend=False):
+        """返回模板的 TemplateEntry；模板不存在或无法解码时返回 None。"""
+        key = self.make_key(image_folder, template_name, is_legend)
+        with self.lock:
+            self._ensure_folder_preloaded(key)
+            if key in self._entries:
+                entry = self._entries[key]
+                if not self._is_stale(key, entry):
+                    self.stats['hits'] += 1
+                    return entry
+                if entry is not None:
+                    self.stats['reloads'] += 1
+            return self._load(key)
+
+    def _ensure_folder_preloaded(self, key):
+        parts = key.split(os.sep)
+        if len(parts) > 1 and parts[0] not in self._preloaded_folders:
+            self.preload(parts[0])
+
+    def preload(self, image_folder):
+        """预加载服务器目录及其 legend/ 子目录中的所有模板，返回加载数量。"""
+        folder_key = os.path.normpath(image_folder)
+        count = 0
+        with self.lock:
+            self._preloaded_folders.add(folder_key)
+            for sub_folder in (folder_key, os.path.join(folder_key, self.LEGEND_SUBFOLDER)):
+                folder_path = self.path_resolver(sub_folder)
+                if not os.path.isdir(folder_path):
+                    continue
+                for filename in sorted(os.listdir(folder_path)):
+                    if not filename.lower().endswith('.png'):
+                        continue
+                    key = os.path.normpath(os.path.join(sub_folder, filename))
+                    if key not in self._entries and self._load(key) is not None:
+                        count += 1
+        return count
+
+    def clear(self):
+        with self.lock:
+            self._entries.clear()
+            self._missing_checked_at.clear()
+            self._preloaded_folders.clear()
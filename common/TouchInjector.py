@@ -0,0 +1,163 @@
+# common/TouchInjector.py
+"""
+通过 sendevent 直接向触摸屏的 /dev/input/eventX 写入多点触控事件（Linux MT 协议 B）。
+
+`input tap` 每次都要在设备上启动一个 app_process（Java 虚拟机），单次点击就要几百毫秒；
+sendevent 只是一个很小的 toybox 进程，一次点击的全部事件编译成一条命令、经常驻 shell 一次发送，
+耗时在毫秒级。事件坐标使用触摸设备自身的坐标系，因此连接时先探测一次设备几何信息：
+触摸设备路径与坐标范围（getevent -pl）、物理分辨率（wm size）与当前屏幕方向（dumpsys input）。
+脚本中的坐标仍然是横屏截图的像素坐标，由 to_device() 换算。
+"""
+import re
+
+EV_SYN = 0
+EV_KEY = 1
+EV_ABS = 3
+SYN_REPORT = 0
+BTN_TOUCH = 330
+ABS_MT_SLOT = 47
+ABS_MT_POSITION_X = 53
+ABS_MT_POSITION_Y = 54
+ABS_MT_TRACKING_ID = 57
+ABS_MT_PRESSURE = 58
+
+# 按下到抬起之间至少保持的时间；同一帧内按下又抬起的触摸可能被游戏忽略
+TAP_HOLD_SECONDS = 0.03
+# 滑动时相邻两次移动事件的间隔
+SWIPE_STEP_MS = 20
+
+
+class TouchInjector:
+    def __init__(self):
+        self.device = None  # 例如 /dev/input/event2
+        self.x_range = None  # (min, max)
+        self.y_range = None
+        self.natural_size = None  # 自然方向（rotation 0）下的物理分辨率 (宽, 高)
+        self.rotation = 0  # 0..3，对应 0/90/180/270 度
+        self.has_slot = False
+        self.has_pressure = False
+        self.has_btn_touch = False
+        self.tracking_id = 0
+
+    @property
+    def ready(self):
+        return self.device is not None
+
+    # --- 探测 ---
+    def probe(self, run_shell):
+        """
+        探测触摸设备与屏幕几何信息。
+        :param run_shell: 在设备上执行一条 shell 命令并返回文本输出的函数（失败时返回 None）
+        :return: 是否找到可用的触摸设备
+        """
+        self._parse_getevent(run_shell("getevent -pl") or '')
+        if not self.ready:
+            return False
+
+        match = re.search(r'Physical size:\s*(\d+)x(\d+)', run_shell("wm size") or '')
+        if not match:
+            self.device = None
+            return False
+        self.natural_size = (int(match.group(1)), int(match.group(2)))
+
+        rotation = self._parse_rotation(run_shell("dumpsys input | grep -m 1 -E 'SurfaceOrientation|orientation='") or '')
+        if rotation is None:
+            # 游戏固定横屏：自然方向为竖屏的设备（手机）此时一定转了 90 度
+            rotation = 1 if self.natural_size[0] < self.natural_size[1] else 0
+        self.rotation = rotation
+        return True
+
+    def _parse_getevent(self, output):
+        """从 `getevent -pl` 的输出中选出带 ABS_MT_POSITION_X/Y 的设备，优先 INPUT_PROP_DIRECT（触摸屏）。"""
+        candidates = []
+        for block in re.split(r'(?=^add device \d+:)', output, flags=re.MULTILINE):
+            device = re.match(r'add device \d+:\s*(\S+)', block)
+            x_range = re.search(r'ABS_MT_POSITION_X\s*:.*?min (-?\d+), max (-?\d+)', block)
+            y_range = re.search(r'ABS_MT_POSITION_Y\s*:.*?min (-?\d+), max (-?\d+)', block)
+            if device and x_range and y_range:
+                candidates.append((
+                    'INPUT_PROP_DIRECT' in block, device.group(1),
+                    (int(x_range.group(1)), int(x_range.group(2))), (int(y_range.group(1)), int(y_range.group(2))),
+                    block))
+        if not candidates:
+            return
+        candidates.sort(key=lambda c: not c[0])
+        _, self.device, self.x_range, self.y_range, block = candidates[0]
+        self.has_slot = 'ABS_MT_SLOT' in block
+        self.has_pressure = 'ABS_MT_PRESSURE' in block
+        self.has_btn_touch = 'BTN_TOUCH' in block
+
+    @staticmethod
+    def _parse_rotation(output):
+        match = re.search(r'SurfaceOrientation:\s*(\d)', output) or re.search(r'orientation=(\d)', output)
+        if match:
+            return int(match.group(1)) % 4
+        match = re.search(r'ORIENTATION_(\d+)', output)
+        if match:
+            return int(match.group(1)) // 90 % 4
+        return None
+
+    # --- 坐标换算 ---
+    def to_device(self, x, y):
+        """把当前屏幕方向下的像素坐标换算成触摸设备的原始坐标。"""
+        width, height = self.natural_size
+        if self.rotation == 1:
+            nx, ny = width - y, x
+        elif self.rotation == 2:
+            nx, ny = width - x, height - y
+        elif self.rotation == 3:
+            nx, ny = y, height - x
+        else:
+            nx, ny = x, y
+        (x_min, x_max), (y_min, y_max) = self.x_range, self.y_range
+        raw_x = x_min + nx * (x_max - x_min + 1) / width
+        raw_y = y_min + ny * (y_max - y_min + 1) / height
+        return min(max(int(raw_x), x_min), x_max), min(max(int(raw_y), y_min), y_max)
+
+    # --- 事件编译 ---
+    def _event(self, event_type, code, value):
+        return f"sendevent {self.device} {event_type} {code} {value}"
+
+    def _down(self, x, y):
+        raw_x, raw_y = self.to_device(x, y)
+        self.tracking_id = (self.tracking_id + 1) % 65536
+        events = [self._event(EV_ABS, ABS_MT_SLOT, 0)] if self.has_slot else []
+        events += [self._event(EV_ABS, ABS_MT_TRACKING_ID, self.tracking_id),
+                   self._event(EV_ABS, ABS_MT_POSITION_X, raw_x),
+                   self._event(EV_ABS, ABS_MT_POSITION_Y, raw_y)]
+        if self.has_pressure:
+            events.append(self._event(EV_ABS, ABS_MT_PRESSURE, 50))
+        if self.has_btn_touch:
+            events.append(self._event(EV_KEY, BTN_TOUCH, 1))
+        events.append(self._event(EV_SYN, SYN_REPORT, 0))
+        return events
+
+    def _move(self, x, y):
+        raw_x, raw_y = self.to_device(x, y)
+        return [self._event(EV_ABS, ABS_MT_POSITION_X, raw_x),
+                self._event(EV_ABS, ABS_MT_POSITION_Y, raw_y),
+                self._event(EV_SYN, SYN_REPORT, 0)]
+
+    def _up(self):
+        events = [self._event(EV_ABS, ABS_MT_TRACKING_ID, -1)]
+        if self.has_btn_touch:
+            events.append(self._event(EV_KEY, BTN_TOUCH, 0))
+        events.append(self._event(EV_SYN, SYN_REPORT, 0))
+        return events
+
+    def tap_command(self, x, y):
+        return self.press_command(x, y, TAP_HOLD_SECONDS * 1000)
+
+    def press_command(self, x, y, press_time_ms=50):
+        hold = max(press_time_ms / 1000, TAP_HOLD_SECONDS)
+        return '; '.join(self._down(x, y) + [f"sleep {hold:g}"] + self._up())
+
+    def swipe_command(self, x1, y1, x2, y2, duration_ms=300):
+        if (x1, y1) == (x2, y2):
+            return self.press_command(x1, y1, duration_ms)
+        steps = max(1, int(duration_ms // SWIPE_STEP_MS))
+        events = self._down(x1, y1)
+        for step in range(1, steps + 1):
+            events.append(f"sleep {duration_ms / steps / 1000:g}")
+            events += self._move(x1 + (x2 - x1) * step / steps, y1 + (y2 - y1) * step / steps)
+        return '; '.join(events + self._up())
@@ -1,23 +1,53 @@
 # common/utils.py
 import os
+import struct
 import sys
 import subprocess
-import time
+import threading
 import traceback
 from datetime import time as dtime, datetime, timezone, timedelta
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 import cv2
 import numpy as np
-import win32con
-import win32gui
 
+from common.AdbClient import AdbClientError, AdbStreamError, get_client
+from common.AdbShellSession import AdbShellError, AdbShellReadError, get_session
+from common.Clock import clock
 from common.EmulatorStateManager import EmulatorStateManager
-from common.ScreenCaptureManager import ScreenCaptureManager
+from common.Frame import Frame
+from common.MatchingEngine import MatchingEngine
+from common.ScreenFingerprintIndex import ScreenFingerprintIndex
+from common.ScreenStateClassifier import ScreenStateClassifier, ScreenState, STATE_UNKNOWN
+from common.TemplateStore import TemplateStore
+from common.TouchInjector import TouchInjector
 
 DEBUG = True
 debug_img = 'rego'
 
+# 为 True 时，所有 `shell ...` 文本命令都走按设备常驻的 adb shell 会话，不再每次启动 adb 进程
+USE_PERSISTENT_SHELL = True
+# 为 True 时，设备命令优先直接通过 adb server 协议（127.0.0.1:5037）执行，server 不可用时回退到 adb 进程
+USE_ADB_SERVER_CLIENT = True
+
+# 截图模式: 'png' 为 `screencap -p` + 主机端解码；'raw' 通过 exec-out 直接读取未压缩的像素帧
+SCREENCAP_MODE_PNG = 'png'
+SCREENCAP_MODE_RAW = 'raw'
+DEFAULT_SCREENCAP_MODE = SCREENCAP_MODE_PNG
+g_screencap_modes = {}  # device_serial -> 截图模式
+g_frame_sources = {}  # device_serial -> 替代 ADB 截图的画面来源（离线回放用）
+g_detection_backends = {}  # device_serial -> 多进程匹配客户端（common/DetectionPool.py），未设置时在本进程匹配
+
+# 触摸模式: 'input' 为 `input tap/swipe`（每次启动 app_process，几百毫秒）；
+# 'sendevent' 直接向触摸设备写事件（common/TouchInjector.py），单次点击只需毫秒级
+TOUCH_MODE_INPUT = 'input'
+TOUCH_MODE_SENDEVENT = 'sendevent'
+DEFAULT_TOUCH_MODE = TOUCH_MODE_INPUT
+# 连续点击之间的间隔；input 模式下的间隔主要是在等设备端的 app_process
+TAP_INTERVALS = {TOUCH_MODE_INPUT: 0.25, TOUCH_MODE_SENDEVENT: 0.05}
+g_touch_modes = {}  # device_serial -> 触摸模式
+g_touch_injectors = {}  # device_serial -> 已完成探测的 TouchInjector
+
 
 # 实例化全局状态管理器
 emulator_state = EmulatorStateManager()
@@ -183,6 +213,22 @@ ROIS_tw = {
 }
 BoHe_confidence_threshold = 0.9
 
+# 金字塔匹配层数（台服/日服共用）：n 层表示先在 1/2^n 分辨率上粗匹配找候选，再回到原分辨率在候选附近精确验证。
+# 只给搜索区域很大的模板开启；模板缩小后过小时引擎会自动减少层数。
+PYRAMID_LEVELS = {
+    "OK": 2,  # 全屏搜索
+    "member": 2,
+    "reward_result": 1,
+    "power_limited": 1,
+    "act_timeout": 1,
+    "BoHe_aEXpart": 1,
+}
+# legend_range 内搜索的传说关卡模板
+PYRAMID_LEVELS.update({
+    template_name: 1 for template_name, roi in ROIS_tw.items()
+    if roi == (legend_range_startX, legend_range_startY, legend_range_deltaX, legend_range_deltaY)
+})
+
 ########################################################################################################################
 ##############
 # 活动时间常量 #
@@ -899,6 +945,103 @@ def start_app(driver, package_name, logger=print):
 
 
 # --- ADB 相关函数 ---
+def set_persistent_shell_enabled(enabled):
+    """开启/关闭常驻 adb shell 会话。"""
+    global USE_PERSISTENT_SHELL
+    USE_PERSISTENT_SHELL = bool(enabled)
+
+
+def set_adb_server_client_enabled(enabled):
+    """开启/关闭直接与 adb server 通信的客户端（common/AdbClient.py）。"""
+    global USE_ADB_SERVER_CLIENT
+    USE_ADB_SERVER_CLIENT = bool(enabled)
+
+
+def _adb_server_client():
+    """返回可用的 adb server 客户端；未启用或最近连接失败时返回 None。"""
+    if not USE_ADB_SERVER_CLIENT:
+        return None
+    client = get_client()
+    return client if client.is_available() else None
+
+
+def _strip_shell_prefix(command):
+    """把 `shell xxx` / `shell "xxx"` 形式的命令还原成设备端实际执行的命令行。"""
+    shell_command = command[len("shell "):].strip()
+    if len(shell_command) >= 2 and shell_command[0] == '"' and shell_command[-1] == '"':
+        shell_command = shell_command[1:-1]
+    return shell_command
+
+
+def _run_in_persistent_shell(adb_path, device_serial, command):
+    """
+    通过常驻会话执行 shell 命令。
+    :return: (是否已处理, 输出)。命令未能送达（连接或写入失败）时返回未处理，由调用方回退到单次进程方式；
+             命令已送达但读取输出失败时视为已处理、输出为 None，避免同一条命令被再次执行。
+    """
+    sessions = [get_session(adb_path, device_serial)]
+    client = _adb_server_client()
+    if client is not None:
+        # 优先使用直连 adb server 的 shell 流，失败时再用 adb 进程维持的会话
+        sessions.insert(0, get_session(adb_path, device_serial, client=client))
+
+    for session in sessions:
+        try:
+            return_code, output = session.execute(_strip_shell_prefix(command))
+            break
+        except AdbShellReadError as e:
+            if DEBUG:
+                print(f"常驻shell会话读取输出失败，不再重发命令: {e}")
+            return True, None
+        except AdbShellError as e:
+            if DEBUG:
+                print(f"常驻shell会话不可用: {e}")
+    else:
+        if DEBUG:
+            print("回退为单次ADB进程")
+        return False, None
+
+    if return_code != 0:
+        if DEBUG:
+            print(f"ADB命令执行失败: {command}\n错误: {output.strip()}")
+        return True, None
+    return True, output.strip().replace('\r\n', '\n')
+
+
+def _run_via_adb_server(device_serial, command, return_binary):
+    """
+    直接通过 adb server 协议执行 `shell ...` / `exec-out ...` 命令，省去创建 adb 进程。
+    :return: (是否已处理, 输出)。server 不可用或服务未能打开时返回未处理，由调用方回退到单次进程方式；
+             服务已打开、命令已送达后读取失败时视为已处理、输出为 None，避免同一条命令被再次执行。
+    """
+    client = _adb_server_client()
+    if client is None:
+        return False, None
+    try:
+        if command.startswith("shell "):
+            # shell,v2: 带返回码，失败时与单次进程方式（check=True）一样返回 None
+            return_code, output, error_output = client.shell_v2(device_serial, _strip_shell_prefix(command))
+            if return_code != 0:
+                if DEBUG:
+                    print(f"ADB命令执行失败: {command}\n错误: {error_output.decode('utf-8', errors='ignore').strip()}")
+                return True, None
+        elif command.startswith("exec-out "):
+            output = client.exec_out(device_serial, command[len("exec-out "):].strip())
+        else:
+            return False, None
+    except AdbStreamError as e:
+        if DEBUG:
+            print(f"adb server 通道读取输出失败，不再重发命令: {e}")
+        return True, None
+    except AdbClientError as e:
+        if DEBUG:
+            print(f"adb server 通道不可用，回退为单次ADB进程: {e}")
+        return False, None
+    if return_binary:
+        return True, output
+    return True, output.decode('utf-8', errors='ignore').strip().replace('\r\n', '\n')
+
+
 def run_adb_command(adb_path, device_serial, command, return_binary=False):
     """
     执行一条ADB命令并返回输出。
@@ -908,6 +1051,15 @@ def run_adb_command(adb_path, device_serial, command, return_binary=False):
     :param return_binary: 如果为True，则返回原始二进制输出；否则返回解码后的文本
     :return: 命令输出
     """
+    if USE_PERSISTENT_SHELL and device_serial and not return_binary and command.startswith("shell "):
+        handled, output = _run_in_persistent_shell(adb_path, device_serial, command)
+        if handled:
+            return output
+    if USE_ADB_SERVER_CLIENT and device_serial:
+        handled, output = _run_via_adb_server(device_serial, command, return_binary)
+        if handled:
+            return output
+
     if device_serial is None and "connect" not in command:
         full_command = f"\"{adb_path}\" {command}"
     elif "connect" in command:
@@ -938,13 +1090,92 @@ def run_adb_command(adb_path, device_serial, command, return_binary=False):
     return None
 
 
+def run_adb_shell(adb_path, device_serial, device_command):
+    """
+    在设备上执行一条 shell 命令行，命令行原样交给设备端的 sh 解释，返回解码后的输出，失败时返回 None。
+    与 run_adb_command(..., f'shell "{...}"') 不同，回退为单次进程时以参数列表启动 adb、不经过主机的 shell，
+    命令中的 $变量、$(...)、$!、&、> 等只会在设备上展开。
+    """
+    command = f'shell "{device_command}"'
+    if USE_PERSISTENT_SHELL and device_serial:
+        handled, output = _run_in_persistent_shell(adb_path, device_serial, command)
+        if handled:
+            return output
+    if USE_ADB_SERVER_CLIENT and device_serial:
+        handled, output = _run_via_adb_server(device_serial, command, False)
+        if handled:
+            return output
+
+    full_command = [adb_path] + (['-s', device_serial] if device_serial else []) + ['shell', device_command]
+    try:
+        result = subprocess.run(
+            full_command,
+            check=True,
+            capture_output=True,
+            cwd=os.path.dirname(adb_path) or None
+        )
+        return result.stdout.decode('utf-8', errors='ignore').strip().replace('\r\n', '\n')
+    except subprocess.CalledProcessError as e:
+        if DEBUG:
+            print(f"ADB命令执行失败: {device_command}\n错误: {e.stderr.decode('utf-8', errors='ignore').strip()}")
+    except Exception as e:
+        if DEBUG:
+            print(f"执行ADB命令时发生未知错误: {e}")
+    return None
+
+
+def set_touch_mode(device_serial, mode):
+    """为指定设备选择触摸模式（'input' 或 'sendevent'）。"""
+    if mode not in (TOUCH_MODE_INPUT, TOUCH_MODE_SENDEVENT):
+        raise ValueError(f"未知的触摸模式: {mode}")
+    g_touch_modes[device_serial] = mode
+
+
+def get_touch_mode(device_serial):
+    return g_touch_modes.get(device_serial, DEFAULT_TOUCH_MODE)
+
+
+def get_tap_interval(device_serial):
+    """该设备当前触摸模式下连续点击的间隔（秒）。"""
+    return TAP_INTERVALS[get_touch_mode(device_serial)]
+
+
+def get_touch_injector(adb_path, device_serial):
+    """
+    sendevent 模式下返回该设备的 TouchInjector，首次使用时探测一次触摸设备与屏幕几何信息。
+    input 模式下返回 None；探测失败时打印原因并把该设备退回 input 模式。
+    """
+    if get_touch_mode(device_serial) != TOUCH_MODE_SENDEVENT:
+        return None
+    injector = g_touch_injectors.get(device_serial)
+    if injector is None:
+        injector = TouchInjector()
+        if not injector.probe(lambda command: run_adb_command(adb_path, device_serial, f'shell "{command}"')):
+            print(f"设备 {device_serial} 未找到可写入的触摸设备，改用 input 命令点击。")
+            g_touch_modes[device_serial] = TOUCH_MODE_INPUT
+            return None
+        if DEBUG:
+            print(f"触摸设备: {injector.device}，坐标范围 X{injector.x_range} Y{injector.y_range}，"
+                  f"物理分辨率 {injector.natural_size}，屏幕方向 {injector.rotation * 90} 度")
+        g_touch_injectors[device_serial] = injector
+    return injector
+
+
 def adb_tap(x, y, adb_path, device_serial):
     """【新增】使用ADB命令模拟点击屏幕指定坐标。"""
+    injector = get_touch_injector(adb_path, device_serial)
+    if injector:
+        run_adb_command(adb_path, device_serial, f'shell "{injector.tap_command(x, y)}"')
+        return
     run_adb_command(adb_path, device_serial, f"shell input tap {x} {y}")
 
 
 def adb_swipe(x1, y1, x2, y2, duration_ms, adb_path, device_serial):
     """使用ADB命令模拟滑动屏幕。"""
+    injector = get_touch_injector(adb_path, device_serial)
+    if injector:
+        run_adb_command(adb_path, device_serial, f'shell "{injector.swipe_command(x1, y1, x2, y2, duration_ms)}"')
+        return
     run_adb_command(adb_path, device_serial, f"shell input swipe {x1} {y1} {x2} {y2} {duration_ms}")
 
 
@@ -953,264 +1184,214 @@ def adb_press_and_release(x, y, adb_path, device_serial, press_time_ms=50):
     使用一个极短距离和时间的swipe来模拟一次更可靠的点击（长按）。
     这在某些游戏中比 `tap` 更稳定。
     """
+    injector = get_touch_injector(adb_path, device_serial)
+    if injector:
+        run_adb_command(adb_path, device_serial, f'shell "{injector.press_command(x, y, press_time_ms)}"')
+        return
     # 在原坐标点附近一个像素进行滑动，避免被识别为滑动操作
     run_adb_command(adb_path, device_serial, f"shell input swipe {x} {y} {x} {y} {press_time_ms}")
 
 
-def get_adb_screenshot(adb_path, device_serial):
-    """【核心修改】使用ADB从底层获取屏幕截图，并以OpenCV格式返回。"""
-    try:
-        # -p 表示输出PNG格式的二进制数据
-        png_data = run_adb_command(adb_path, device_serial, "shell screencap -p", return_binary=True)
-        if not png_data:
-            if DEBUG:
-                print("错误：通过ADB获取截图失败，没有返回数据。")
-            return None
+def set_screencap_mode(device_serial, mode):
+    """为指定设备选择截图模式（'png' 或 'raw'）。"""
+    if mode not in (SCREENCAP_MODE_PNG, SCREENCAP_MODE_RAW):
+        raise ValueError(f"未知的截图模式: {mode}")
+    g_screencap_modes[device_serial] = mode
 
-        # 将二进制数据在内存中解码为OpenCV图像对象
-        # 注意：Windows ADB的screencap输出可能包含\r\n，需要替换为\n
-        png_data_cleaned = png_data.replace(b'\r\n', b'\n')
-        image = cv2.imdecode(np.frombuffer(png_data_cleaned, np.uint8), cv2.IMREAD_COLOR)
-        return image
-    except Exception as e:
-        if DEBUG:
-            print(f"处理ADB截图时发生错误: {e}")
-        return None
+
+def get_screencap_mode(device_serial):
+    return g_screencap_modes.get(device_serial, DEFAULT_SCREENCAP_MODE)
 
 
-g_template_cache = {}
+# screencap 原始帧的像素格式 (android.graphics.PixelFormat)
+RAW_FORMAT_RGBA_8888 = 1
+RAW_FORMAT_RGBX_8888 = 2
+RAW_FORMAT_BGRA_8888 = 5
 
 
-def fast_find_template(haystack_frame, template_name, image_folder, is_legend=False, confidence_threshold=0.8):
+def parse_raw_screencap(raw_data):
     """
-    【性能优化版】
-    在给定的 `haystack_frame` 中查找模板。
-    核心优化：所有匹配操作都在灰度空间进行，大幅提升速度。
+    解析 `screencap`（不带 -p）输出的原始帧。
+    头部为 width / height / format 三个小端 uint32 共12字节，Android 9 起额外附带 4 字节 colorspace（共16字节）。
+    :return: (像素视图, 像素格式)。像素视图是直接引用 raw_data 的 (H, W, 4) 数组，没有拷贝也没有解码。
     """
-    global g_template_cache
+    if not raw_data or len(raw_data) < 12:
+        return None, None
 
-    if haystack_frame is None:
-        return None
+    width, height, pixel_format = struct.unpack_from('<III', raw_data, 0)
+    frame_size = width * height * 4
+    header_size = len(raw_data) - frame_size
+    if width <= 0 or height <= 0 or header_size not in (12, 16):
+        if DEBUG:
+            print(f"错误：无法识别的原始截图数据 (w={width}, h={height}, 总长度={len(raw_data)})")
+        return None, None
 
-    # 1. 定义 ROIS 坐标系的基准分辨率 (逻辑不变)
-    BASE_WIDTH = 1920.0
-    BASE_HEIGHT = 1080.0
+    pixels = np.frombuffer(raw_data, dtype=np.uint8, count=frame_size, offset=header_size)
+    return pixels.reshape((height, width, 4)), pixel_format
 
-    # 2. 获取当前截图的实际分辨率 (逻辑不变)
-    actual_height, actual_width = haystack_frame.shape[:2]
 
-    # 3. 计算缩放比例 (逻辑不变)
-    scale_x = actual_width / BASE_WIDTH
-    scale_y = actual_height / BASE_HEIGHT
+def get_adb_screenshot_raw(adb_path, device_serial):
+    """
+    通过 `exec-out screencap` 读取未压缩的原始帧。
+    :return: (像素视图, 像素格式)，像素视图为零拷贝的4通道数组（通常为 RGBA）。
+    """
+    raw_data = run_adb_command(adb_path, device_serial, "exec-out screencap", return_binary=True)
+    if not raw_data:
+        if DEBUG:
+            print("错误：通过ADB获取原始截图失败，没有返回数据。")
+        return None, None
+    return parse_raw_screencap(raw_data)
 
-    template_key = f"{image_folder}_{template_name}_{is_legend}_gray"
 
-    if template_key not in g_template_cache:
-        try:
-            relative_folder = os.path.join(image_folder, 'legend') if is_legend else image_folder
-            relative_path = os.path.join(relative_folder, f"{template_name}.png")
-            template_path = resource_path(relative_path)
-
-            template_raw = cv2.imread(template_path, cv2.IMREAD_UNCHANGED)
-            if template_raw is None:
-                if DEBUG: print(f"[错误] 无法加载模板: {template_path}")
-                g_template_cache[template_key] = None
-                return None
-
-            mask = None
-            # 【核心优化 2】在加载模板时，直接将其转换为灰度图进行缓存
-            if template_raw.shape[2] == 4:
-                mask = template_raw[:, :, 3]
-                template_color = cv2.cvtColor(template_raw, cv2.COLOR_BGRA2BGR)
-                template_gray = cv2.cvtColor(template_color, cv2.COLOR_BGR2GRAY)
-            else:
-                template_gray = cv2.cvtColor(template_raw, cv2.COLOR_BGR2GRAY)
-
-            # 缓存灰度模板和可能的遮罩
-            g_template_cache[template_key] = (template_gray, mask)
-
-        except Exception as e:
-            if DEBUG: print(f"[错误] 加载模板 {template_name} 失败: {e}")
-            g_template_cache[template_key] = None
+def get_adb_screenshot_raw_bgr(adb_path, device_serial):
+    """原始帧截图，转换为匹配逻辑使用的 BGR 图像。"""
+    try:
+        pixels, pixel_format = get_adb_screenshot_raw(adb_path, device_serial)
+        if pixels is None:
             return None
+        # 匹配逻辑使用 BGR，这里只做一次通道重排，代价远小于 PNG 编解码
+        if pixel_format == RAW_FORMAT_BGRA_8888:
+            return cv2.cvtColor(pixels, cv2.COLOR_BGRA2BGR)
+        return cv2.cvtColor(pixels, cv2.COLOR_RGBA2BGR)
+    except Exception as e:
+        if DEBUG:
+            print(f"处理ADB原始截图时发生错误: {e}")
+        return None
 
-    cached_data = g_template_cache[template_key]
-    if cached_data is None: return None
-
-    template, mask = cached_data
-    if template is None: return None
-
-    template_h, template_w = template.shape[:2]
 
-    # 【核心优化 3】在进行匹配前，将实时截图（大图）也转换为灰度图
-    haystack_gray = cv2.cvtColor(haystack_frame, cv2.COLOR_BGR2GRAY)
+def set_frame_source(device_serial, frame_source):
+    """
+    用任意画面来源（见 common/FrameSource.py）替换某台设备的 ADB 截图，传 None 取消替换。
+    替换后 get_adb_screenshot 及所有基于它的识别函数都从该来源取帧，
+    可用录制好的截图目录或视频离线回放、分析脚本与识别流程。
+    """
+    if frame_source is None:
+        g_frame_sources.pop(device_serial, None)
+    else:
+        g_frame_sources[device_serial] = frame_source
 
-    # 确定搜索区域 (ROI) (逻辑不变)
-    ROIS = ROIS_tw if "tw" in image_folder else ROIS_jp
-    screen_to_search = haystack_gray  # 从灰度图中截取ROI
-    offset_x, offset_y = 0, 0
 
-    if template_name in ROIS:
-        original_roi = ROIS[template_name]
-        x, y, w, h = original_roi
+def get_adb_screenshot(adb_path, device_serial):
+    """【核心修改】使用ADB从底层获取屏幕截图，并以OpenCV格式返回。"""
+    frame_source = g_frame_sources.get(device_serial)
+    if frame_source is not None:
+        return frame_source.get_latest_frame()
+    if get_screencap_mode(device_serial) == SCREENCAP_MODE_RAW:
+        return get_adb_screenshot_raw_bgr(adb_path, device_serial)
+    return get_adb_screenshot_png(adb_path, device_serial)
 
-        scaled_x = int(x * scale_x)
-        scaled_y = int(y * scale_y)
-        scaled_w = int(w * scale_x)
-        scaled_h = int(h * scale_y)
 
-        x1, y1 = max(0, scaled_x), max(0, scaled_y)
-        x2, y2 = min(actual_width, scaled_x + scaled_w), min(actual_height, scaled_y + scaled_h)
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
 
-        if x2 <= x1 or y2 <= y1: return None
 
-        screen_to_search = haystack_gray[y1:y2, x1:x2]  # 在灰度图上裁剪
-        offset_x, offset_y = x1, y1
+def get_adb_screenshot_png(adb_path, device_serial):
+    """PNG 截图（screencap -p），兼容性最好。"""
+    try:
+        # -p 表示输出PNG格式的二进制数据
+        png_data = run_adb_command(adb_path, device_serial, "shell screencap -p", return_binary=True)
+        if not png_data:
+            if DEBUG:
+                print("错误：通过ADB获取截图失败，没有返回数据。")
+            return None
 
-#######################################################################################################################
+        # 将二进制数据在内存中解码为OpenCV图像对象
+        # 注意：Windows ADB的screencap输出可能包含\r\n，需要替换为\n；
+        # 签名完好（经 adb server 协议直接读取、没有经过 pty）时原样解码，否则签名里的 \r\n 也会被破坏
+        png_data_cleaned = png_data if png_data.startswith(PNG_SIGNATURE) else png_data.replace(b'\r\n', b'\n')
+        image = cv2.imdecode(np.frombuffer(png_data_cleaned, np.uint8), cv2.IMREAD_COLOR)
+        return image
+    except Exception as e:
         if DEBUG:
-            # 调试代码保持不变，现在它会显示正确的裁剪区域
-            if template_name == debug_img:
-                try:
-                    debug_path = "D:\\STMZ_app\\debug_images"
-                    if not os.path.exists(debug_path):
-                        os.makedirs(debug_path)
-                    cv2.imwrite(os.path.join(debug_path, "DEBUG_01_HAYSTACK_FULL.png"), haystack_frame)
-                    if template is not None:
-                        cv2.imwrite(os.path.join(debug_path, "DEBUG_02_TEMPLATE_YES.png"), template)
-                    if mask is not None:
-                        cv2.imwrite(os.path.join(debug_path, "DEBUG_03_TEMPLATE_MASK.png"), mask)
-                    if screen_to_search is not None:
-                        cv2.imwrite(os.path.join(debug_path, "DEBUG_04_HAYSTACK_ROI.png"), screen_to_search)
-                    print(f"--- 调试图像已保存至 {debug_path} ---")
-                except Exception as e:
-                    print(f"!!! 保存调试图像时出错: {e} !!!")
-#######################################################################################################################
-
-    # 【核心优化 4】现在是在灰度图上进行模板匹配，速度极快
-    res = cv2.matchTemplate(screen_to_search, template, cv2.TM_CCOEFF_NORMED, mask=mask)
-    min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
-
-    if not np.isfinite(max_val): max_val = 0.0
+            print(f"处理ADB截图时发生错误: {e}")
+        return None
 
-    if DEBUG:
-        print(f"DEBUG: 快速查找(灰度) '{template_name}'，最高匹配度: {max_val:.4f}")
 
-    if max_val >= confidence_threshold:
-        # 计算坐标的逻辑完全不变
-        center_x = max_loc[0] + offset_x + template_w // 2
-        center_y = max_loc[1] + offset_y + template_h // 2
-        return center_x, center_y
-
-    return None
+# ADB 与 GDI 两条识别路径共用的模板仓库与匹配引擎
+g_template_store = TemplateStore(path_resolver=resource_path)
+g_matching_engine = MatchingEngine(
+    g_template_store,
+    roi_resolver=lambda image_folder: ROIS_tw if "tw" in image_folder else ROIS_jp,
+    pyramid_levels=PYRAMID_LEVELS,
+    debug=DEBUG,
+    debug_template=debug_img,
+    debug_path="D:\\STMZ_app\\debug_images"
+)
+# 两条路径沿用各自原有的匹配方式：ADB 截图走彩色匹配，GDI 高速截图走灰度匹配
+ADB_COLOR_MODE = MatchingEngine.COLOR_MODE_COLOR
+GDI_COLOR_MODE = MatchingEngine.COLOR_MODE_GRAY
 
 
-# --- 图像识别相关函数 ---
-def ordered_fight_strategy(position_order):
-    return [positions_to_click[pos] for pos in position_order]
+def set_detection_backend(device_serial, backend):
+    """
+    让某台设备的 ADB 识别改由多进程匹配客户端执行（DetectionPool.client(device_serial)），传 None 恢复本进程匹配。
+    多台设备同时运行时可避免各设备的模板匹配争抢 GIL。
+    """
+    if backend is None:
+        g_detection_backends.pop(device_serial, None)
+    else:
+        g_detection_backends[device_serial] = backend
 
 
-def if_image_on_screen(adb_path, device_serial, template_name, image_folder, confidence_threshold=0.8, is_legend=False):
-    """检查指定模板图片是否在当前屏幕上，并返回中心坐标。"""
-    try:
-        # 1. 构建相对路径
-        relative_folder = os.path.join(image_folder, 'legend') if is_legend else image_folder
-        relative_path = os.path.join(relative_folder, f"{template_name}.png")
+def _detection_engine(device_serial):
+    return g_detection_backends.get(device_serial, g_matching_engine)
 
-        template_path = resource_path(relative_path)
 
-        if not os.path.exists(template_path):
-            # 为了调试，我们打印相对路径和绝对路径
-            if DEBUG:
-                print(f"[ERROR] 模板图片未找到。相对路径: '{relative_path}', 解析后路径: '{template_path}'")
-            return False
+def preload_templates(image_folder):
+    """预加载某个服务器目录（含 legend/）下的全部模板，返回加载数量。"""
+    return g_template_store.preload(image_folder)
 
-        template_raw = cv2.imread(template_path, cv2.IMREAD_UNCHANGED)
-        if template_raw is None:
-            if DEBUG:
-                print(f"[ERROR] 无法读取模板图片: {template_path}")
-            return False
 
-        mask = None
-        # 检查图片是否有4个通道 (BGRA)
-        if template_raw.shape[2] == 4:
-            mask = template_raw[:, :, 3]  # Alpha通道作为mask
-            template = cv2.cvtColor(template_raw, cv2.COLOR_BGRA2BGR)  # 转换为3通道进行匹配
-        else:
-            template = template_raw  # 如果是3通道或1通道，直接使用
+def log_template_timings(logger=print, limit=10):
+    """
+    输出画面未变化而跳过的匹配次数、位置记忆的命中/回退次数，以及按累计耗时排序的最耗时模板，
+    便于找出需要缩小 ROI、裁剪或开启金字塔的素材。
+    """
+    stats = g_matching_engine.stats
+    if stats['matches']:
+        logger(f"模板匹配 {stats['matches']} 次，其中 {stats['skipped']} 次因画面未变化直接复用了上次结果。")
+    if stats['local_hits'] or stats['local_fallbacks']:
+        logger(f"位置记忆: {stats['local_hits']} 次在上次位置附近直接命中，"
+               f"{stats['local_fallbacks']} 次回退到整个 ROI 搜索。")
+    rows = g_matching_engine.timing_report(limit)
+    if not rows:
+        return
+    logger(f"模板匹配耗时 Top {len(rows)}（模板 / 次数 / 平均 ms / 最大 ms / 遮罩）:")
+    for key, count, avg_ms, max_ms, mask_kind in rows:
+        logger(f"  {key}: {count} 次, 平均 {avg_ms:.1f} ms, 最大 {max_ms:.1f} ms, {mask_kind}")
 
-        template_h, template_w = template.shape[:2]
 
-        # 2. 获取截图
-        screen_cv = get_adb_screenshot(adb_path, device_serial)
-        if screen_cv is None:
-            return False
+def fast_find_template(haystack_frame, template_name, image_folder, is_legend=False, confidence_threshold=0.8,
+                       location_key=None):
+    """
+    【性能优化版】
+    在给定的 `haystack_frame` 中查找模板。
+    核心优化：所有匹配操作都在灰度空间进行，大幅提升速度；
+    PYRAMID_LEVELS 中配置的大 ROI 模板会先做低分辨率粗匹配，再在候选附近做全分辨率验证。
+    同一帧要查找多个模板时，先用 Frame(haystack_frame) 包装再传入，整帧灰度转换只做一次。
+    location_key（通常是设备序列号）用于区分各设备的命中位置记忆。
+    """
+    result = g_matching_engine.match(haystack_frame, template_name, image_folder, confidence_threshold, is_legend,
+                                     color_mode=GDI_COLOR_MODE, location_key=location_key)
+    return result.center if result is not None and result.found else None
 
-        # 3. 确定搜索区域 (ROI)
-        roi = None
-        ROIS = ROIS_tw if "tw" in image_folder else ROIS_jp
 
-        screen_to_search = screen_cv
-        offset_x, offset_y = 0, 0
-        if template_name in ROIS:
-            roi = ROIS[template_name]
-            x, y, w, h = roi
-            screen_to_search = screen_cv[y:y + h, x:x + w]
-            offset_x, offset_y = x, y
+# --- 图像识别相关函数 ---
+def ordered_fight_strategy(position_order):
+    return [positions_to_click[pos] for pos in position_order]
 
-        # 4. 模板匹配
-        res = cv2.matchTemplate(screen_to_search, template, cv2.TM_CCOEFF_NORMED, mask=mask)
-        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
 
-        # 检查max_val是否为有效数字，防止nan或inf
-        if not np.isfinite(max_val):
-            max_val = 0.0  # 将无效值视为匹配失败
+def _adb_frame_source(adb_path, device_serial):
+    """把ADB截图包装成匹配引擎可用的画面来源。"""
+    return lambda: get_adb_screenshot(adb_path, device_serial)
 
-        if DEBUG:
-            print(f"DEBUG: 查找 '{template_name}'，最高匹配度: {max_val:.4f}")
-#######################################################################################################################
-            if DEBUG:
-                # 调试代码保持不变，现在它会显示正确的裁剪区域
-                if template_name == debug_img:
-                    try:
-                        debug_path = "D:\\STMZ_app\\debug_images"
-                        if not os.path.exists(debug_path):
-                            os.makedirs(debug_path)
-                        cv2.imwrite(os.path.join(debug_path, "DEBUG_01_HAYSTACK_FULL.png"), screen_cv)
-                        if template is not None:
-                            cv2.imwrite(os.path.join(debug_path, "DEBUG_02_TEMPLATE_YES.png"), template)
-                        if mask is not None:
-                            cv2.imwrite(os.path.join(debug_path, "DEBUG_03_TEMPLATE_MASK.png"), mask)
-                        if screen_to_search is not None:
-                            cv2.imwrite(os.path.join(debug_path, "DEBUG_04_HAYSTACK_ROI.png"), screen_to_search)
-                        print(f"--- 调试图像已保存至 {debug_path} ---")
-                    except Exception as e:
-                        print(f"!!! 保存调试图像时出错: {e} !!!")
-#######################################################################################################################
-
-        if max_val >= confidence_threshold:
-            # 5. 硬性边界检查 (逻辑保持不变)
-            top_left_x = max_loc[0] + offset_x
-            top_left_y = max_loc[1] + offset_y
-            if roi is not None:
-                roi_x, roi_y, roi_w, roi_h = roi
-                if not (top_left_x >= roi_x and top_left_y >= roi_y and
-                        top_left_x + template_w <= roi_x + roi_w and
-                        top_left_y + template_h <= roi_y + roi_h):
-                    if DEBUG:
-                        print(f"DEBUG: 找到 '{template_name}'，但其位置超出其自定义ROI范围，已忽略。")
-                    return False
-
-            center_x = top_left_x + template_w // 2
-            center_y = top_left_y + template_h // 2
-            return center_x, center_y
 
-        return False
-    except IndexError:
-        # 捕获潜在的因图片通道数不对导致的索引错误
-        if DEBUG:
-            print(f"[ERROR] 处理模板 '{template_name}' 时发生索引错误，请检查图片是否为常规彩色或灰度图。")
-        return False
+def if_image_on_screen(adb_path, device_serial, template_name, image_folder, confidence_threshold=0.8, is_legend=False):
+    """检查指定模板图片是否在当前屏幕上，并返回中心坐标。"""
+    try:
+        result = _detection_engine(device_serial).find(_adb_frame_source(adb_path, device_serial), template_name,
+                                                       image_folder, confidence_threshold, is_legend,
+                                                       color_mode=ADB_COLOR_MODE, location_key=device_serial)
+        return result.center if result is not None and result.found else False
     except Exception as e:
         if DEBUG:
             print(f"在if_image_on_screen中发生未知错误: {e}")
@@ -1219,129 +1400,162 @@ def if_image_on_screen(adb_path, device_serial, template_name, image_folder, con
 
 def find_and_click_image(adb_path, device_serial, template_name, image_folder, confidence_threshold=0.8, click=True,
                          is_legend=False):
-    """在ADB截图中查找图像，并可选地点击。修复了mask处理和nan值问题。"""
+    """在ADB截图中查找图像，并可选地点击。"""
     try:
-        # 1. 构建相对路径
-        relative_folder = os.path.join(image_folder, 'legend') if is_legend else image_folder
-        relative_path = os.path.join(relative_folder, f"{template_name}.png")
+        result = _detection_engine(device_serial).find(_adb_frame_source(adb_path, device_serial), template_name,
+                                                       image_folder, confidence_threshold, is_legend,
+                                                       color_mode=ADB_COLOR_MODE, location_key=device_serial)
+        if result is None or not result.found:
+            return None
 
-        template_path = resource_path(relative_path)
+        center_x, center_y = result.center
+        if click:
+            adb_tap(center_x, center_y, adb_path, device_serial)
+        return center_x, center_y
+    except Exception as e:
+        if DEBUG:
+            print(f"图像识别或点击时发生错误: {e}")
+        return None
 
-        if not os.path.exists(template_path):
-            if DEBUG:
-                print(f"[ERROR] 模板图片未找到。相对路径: '{relative_path}', 解析后路径: '{template_path}'")
-            return None
 
-        template_raw = cv2.imread(template_path, cv2.IMREAD_UNCHANGED)
-        if template_raw is None:
-            if DEBUG:
-                print(f"错误：无法读取模板图片 '{template_path}'")
-            return None
+def match_many(frame, templates, image_folder, confidence_threshold=0.8, is_legend=False):
+    """
+    在同一帧画面上依次评估多个模板（ADB 识别方式），用于一次截图回答“这些界面元素中哪些在屏幕上”。
+    :param templates: 模板列表，元素为模板名，或 (模板名, is_legend) 元组
+    :param confidence_threshold: 统一阈值，或 {模板名: 阈值} 字典（未列出的模板使用 0.8）
+    :return: {模板名: ((center_x, center_y), 匹配度)}，只包含达到阈值的模板
+    """
+    return g_matching_engine.match_many(frame, templates, image_folder, confidence_threshold, is_legend,
+                                        color_mode=ADB_COLOR_MODE)
 
-        mask = None
-        if template_raw.shape[2] == 4:
-            mask = template_raw[:, :, 3]
-            template = cv2.cvtColor(template_raw, cv2.COLOR_BGRA2BGR)
-        else:
-            template = template_raw
 
-        template_h, template_w = template.shape[:2]
+def find_many_on_screen(adb_path, device_serial, templates, image_folder, confidence_threshold=0.8, is_legend=False):
+    """只截一次图，返回 templates 中所有出现在屏幕上的模板，格式同 match_many。"""
+    screen = get_adb_screenshot(adb_path, device_serial)
+    if screen is None:
+        return {}
+    return _detection_engine(device_serial).match_many(Frame(screen), templates, image_folder, confidence_threshold,
+                                                       is_legend, color_mode=ADB_COLOR_MODE,
+                                                       location_key=device_serial)
 
-        # 2. 获取截图
-        screen_image = get_adb_screenshot(adb_path, device_serial)
-        if screen_image is None:
-            return None
 
-        # 3. 确定搜索区域 (ROI)
-        roi = None
-        ROIS = ROIS_tw if "tw" in image_folder else ROIS_jp
-        screen_to_search = screen_image
-        offset_x, offset_y = 0, 0
-        if template_name in ROIS:
-            roi = ROIS[template_name]
-            x, y, w, h = roi
-            screen_to_search = screen_image[y:y + h, x:x + w]
-            offset_x, offset_y = x, y
+# wait_for 同步截图时两次截图之间的最短间隔（秒），截图本身通常更慢，主要保证虚拟时钟下时间能推进
+WAIT_FOR_MIN_INTERVAL = 0.05
+# wait_for 等待后台截图管理器的新帧时，每隔这么久检查一次停止事件与超时
+WAIT_FOR_STOP_CHECK = 0.1
 
-        # 4. 模板匹配
-        result = cv2.matchTemplate(screen_to_search, template, cv2.TM_CCOEFF_NORMED, mask=mask)
-        _, max_val, _, max_loc = cv2.minMaxLoc(result)
 
-        if not np.isfinite(max_val):
-            max_val = 0.0
+class WaitResult:
+    """wait_for 的结果；命中时为真值。"""
 
-        if DEBUG:
-            print(f"DEBUG: 查找 '{template_name}'，最高匹配度: {max_val:.4f}")
-#######################################################################################################################
-            if DEBUG:
-                # 调试代码保持不变，现在它会显示正确的裁剪区域
-                if template_name == debug_img:
-                    try:
-                        debug_path = "D:\\STMZ_app\\debug_images"
-                        if not os.path.exists(debug_path):
-                            os.makedirs(debug_path)
-                        cv2.imwrite(os.path.join(debug_path, "DEBUG_01_HAYSTACK_FULL.png"), screen_image)
-                        if template is not None:
-                            cv2.imwrite(os.path.join(debug_path, "DEBUG_02_TEMPLATE_YES.png"), template)
-                        if mask is not None:
-                            cv2.imwrite(os.path.join(debug_path, "DEBUG_03_TEMPLATE_MASK.png"), mask)
-                        if screen_to_search is not None:
-                            cv2.imwrite(os.path.join(debug_path, "DEBUG_04_HAYSTACK_ROI.png"), screen_to_search)
-                        print(f"--- 调试图像已保存至 {debug_path} ---")
-                    except Exception as e:
-                        print(f"!!! 保存调试图像时出错: {e} !!!")
-######################################################################################################################
-
-        if max_val >= confidence_threshold:
-            # 5. 硬性边界检查
-            top_left_x = max_loc[0] + offset_x
-            top_left_y = max_loc[1] + offset_y
-            if roi is not None:
-                roi_x, roi_y, roi_w, roi_h = roi
-                if not (top_left_x >= roi_x and top_left_y >= roi_y and
-                        top_left_x + template_w <= roi_x + roi_w and
-                        top_left_y + template_h <= roi_y + roi_h):
-                    return None
-
-            # 6. 点击
-            center_x = top_left_x + template_w // 2
-            center_y = top_left_y + template_h // 2
-            if click:
-                adb_tap(center_x, center_y, adb_path, device_serial)
-            return center_x, center_y
+    def __init__(self, template_name=None, center=None, score=0.0, elapsed=0.0, frames=0, stopped=False):
+        self.template_name = template_name  # 命中的模板名，超时或被停止时为 None
+        self.center = center
+        self.score = score
+        self.elapsed = elapsed  # 等待耗时（秒）
+        self.frames = frames  # 期间检查过的帧数
+        self.stopped = stopped  # 是否因 stop_event 提前返回
+
+    def __bool__(self):
+        return self.template_name is not None
+
+    def __repr__(self):
+        return (f"WaitResult({self.template_name!r}, center={self.center}, elapsed={self.elapsed:.2f}s, "
+                f"frames={self.frames}, stopped={self.stopped})")
+
+
+def _frame_stream(adb_path, device_serial, capture_manager=None):
+    """
+    依次产生新的画面（Frame），没有新画面时产生 None 让调用方检查停止与超时。
+    有后台截图管理器（AdbCaptureManager）时在它的新帧通知上等待，否则背靠背同步截图。
+    """
+    sequence = 0
+    while True:
+        if capture_manager is not None:
+            frame, new_sequence, _ = capture_manager.wait_for_frame(sequence, timeout=WAIT_FOR_STOP_CHECK)
+            if frame is None:
+                yield None
+                continue
+            sequence = new_sequence
+            yield Frame(frame, frame_id=sequence)
         else:
-            return None
-    except IndexError:
-        if DEBUG:
-            print(f"[ERROR] 处理模板 '{template_name}' 时发生索引错误，请检查图片格式。")
-        return None
-    except Exception as e:
-        if DEBUG:
-            print(f"图像识别或点击时发生错误: {e}")
-        return None
+            started = clock.monotonic()
+            screen = get_adb_screenshot(adb_path, device_serial)
+            yield Frame(screen) if screen is not None else None
+            remaining = WAIT_FOR_MIN_INTERVAL - (clock.monotonic() - started)
+            if remaining > 0:
+                clock.sleep(remaining)
 
 
-def if_image_on_screen_GDI(capture_manager: ScreenCaptureManager, template_name, image_folder, confidence_threshold=0.8,
-                           is_legend=False):
-    """检查指定模板图片是否在当前屏幕上，并返回中心坐标。"""
+def wait_for(adb_path, device_serial, any_of, image_folder, timeout=None, stop_event=None, confidence_threshold=0.8,
+             is_legend=False, capture_manager=None):
+    """
+    等待画面中出现 any_of 中的任意一个模板，每来一帧就检查一次，命中后立即返回，
+    代替 `while not if_image_on_screen(...): sleep(0.5)`，状态切换后不再白等最多半秒。
+    :param any_of: 模板列表，元素为模板名或 (模板名, is_legend)；同一帧多个命中时按列表顺序取第一个
+    :param confidence_threshold: 统一阈值，或 {模板名: 阈值} 字典
+    :param timeout: 最长等待秒数，None 表示一直等
+    :param stop_event: 脚本的停止事件，置位后立即返回（stopped=True）
+    :param capture_manager: 已启动的 AdbCaptureManager；给出时直接使用它的帧流，不再额外截图
+    :return: WaitResult，命中时为真值，带模板名、中心坐标、匹配度与等待耗时
+    """
+    if isinstance(any_of, (str, tuple)):
+        any_of = [any_of]
+    names = [target[0] if isinstance(target, tuple) else target for target in any_of]
+    engine = _detection_engine(device_serial)
+    started = clock.monotonic()
+    deadline = started + timeout if timeout is not None else None
+    frames = 0
+    for frame in _frame_stream(adb_path, device_serial, capture_manager):
+        if stop_event is not None and stop_event.is_set():
+            return WaitResult(elapsed=clock.monotonic() - started, frames=frames, stopped=True)
+        if frame is not None:
+            frames += 1
+            try:
+                hits = engine.match_many(frame, any_of, image_folder, confidence_threshold, is_legend,
+                                         color_mode=ADB_COLOR_MODE, location_key=device_serial)
+            except Exception as e:
+                if DEBUG:
+                    print(f"在wait_for中发生未知错误: {e}")
+                hits = {}
+            for name in names:
+                if name in hits:
+                    center, score = hits[name]
+                    return WaitResult(name, center, score, clock.monotonic() - started, frames)
+        if deadline is not None and clock.monotonic() >= deadline:
+            return WaitResult(elapsed=clock.monotonic() - started, frames=frames)
+
+
+g_screen_classifiers = {}  # (image_folder, 设备序列号) -> ScreenStateClassifier
+
+
+def get_screen_state(adb_path, device_serial, image_folder):
+    """
+    截一次图，判断当前所在界面（地图、结算、统率力不足、活动结束、确认框、标题），
+    代替依次轮询多个模板。见过的界面由指纹索引认出后只需一次标志模板匹配确认。返回 ScreenState，可直接与 STATE_* 常量比较。
+    每台设备各有一个分类器与指纹索引。
+    """
+    key = (image_folder, device_serial)
+    classifier = g_screen_classifiers.get(key)
+    if classifier is None:
+        classifier = ScreenStateClassifier(g_matching_engine, image_folder, color_mode=ADB_COLOR_MODE,
+                                           fingerprints=ScreenFingerprintIndex())
+        g_screen_classifiers[key] = classifier
     try:
-        # 1. 从 Manager 获取最新一帧
-        current_frame = capture_manager.get_latest_frame()
-        if current_frame is None:
-            if DEBUG:
-                print("警告: if_image_on_screen 无法获取最新帧。")
-            return False
+        return classifier.classify(get_adb_screenshot(adb_path, device_serial), location_key=device_serial)
+    except Exception as e:
+        if DEBUG:
+            print(f"在get_screen_state中发生未知错误: {e}")
+        return ScreenState(STATE_UNKNOWN)
 
-        # 2. 在帧中查找模板
-        coords = fast_find_template(
-            current_frame,
-            template_name,
-            image_folder,
-            is_legend,
-            confidence_threshold
-        )
 
-        return coords if coords else False
+def if_image_on_screen_GDI(capture_manager, template_name, image_folder, confidence_threshold=0.8,
+                           is_legend=False, device_serial=None):
+    """检查指定模板图片是否在当前屏幕上，并返回中心坐标。device_serial 用于区分各设备的命中位置记忆。"""
+    try:
+        result = g_matching_engine.find(capture_manager, template_name, image_folder, confidence_threshold, is_legend,
+                                        color_mode=GDI_COLOR_MODE, location_key=device_serial)
+        return result.center if result is not None and result.found else False
 
     except Exception as e:
         if DEBUG:
@@ -1350,35 +1564,21 @@ def if_image_on_screen_GDI(capture_manager: ScreenCaptureManager, template_name,
         return False
 
 
-def find_and_click_image_GDI(capture_manager: ScreenCaptureManager, adb_path, device_serial, template_name,
+def find_and_click_image_GDI(capture_manager, adb_path, device_serial, template_name,
                              image_folder, confidence_threshold=0.8, click=True,
                              is_legend=False):
-    """在ADB截图中查找图像，并可选地点击。修复了mask处理和nan值问题。"""
+    """在截图管理器的最新一帧中查找图像，并可选地点击。"""
     try:
-        # 1. 从 Manager 获取最新一帧
-        current_frame = capture_manager.get_latest_frame()
-        if current_frame is None:
-            if DEBUG:
-                print("警告: find_and_click_image 无法获取最新帧。")
+        result = g_matching_engine.find(capture_manager, template_name, image_folder, confidence_threshold, is_legend,
+                                        color_mode=GDI_COLOR_MODE, location_key=device_serial)
+        if result is None or not result.found:
             return None
 
-        # 2. 在帧中查找模板
-        coords = fast_find_template(
-            current_frame,
-            template_name,
-            image_folder,
-            is_legend,
-            confidence_threshold
-        )
-
-        if coords:
-            center_x, center_y = coords
-            if click:
-                # 3. 使用您已有的高速 adb_tap
-                adb_tap(center_x, center_y, adb_path, device_serial)
-            return center_x, center_y
-        else:
-            return None
+        center_x, center_y = result.center
+        if click:
+            # 使用您已有的高速 adb_tap
+            adb_tap(center_x, center_y, adb_path, device_serial)
+        return center_x, center_y
 
     except Exception as e:
         if DEBUG:
@@ -1388,23 +1588,25 @@ def find_and_click_image_GDI(capture_manager: ScreenCaptureManager, adb_path, de
 
 
 def click_press_and_release(adb_path, device_serial, activity_pic_template, image_folder, confidence_threshold,
-                            is_legend=False):
-    """专门用于稳定点击'start_game'按钮的函数"""
+                            is_legend=False, stop_event=None, timeout=None):
+    """
+    专门用于稳定点击'start_game'按钮的函数
+    :param stop_event: 置位时放弃等待
+    :param timeout: 最长等待秒数，None 表示一直等
+    :return: 是否找到并点击了按钮
+    """
 
     if is_legend:
         image_folder = os.path.join(image_folder, "legend")
 
-    coords = None
-    # 循环直到找到坐标
-    while coords is None:
-        # 只找坐标，不点击
-        coords = find_and_click_image(adb_path, device_serial, activity_pic_template, image_folder,
-                                      confidence_threshold, click=False)
-        if coords is None:
-            time.sleep(0.5)
+    # 等到按钮出现（只找坐标，不点击）
+    hit = wait_for(adb_path, device_serial, activity_pic_template, image_folder, timeout=timeout,
+                   stop_event=stop_event, confidence_threshold=confidence_threshold)
+    if not hit:
+        return False
 
     # 找到坐标后，用 press_and_release 方法点击
-    center_x, center_y = coords
+    center_x, center_y = hit.center
     adb_press_and_release(center_x, center_y, adb_path, device_serial)
     return True
 
@@ -1412,6 +1614,7 @@ def click_press_and_release(adb_path, device_serial, activity_pic_template, imag
 # --- 数据持久化函数 ---
 DATA_DIR = "./data"
 DAILY_CATFOOD_DATA = os.path.join(DATA_DIR, "catfood_daily_counts.txt")
+g_daily_count_lock = threading.Lock()
 
 
 def ensure_data_dir():
@@ -1435,6 +1638,12 @@ def get_today_count(script_name):
 
 def increment_today_count(script_name):
     ensure_data_dir()
+    # 多台设备同时运行时，读改写必须串行，否则计数会互相覆盖
+    with g_daily_count_lock:
+        return _increment_today_count_locked(script_name)
+
+
+def _increment_today_count_locked(script_name):
     today_str = datetime.now().strftime('%Y-%m-%d')
     key = f"{today_str}_{script_name}"
     lines = []
@@ -1475,7 +1684,7 @@ def refresh_power(driver, package_name, image_folder, adb_path, device_serial, a
     """
     【精确恢复版】通过计算初始时间差，确保恢复后的时间对模拟器而言是连续且安全的。
     """
-    initial_host_dt = datetime.now()
+    initial_host_dt = clock.now()
     initial_emulator_dt = get_emulator_datetime(adb_path, device_serial)
 
     if initial_emulator_dt is None:
@@ -1490,29 +1699,21 @@ def refresh_power(driver, package_name, image_folder, adb_path, device_serial, a
 
     # 修改时间
     run_adb_command(adb_path, device_serial, "shell settings put global auto_time 0")
-    yesterday = datetime.now() - timedelta(days=2)
+    yesterday = clock.now() - timedelta(days=2)
     yesterday_str = yesterday.strftime('%m%d%H%M%Y.%S')
     run_adb_command(adb_path, device_serial, f"shell \"su -c 'date {yesterday_str}'\"")
-    time.sleep(0.01)
+    clock.sleep(0.01)
 
     # 启动游戏
     start_app(driver, package_name, logger=print)
 
-    skip_found = False
-    timeout = time.time() + 20
-    while time.time() < timeout:
-        if if_image_on_screen(adb_path, device_serial, "skip", image_folder, confidence_threshold=0.7):
-            skip_found = True
-            break
-        time.sleep(1)
-
-    if not skip_found:
+    if not wait_for(adb_path, device_serial, "skip", image_folder, timeout=20, confidence_threshold=0.7):
         print("错误：等待skip按钮超时，恢复流程失败。")
         run_adb_command(adb_path, device_serial, "shell settings put global auto_time 1")
         return
 
     # 在找到skip后，执行精确的时间恢复
-    current_host_dt = datetime.now()
+    current_host_dt = clock.now()
     target_emulator_dt = current_host_dt - time_offset  # 用当前真实时间减去初始偏差
     target_time_str = target_emulator_dt.strftime('%m%d%H%M%Y.%S')
     run_adb_command(adb_path, device_serial, f"shell \"su -c 'date {target_time_str}'\"")
@@ -1520,34 +1721,30 @@ def refresh_power(driver, package_name, image_folder, adb_path, device_serial, a
     print(f"时间已安全恢复到: {target_emulator_dt.strftime('%Y-%m-%d %H:%M:%S')}")
 
     adb_tap(1772, 1012, adb_path, device_serial)
-    time.sleep(0.5)
+    clock.sleep(0.5)
     adb_tap(1772, 1012, adb_path, device_serial)
-    time.sleep(2.5)
+    clock.sleep(2.5)
     adb_tap(950, 659, adb_path, device_serial)
-    time.sleep(0.5)
+    clock.sleep(0.5)
     adb_tap(950, 659, adb_path, device_serial)
-    time.sleep(1.5)
+    clock.sleep(1.5)
     adb_tap(950, 659, adb_path, device_serial)
 
     # 轮询 OK_MAP 和 X 等待到达主界面（您的原始逻辑，保持不变）
-    timeout = time.time() + 15
-    while time.time() < timeout:
+    timeout = clock.time() + 15
+    while clock.time() < timeout:
         if if_image_on_screen(adb_path, device_serial, "start_game", image_folder, confidence_threshold=0.8):
             break
         adb_press_and_release(1419, 676, adb_path, device_serial)
-        time.sleep(0.5)
+        clock.sleep(0.5)
         adb_press_and_release(1649, 88, adb_path, device_serial)
-        time.sleep(0.5)
+        clock.sleep(0.5)
         adb_press_and_release(1379, 597, adb_path, device_serial)
 
     if (not app_default) and (not is_legend):
-        timeout = time.time() + 10
-        while time.time() < timeout:
-            if if_image_on_screen(adb_path, device_serial, "start_game", image_folder, confidence_threshold=0.7):
-                break
-            time.sleep(0.5)
+        wait_for(adb_path, device_serial, "start_game", image_folder, timeout=10, confidence_threshold=0.7)
         click_press_and_release(adb_path, device_serial, "start_game", image_folder, confidence_threshold=0.7)
-    time.sleep(1)
+    clock.sleep(1)
 
 
 def refresh_time_rapid(adb_path, device_serial):
@@ -1558,7 +1755,7 @@ def refresh_time_rapid(adb_path, device_serial):
     从而在保持极速的同时，彻底解决卡顿问题和封禁风险。
     """
     # 1.【一次读取】
-    initial_host_dt = datetime.now()
+    initial_host_dt = clock.now()
     initial_emulator_dt = get_emulator_datetime(adb_path, device_serial)
 
     if initial_emulator_dt is None:
@@ -1572,7 +1769,7 @@ def refresh_time_rapid(adb_path, device_serial):
     yesterday_str = yesterday_dt.strftime('%m%d%H%M%Y.%S')
 
     # 计算理论上的目标时间
-    current_host_dt = datetime.now()
+    current_host_dt = clock.now()
     target_emulator_dt_theoretical = current_host_dt - time_offset
 
     # 【核心修正】增加一个150毫秒的前向补偿，以抵消从现在到命令执行完毕的延迟。
@@ -1596,12 +1793,6 @@ def refresh_time_rapid(adb_path, device_serial):
     run_adb_command(adb_path, device_serial, f"shell \"{command_chain}\"")
 
 
-def tap_cats_in_fight(positions_to_tap, adb_path, device_serial):
-    for pos in positions_to_tap:
-        adb_tap(pos[0], pos[1], adb_path, device_serial)
-        time.sleep(0.25)
-
-
 def roll_screen(adb_path, device_serial, start_x, start_y, end_x, end_y, duration_ms=300):
     try:
         adb_swipe(start_x, start_y, end_x, end_y, duration_ms, adb_path, device_serial)
@@ -1620,7 +1811,7 @@ def roll_some_length(adb_path, device_serial, delta_length=200,
     if vertical:
         end_y = single_vertical_roll_START[1] - delta_length  # 向上滑动，Y 减小
         while roll_times > 0:
-            time.sleep(0.5)
+            clock.sleep(0.5)
             roll_screen(
                 adb_path,
                 device_serial,
@@ -1633,7 +1824,7 @@ def roll_some_length(adb_path, device_serial, delta_length=200,
     else:
         end_x = single_level_roll_START[0] + delta_length  # 向右滑动，X 增加
         while roll_times > 0:
-            time.sleep(0.5)
+            clock.sleep(0.5)
             roll_screen(
                 adb_path,
                 device_serial,
@@ -1643,20 +1834,20 @@ def roll_some_length(adb_path, device_serial, delta_length=200,
             )
             roll_times -= 1
 
-    time.sleep(long_roll_break)
+    clock.sleep(long_roll_break)
     return True
 
 
 def roll_and_find_spec_legend_activity(adb_path, device_serial, activity_pic_template, image_folder,
                                        confidence_threshold=0.8):
     """通过ADB滚动屏幕，查找并点击指定的活动图片。"""
-    timeout = time.time() + 120
-    while time.time() < timeout:
-        time.sleep(0.5)
+    timeout = clock.time() + 120
+    while clock.time() < timeout:
+        clock.sleep(0.5)
         # 使用基于ADB的图像识别
         if if_image_on_screen(adb_path, device_serial, activity_pic_template, image_folder, confidence_threshold,
                               is_legend=True):
-            time.sleep(0.25)
+            clock.sleep(0.25)
             # 使用基于ADB的点击
             click_press_and_release(adb_path, device_serial, activity_pic_template, image_folder, confidence_threshold,
                                     is_legend=True)
@@ -1785,8 +1976,14 @@ def calculate_activity_earliest_timezone_value(target_activity_name, adb_path, d
 def get_visible_window_titles():
     """
     获取当前桌面上所有可见窗口的标题列表。
-    过滤掉不可见、无标题以及系统窗口。
+    过滤掉不可见、无标题以及系统窗口。非 Windows 环境（没有 pywin32）下返回空列表。
     """
+    try:
+        import win32con
+        import win32gui
+    except ImportError:
+        return []
+
     titles = []
 
     def enum_windows_proc(hwnd, lParam):
@@ -1,9 +1,10 @@
 # scripts/CLICK_for_DRAW_script.py
-import time
-from datetime import datetime
 
 from .base_script import ScriptBase
-from common.utils import adb_tap
+from common.Clock import clock
+from common.DeviceTapLoop import DeviceTapLoop
+from common.InputMacro import InputMacro
+from common.utils import adb_tap, get_tap_interval
 
 
 class JamaScript(ScriptBase):
@@ -33,6 +34,13 @@ class JamaScript(ScriptBase):
                 'label': '运行轮数 (0为无限)',
                 'type': 'entry',
                 'default': '无需设置'
+            },
+            {
+                'name': 'tap_mode',
+                'label': '点击方式',
+                'type': 'choice',
+                'default': '主机逐次点击',
+                'options': ['主机逐次点击', '设备端循环']
             }
         ]
 
@@ -47,21 +55,26 @@ class JamaScript(ScriptBase):
         except ValueError:
             max_loops = 0
 
+        tap_mode = options.get('tap_mode', '主机逐次点击')
+
         adb_path = options.get('adb_path')
         device_serial = options.get('device_serial')
 
         self.log(f"脚本 '{self.get_name()}' 已启动。")
-        self.log(f"配置: 服务器={server}, 最大轮数={max_loops if max_loops > 0 else '无限'}")
+        self.log(f"配置: 服务器={server}, 最大轮数={max_loops if max_loops > 0 else '无限'}, 点击方式={tap_mode}")
+
+        if tap_mode == '设备端循环':
+            return self.run_on_device(adb_path, device_serial, max_loops)
 
         # 3. 核心逻辑
         i = 0
-        time_start = datetime.now()
+        time_start = clock.now()
 
         while not self.is_stop_requested():
 
             # 检测终止
             if 0 < max_loops <= i:
-                time_delta = datetime.now() - time_start
+                time_delta = clock.now() - time_start
                 deltaH, rem = divmod(time_delta.seconds, 3600)
                 deltaM, deltaS = divmod(rem, 60)
                 self.log(f"本任务耗时: {time_delta.days}天 {deltaH:02d}时 {deltaM:02d}分 {deltaS:02d}秒")
@@ -69,9 +82,32 @@ class JamaScript(ScriptBase):
                 return "COMPLETED"
 
             adb_tap(1565, 906, adb_path, device_serial)  # 10连转蛋 & OK 按钮
-            time.sleep(0.25)
+            clock.sleep(get_tap_interval(device_serial))
 
             i += 1
+            self.count_round()
 
         self.log("脚本因用户请求而停止。")
         return "STOPPED"
+
+    def run_on_device(self, adb_path, device_serial, max_loops):
+        """点击循环整体推送到设备上运行，主机只定期查询次数，停止时立即结束设备端循环。"""
+        macro = InputMacro().tap(1565, 906).sleep(get_tap_interval(device_serial))  # 10连转蛋 & OK 按钮
+        loop = DeviceTapLoop(adb_path, device_serial, macro, name='click_for_draw', max_iterations=max_loops,
+                             log_callback=self.log)
+        time_start = clock.now()
+        iterations = loop.run_until(self.stop_event)
+        self.rounds = iterations
+
+        time_delta = clock.now() - time_start
+        deltaH, rem = divmod(time_delta.seconds, 3600)
+        deltaM, deltaS = divmod(rem, 60)
+        self.log(f"设备端共点击 {iterations} 次，耗时: {time_delta.days}天 {deltaH:02d}时 {deltaM:02d}分 {deltaS:02d}秒")
+        if self.is_stop_requested():
+            self.log("脚本因用户请求而停止。")
+            return "STOPPED"
+        if iterations < max_loops or max_loops <= 0:
+            self.log("错误: 设备端点击循环意外退出。")
+            return "ERROR"
+        self.log(f"\n已完成设定的 {max_loops} 轮任务，脚本自动停止。")
+        return "COMPLETED"
@@ -1,8 +1,8 @@
 # scripts/COLLECT_GOLD_script.py
-import time
-from datetime import datetime
 from .base_script import ScriptBase
-from common.utils import (if_image_on_screen, refresh_power, roll_screen,
+from common.Clock import clock
+from common.FightExecutor import FightExecutor
+from common.utils import (if_image_on_screen, refresh_power, roll_screen, find_many_on_screen,
                           gold_positions_order_default, ordered_fight_strategy, adb_tap)
 
 
@@ -112,7 +112,7 @@ class ConsumeScript(ScriptBase):
 
         # 3. 核心逻辑
         i = 0
-        time_start = datetime.now()
+        time_start = clock.now()
 
         while not self.is_stop_requested():
             if 0 < max_loops <= i:
@@ -124,7 +124,7 @@ class ConsumeScript(ScriptBase):
             self.log(f"第 {i + 1} 关开始...")
 
             # 记录运行时间
-            time_delta = datetime.now() - time_start
+            time_delta = clock.now() - time_start
             deltaH, rem = divmod(time_delta.seconds, 3600)
             deltaM, deltaS = divmod(rem, 60)
             self.log(f"已运行: {time_delta.days}天 {deltaH:02d}时 {deltaM:02d}分 {deltaS:02d}秒")
@@ -134,32 +134,33 @@ class ConsumeScript(ScriptBase):
                 while not self.is_stop_requested():
                     chose_ok = False
                     if collect_all_gold_enabled:
-                        if (not chose_ok) and (
-                                not if_image_on_screen(adb_path, device_serial, "gold_left", image_folder, confidence_threshold=0.9)):
+                        # 一次截图同时判断上一关与本关的金宝状态
+                        gold_hits = find_many_on_screen(adb_path, device_serial, ["gold_left", "gold"], image_folder,
+                                                        confidence_threshold=0.9)
+                        if (not chose_ok) and ("gold_left" not in gold_hits):
                             roll_screen(adb_path, device_serial,
                                         roll_start[0], roll_start[1],
                                         roll_right_end[0], roll_right_end[1],
                                         duration_ms)  # 换上一关
                             self.log("\n上一关无金宝，进行回调重刷。")
-                            time.sleep(0.75)
+                            clock.sleep(0.75)
                             break
 
-                        if (not chose_ok) and (
-                                if_image_on_screen(adb_path, device_serial, "gold", image_folder, confidence_threshold=0.9)):
+                        if (not chose_ok) and ("gold" in gold_hits):
                             roll_screen(adb_path, device_serial,
                                         roll_start[0], roll_start[1],
                                         roll_left_end[0], roll_left_end[1],
                                         duration_ms=300)  # 换下一关
                             i += 1
-                            time.sleep(0.75)
+                            clock.sleep(0.75)
                             break
                     else:
-                        time.sleep(0.75)
+                        clock.sleep(0.75)
 
                     adb_tap(1627, 765, adb_path, device_serial)
 
                     # 判断统率力
-                    time.sleep(0.5)
+                    clock.sleep(0.5)
                     if if_image_on_screen(adb_path, device_serial, "power_limited", image_folder,
                                           confidence_threshold=0.7):
 
@@ -169,28 +170,22 @@ class ConsumeScript(ScriptBase):
 
                         if use_power_recover_enabled:
                             adb_tap(729, 712, adb_path, device_serial)
-                            time.sleep(0.5)
+                            clock.sleep(0.5)
                             adb_tap(1627, 765, adb_path, device_serial)
                         else:
                             refresh_power(self.driver, package_name, image_folder, adb_path, device_serial)
-                            time.sleep(1.5)
+                            clock.sleep(1.5)
                             adb_tap(1627, 765, adb_path, device_serial)
 
                     # 等待返回地图
                     positions_to_tap = ordered_fight_strategy(position_order)
-                    find_return = False
-                    while not find_return and not if_image_on_screen(adb_path, device_serial, "return_map", image_folder,
-                                                                     confidence_threshold=0.7):
-                        for pos in positions_to_tap:
-                            if if_image_on_screen(adb_path, device_serial, "return_map", image_folder, confidence_threshold=0.7):
-                                find_return = True
-                                break
-                            adb_tap(pos[0], pos[1], adb_path, device_serial)
-                            time.sleep(0.25)
+                    FightExecutor(adb_path, device_serial, image_folder, log_callback=self.log).run(
+                        positions_to_tap, self.stop_event)
                     adb_tap(1861, 57, adb_path, device_serial)
                     adb_tap(1861, 57, adb_path, device_serial)
                     adb_tap(1861, 57, adb_path, device_serial)
-                    time.sleep(1)
+                    clock.sleep(1)
+                    self.count_round()
 
                     if not collect_all_gold_enabled:
                         i += 1
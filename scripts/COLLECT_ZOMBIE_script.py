@@ -1,10 +1,11 @@
 # scripts/COLLECT_ZOMBIE_script.py
-import time
-from datetime import datetime, timedelta
+from datetime import timedelta
 from .base_script import ScriptBase
+from common.Clock import clock
+from common.FightExecutor import FightExecutor
 from common.utils import (if_image_on_screen, refresh_power, roll_screen, roll_some_length, click_press_and_release,
                           gold_positions_order_default, ordered_fight_strategy, adb_tap, find_and_click_image,
-                          long_roll_length, long_roll_time_ms, adb_press_and_release, tap_cats_in_fight)
+                          long_roll_length, long_roll_time_ms, adb_press_and_release)
 
 
 class ConsumeScript(ScriptBase):
@@ -119,7 +120,7 @@ class ConsumeScript(ScriptBase):
         i = 0
         start = True
         max_times = max_times_default
-        time_start = datetime.now()
+        time_start = clock.now()
 
         while not self.is_stop_requested():
             if 0 < max_loops <= i:
@@ -130,7 +131,7 @@ class ConsumeScript(ScriptBase):
             self.log(f"第 {i + 1} 关开始...")
 
             # 记录运行时间
-            time_delta = datetime.now() - time_start
+            time_delta = clock.now() - time_start
             deltaH, rem = divmod(time_delta.seconds, 3600)
             deltaM, deltaS = divmod(rem, 60)
             self.log(f"已运行: {time_delta.days}天 {deltaH:02d}时 {deltaM:02d}分 {deltaS:02d}秒")
@@ -141,20 +142,19 @@ class ConsumeScript(ScriptBase):
                     chose_ok = False
                     enter_map_ok = False
                     click_press_and_release(adb_path, device_serial, "change_map", image_folder,
-                                            confidence_threshold=0.7)
-                    time.sleep(2)
+                                            confidence_threshold=0.7, stop_event=self.stop_event)
+                    clock.sleep(2)
                     if start:
                         roll_some_length(adb_path, device_serial, long_roll_length, long_roll_time_ms, 2,
                                          vertical=False)
                         start = False
                     while max_times:
-                        if if_image_on_screen(adb_path, device_serial, "zombie_map", image_folder,
-                                              confidence_threshold=0.7):
-                            find_and_click_image(adb_path, device_serial, "zombie_map", image_folder,
-                                                 confidence_threshold=0.7)
-                            time.sleep(2)
+                        # 查找并点击合并为一次截图
+                        if find_and_click_image(adb_path, device_serial, "zombie_map", image_folder,
+                                                confidence_threshold=0.7):
+                            clock.sleep(2)
                             click_press_and_release(adb_path, device_serial, "start_game", image_folder,
-                                                    confidence_threshold=0.7)
+                                                    confidence_threshold=0.7, stop_event=self.stop_event)
                             enter_map_ok = True
                             break
                         else:
@@ -163,7 +163,7 @@ class ConsumeScript(ScriptBase):
                                         roll_left_end[0], roll_left_end[1],
                                         duration_ms=300)  # 换下一关
                             max_times -= 1
-                            time.sleep(0.75)
+                            clock.sleep(0.75)
 
                     if not enter_map_ok:
                         if refresh_zombie_enabled:
@@ -178,16 +178,14 @@ class ConsumeScript(ScriptBase):
                             max_times = max_times_default
                             continue
 
-                    timeout = datetime.now() + timedelta(seconds=5)
-                    while datetime.now() < timeout:
-                        if if_image_on_screen(adb_path, device_serial, "zombie_inner", image_folder,
-                                              confidence_threshold=0.7):
-                            find_and_click_image(adb_path, device_serial, "zombie_inner", image_folder,
-                                                 confidence_threshold=0.7)
+                    timeout = clock.now() + timedelta(seconds=5)
+                    while clock.now() < timeout:
+                        if find_and_click_image(adb_path, device_serial, "zombie_inner", image_folder,
+                                                confidence_threshold=0.7):
                             chose_ok = True
-                            time.sleep(4)
+                            clock.sleep(4)
                             break
-                        time.sleep(0.25)
+                        clock.sleep(0.25)
 
                     if not chose_ok:
                         adb_tap(85, 1000, adb_path, device_serial)  # 左下角的返回
@@ -196,7 +194,7 @@ class ConsumeScript(ScriptBase):
                     adb_tap(1627, 765, adb_path, device_serial)
 
                     # 判断统率力
-                    time.sleep(0.5)
+                    clock.sleep(0.5)
                     if if_image_on_screen(adb_path, device_serial, "power_limited", image_folder,
                                           confidence_threshold=0.7):
                         if (not refresh_power_enabled) and (not use_power_recover_enabled):
@@ -205,7 +203,7 @@ class ConsumeScript(ScriptBase):
 
                         if use_power_recover_enabled:
                             adb_tap(729, 712, adb_path, device_serial)
-                            time.sleep(1)
+                            clock.sleep(1)
                             adb_tap(1627, 765, adb_path, device_serial)
                         elif refresh_power_enabled:
                             refresh_power(self.driver, package_name, image_folder, adb_path, device_serial,
@@ -216,20 +214,18 @@ class ConsumeScript(ScriptBase):
 
                     # 等待返回地图
                     positions_to_tap = ordered_fight_strategy(position_order)
-                    while not if_image_on_screen(adb_path, device_serial, "return_map", image_folder,
-                                                 confidence_threshold=0.7):
-                        if self.is_stop_requested():
-                            break
-                        tap_cats_in_fight(positions_to_tap, adb_path, device_serial)
+                    FightExecutor(adb_path, device_serial, image_folder, log_callback=self.log).run(
+                        positions_to_tap, self.stop_event)
 
                     adb_press_and_release(1861, 57, adb_path, device_serial)  # 点击返回地图
                     adb_press_and_release(1861, 57, adb_path, device_serial)
                     adb_press_and_release(1861, 57, adb_path, device_serial)
-                    time.sleep(2)
+                    clock.sleep(2)
                     adb_tap(85, 1000, adb_path, device_serial)  # 左下角的返回
-                    time.sleep(2)
+                    clock.sleep(2)
 
                     i += 1
+                    self.count_round()
 
                     if max_times <= 0:
                         if refresh_power_enabled:
@@ -1,8 +1,7 @@
 # scripts/CONSUME_script.py
-import time
-from datetime import datetime
 from .base_script import ScriptBase
-from common.utils import (if_image_on_screen, refresh_power, consume_positions_order_default, ordered_fight_strategy, adb_tap)
+from common.Clock import clock
+from common.utils import (if_image_on_screen, refresh_power, consume_positions_order_default, ordered_fight_strategy, adb_tap, wait_for)
 
 
 class ConsumeScript(ScriptBase):
@@ -97,7 +96,7 @@ class ConsumeScript(ScriptBase):
         # 3. 核心逻辑
         i = 0
         flag = 0
-        time_start = datetime.now()
+        time_start = clock.now()
 
         while not self.is_stop_requested():
             if 0 < max_loops <= i:
@@ -109,7 +108,7 @@ class ConsumeScript(ScriptBase):
             self.log(f"第 {i + 1} 轮开始...")
 
             # 记录运行时间
-            time_delta = datetime.now() - time_start
+            time_delta = clock.now() - time_start
             deltaH, rem = divmod(time_delta.seconds, 3600)
             deltaM, deltaS = divmod(rem, 60)
             self.log(f"已运行: {time_delta.days}天 {deltaH:02d}时 {deltaM:02d}分 {deltaS:02d}秒")
@@ -122,12 +121,13 @@ class ConsumeScript(ScriptBase):
                     if flag:
                         adb_tap(1627, 765, adb_path, device_serial)
                     else:
-                        while not if_image_on_screen(adb_path, device_serial, "start_fight_map", image_folder, confidence_threshold=0.7):
-                            time.sleep(0.5)
+                        if wait_for(adb_path, device_serial, "start_fight_map", image_folder,
+                                    stop_event=self.stop_event, confidence_threshold=0.7).stopped:
+                            break
                         adb_tap(1627, 765, adb_path, device_serial)
 
                     # 判断统率力
-                    time.sleep(0.5)
+                    clock.sleep(0.5)
                     if if_image_on_screen(adb_path, device_serial, "power_limited", image_folder, confidence_threshold=0.7):
 
                         if (not refresh_power_enabled) and (not use_power_recover_enabled):
@@ -148,6 +148,7 @@ class ConsumeScript(ScriptBase):
                             adb_tap(pos[0], pos[1], adb_path, device_serial)
                         adb_tap(1861, 57, adb_path, device_serial)
                     i += 1
+                    self.count_round()
                     break
 
             except Exception as e:
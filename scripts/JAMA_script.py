@@ -1,10 +1,11 @@
 # scripts/JAMA_script.py
-import time
 import threading
-from datetime import datetime, timedelta
+from datetime import timedelta
 from .base_script import ScriptBase
 
-from common.ScreenCaptureManager import ScreenCaptureManager as SCM
+from common.AdbCaptureManager import AdbCaptureManager
+from common.Clock import clock
+from common.InputMacro import InputMacro
 from common.utils import (
     if_image_on_screen,
     if_image_on_screen_GDI,
@@ -76,7 +77,7 @@ class JamaScript(ScriptBase):
                 'name': 'run_mod',
                 'label': '运行模式',
                 'type': 'choice',
-                'options': ['兼容', '高效（兼容问题 & 潜在bug）'],
+                'options': ['兼容', '高效（兼容问题 & 潜在bug）', '高效-ADB（无需窗口标题）'],
                 'default': '兼容'
             }
         ]
@@ -85,22 +86,23 @@ class JamaScript(ScriptBase):
         member_coords = if_image_on_screen(adb_path, device_serial, "member", image_folder, confidence_threshold=0.7)
         if member_coords:
             adb_press_and_release(member_coords[0], member_coords[1], adb_path, device_serial)
-            time.sleep(0.25)
+            clock.sleep(0.25)
             adb_press_and_release(385, 747, adb_path, device_serial)
-            time.sleep(0.25)
+            clock.sleep(0.25)
             adb_press_and_release(712, 773, adb_path, device_serial)
-            time.sleep(0.25)
+            clock.sleep(0.25)
             adb_press_and_release(712, 773, adb_path, device_serial)
 
     def kill_all_members_gdi(self, capture_manager, image_folder, adb_path, device_serial):
-        member_coords = if_image_on_screen_GDI(capture_manager, "member", image_folder, confidence_threshold=0.7)
+        member_coords = if_image_on_screen_GDI(capture_manager, "member", image_folder, confidence_threshold=0.7,
+                                               device_serial=device_serial)
         if member_coords:
             adb_press_and_release(member_coords[0], member_coords[1], adb_path, device_serial)
-            time.sleep(0.25)
+            clock.sleep(0.25)
             adb_press_and_release(385, 747, adb_path, device_serial)
-            time.sleep(0.25)
+            clock.sleep(0.25)
             adb_press_and_release(712, 773, adb_path, device_serial)
-            time.sleep(0.25)
+            clock.sleep(0.25)
             adb_press_and_release(712, 773, adb_path, device_serial)
 
     def run(self, options):
@@ -131,9 +133,11 @@ class JamaScript(ScriptBase):
                 self.log("[错误] 高效模式需要配置 '模拟器窗口标题'。")
                 return "FAILED"
             try:
+                # GDI 截图依赖 pywin32，只在选择该模式时才导入
+                from common.ScreenCaptureManager import ScreenCaptureManager as SCM
                 capture_manager = SCM(window_title, log_callback=self.log)
                 capture_manager.start()
-                time.sleep(0.5)
+                clock.sleep(0.5)
                 if capture_manager.get_latest_frame() is None:
                     self.log("错误：无法捕获到第一帧截图。请确保模拟器在前台且窗口标题正确。")
                     if capture_manager:
@@ -142,19 +146,28 @@ class JamaScript(ScriptBase):
             except ValueError as e:
                 self.log(f"[致命错误] 无法启动截图管理器: {e}")
                 return "FAILED"
+        elif run_mod == '高效-ADB（无需窗口标题）':
+            # 后台线程持续 ADB 截图，后续流程与 GDI 高效模式完全相同
+            capture_manager = AdbCaptureManager(adb_path, device_serial, log_callback=self.log)
+            capture_manager.start()
+            first_frame, _, _ = capture_manager.wait_for_frame(timeout=5)
+            if first_frame is None:
+                self.log("错误：ADB 后台截图 5 秒内未获取到画面，请检查设备连接。")
+                capture_manager.stop()
+                return "FAILED"
 
         i = 0
-        time_start = datetime.now()
-        single_time_start = datetime.now()
+        time_start = clock.now()
+        single_time_start = clock.now()
 
         try:
             while not self.is_stop_requested():
-                single_time_usage = datetime.now() - single_time_start
+                single_time_usage = clock.now() - single_time_start
                 self.log(f"第 {i} 轮消耗时间 : {single_time_usage}")
-                single_time_start = datetime.now()
+                single_time_start = clock.now()
 
                 if 0 < max_loops <= i:
-                    time_delta = datetime.now() - time_start
+                    time_delta = clock.now() - time_start
                     deltaH, rem = divmod(time_delta.seconds, 3600)
                     deltaM, deltaS = divmod(rem, 60)
                     self.log(f"本任务耗时: {time_delta.days}天 {deltaH:02d}时 {deltaM:02d}分 {deltaS:02d}秒")
@@ -172,67 +185,54 @@ class JamaScript(ScriptBase):
                 #     adb_press_and_release(1852, 155, adb_path, device_serial)
 
                 found_yes = False
-                timeout = datetime.now() + timedelta(seconds=10)
+                timeout = clock.now() + timedelta(seconds=10)
                 if run_mod == '兼容':
-                    while datetime.now() < timeout and not self.is_stop_requested():
+                    while clock.now() < timeout and not self.is_stop_requested():
                         found = if_image_on_screen(adb_path, device_serial, "YES", image_folder,
                                                    confidence_threshold=0.8)
 
                         if found:
                             if server == '台服':
-                                adb_press_and_release(685, 730, adb_path, device_serial)
-                                time.sleep(0.25)
-                                adb_press_and_release(685, 730, adb_path, device_serial)
+                                InputMacro().press(685, 730).sleep(0.25).press(685, 730).run(adb_path, device_serial)
                             elif server == '日服':
-                                adb_press_and_release(723, 740, adb_path, device_serial)
-                                time.sleep(0.25)
-                                adb_press_and_release(723, 740, adb_path, device_serial)
+                                InputMacro().press(723, 740).sleep(0.25).press(723, 740).run(adb_path, device_serial)
                             found_yes = True
                             break
                         else:
                             adb_press_and_release(1852, 155, adb_path, device_serial)
                 else:
-                    while datetime.now() < timeout and not self.is_stop_requested():
-                        found = if_image_on_screen_GDI(capture_manager, "YES", image_folder, confidence_threshold=0.8)
-
-                        if found:
-                            if server == '台服':
-                                adb_press_and_release(685, 730, adb_path, device_serial)
-                                time.sleep(0.25)
-                                adb_press_and_release(685, 730, adb_path, device_serial)
-                            elif server == '日服':
-                                adb_press_and_release(723, 740, adb_path, device_serial)
-                                time.sleep(0.25)
-                                adb_press_and_release(723, 740, adb_path, device_serial)
-                            found_yes = True
-                            break
-                        else:
-                            adb_press_and_release(1852, 155, adb_path, device_serial)
+                    # 截图线程每截到一帧就评估 YES，点击循环只需查看事件队列
+                    with capture_manager.subscribe("YES", image_folder, confidence_threshold=0.8) as yes_events:
+                        while clock.now() < timeout and not self.is_stop_requested():
+                            if yes_events.poll():
+                                if server == '台服':
+                                    InputMacro().press(685, 730).sleep(0.25).press(685, 730).run(adb_path,
+                                                                                                 device_serial)
+                                elif server == '日服':
+                                    InputMacro().press(723, 740).sleep(0.25).press(723, 740).run(adb_path,
+                                                                                                 device_serial)
+                                found_yes = True
+                                break
+                            else:
+                                adb_press_and_release(1852, 155, adb_path, device_serial)
 
                 if not found_yes:
                     self.log(f"警告: '{run_mod}' 模式下10秒内未找到'YES'按钮。")
 
                 refresh_time_rapid(adb_path, device_serial)
 
-                time.sleep(0.05)
-                adb_press_and_release(1600, 146, adb_path, device_serial)
-                time.sleep(0.05)
-                adb_press_and_release(1600, 155, adb_path, device_serial)
-                time.sleep(0.05)
-                adb_press_and_release(1600, 155, adb_path, device_serial)
-                time.sleep(0.05)
-                adb_press_and_release(1600, 155, adb_path, device_serial)
-                time.sleep(0.05)
-                adb_press_and_release(1600, 155, adb_path, device_serial)
-                time.sleep(0.05)
-                adb_press_and_release(1600, 155, adb_path, device_serial)
-
-                time.sleep(2)
+                # 六次点击编译成一条设备端命令，一次往返完成
+                macro = InputMacro().sleep(0.05).press(1600, 146)
+                for _ in range(5):
+                    macro.sleep(0.05).press(1600, 155)
+                macro.run(adb_path, device_serial)
+
+                clock.sleep(2)
 
                 found_reward = False
-                timeout = datetime.now() + timedelta(seconds=10)
+                timeout = clock.now() + timedelta(seconds=10)
                 if run_mod == '兼容':
-                    while datetime.now() < timeout:
+                    while clock.now() < timeout:
                         found = if_image_on_screen(adb_path, device_serial, "rego", image_folder,
                                                    confidence_threshold=0.5)
                         if found:
@@ -242,17 +242,15 @@ class JamaScript(ScriptBase):
                         else:
                             adb_press_and_release(1450, 155, adb_path, device_serial)
                 else:
-                    while datetime.now() < timeout:
-                        found = if_image_on_screen_GDI(capture_manager, "rego", image_folder,
-                                                       confidence_threshold=0.5)
-                        # found = if_image_on_screen_GDI(capture_manager, "reward_result", image_folder,
-                        #                                confidence_threshold=0.7)
-                        if found:
-                            adb_press_and_release(1450, 155, adb_path, device_serial)
-                            found_reward = True
-                            break
-                        else:
-                            adb_press_and_release(1450, 155, adb_path, device_serial)
+                    with capture_manager.subscribe("rego", image_folder, confidence_threshold=0.5) as rego_events:
+                        while clock.now() < timeout:
+                            # 也可以订阅 "reward_result"（confidence_threshold=0.7）
+                            if rego_events.poll():
+                                adb_press_and_release(1450, 155, adb_path, device_serial)
+                                found_reward = True
+                                break
+                            else:
+                                adb_press_and_release(1450, 155, adb_path, device_serial)
 
                 if not found_reward:
                     self.log(f"警告: '{run_mod}' 模式下10秒内未找到'rego/reward_result'按钮。")
@@ -262,6 +260,7 @@ class JamaScript(ScriptBase):
                 #     adb_press_and_release(1450, 155, adb_path, device_serial)
 
                 i += 1
+                self.count_round()
                 increment_today_count(self.get_name())
 
         finally:
@@ -17,6 +17,7 @@ class ScriptBase(ABC):
         self.driver = driver
         self.stop_event = stop_event
         self.logger = logger
+        self.rounds = 0  # 本次运行完成的轮数（关卡/领取次数），用于多设备状态表
 
     @staticmethod
     @abstractmethod
@@ -68,6 +69,10 @@ class ScriptBase(ABC):
         if self.logger:
             self.logger(str(message))
 
+    def count_round(self):
+        """记录完成了一轮。脚本在每轮结束处调用。"""
+        self.rounds += 1
+
     def is_stop_requested(self):
         """检查停止事件是否被触发。脚本循环中应频繁调用此方法。"""
         return self.stop_event.is_set()
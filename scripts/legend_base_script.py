@@ -1,13 +1,16 @@
-import time
 from abc import ABC
-from datetime import datetime, timedelta
 
+from common.Clock import clock
+from common.FightExecutor import FightExecutor
+from common.InputMacro import InputMacro
+from common.ScreenStateClassifier import STATE_ACT_TIMEOUT, STATE_POWER_LIMITED
 from common.utils import (if_image_on_screen, refresh_power, legend_positions_order_default,
                           ordered_fight_strategy, roll_and_find_spec_legend_activity, roll_some_length,
-                          enter_legend_time, tap_cats_in_fight, long_roll_length, long_roll_time_ms, long_roll_counts,
+                          enter_legend_time, long_roll_length, long_roll_time_ms, long_roll_counts,
                           calculate_activity_earliest_timezone_value, change_time_zone, recover_time_zone,
                           g_original_timezone, act_timeout_time, back_to_main_place_time,
-                          run_adb_command, adb_press_and_release, click_press_and_release, find_and_click_image)
+                          run_adb_command, adb_press_and_release, click_press_and_release, find_and_click_image,
+                          find_many_on_screen, get_screen_state, wait_for)
 from scripts.base_script import ScriptBase
 
 
@@ -134,28 +137,37 @@ class LegendaryScriptBase(ScriptBase, ABC):
         return True
 
     def detect_legend_act_timeout(self, adb_path, device_serial, image_folder, change_timezone_enabled, long_roll_times,
-                                  timing="start_fight"):
-        time.sleep(1)
-        if if_image_on_screen(adb_path, device_serial, "act_timeout", image_folder,
-                              confidence_threshold=0.7, is_legend=True):
-            if if_image_on_screen(adb_path, device_serial, "OK", image_folder, confidence_threshold=0.7):
+                                  timing="start_fight", state=None):
+        """:param state: 调用方已经识别出的 ScreenState；给出时直接使用，不再等待和重新截图"""
+        if state is not None:
+            # 分类器已在同一帧上确认了“活动已结束”弹窗，OK 按钮是弹窗的一部分
+            hits = {"act_timeout", "OK"} if state == STATE_ACT_TIMEOUT else set()
+        else:
+            clock.sleep(1)
+            # 一次截图同时判断“活动已结束”弹窗和其 OK 按钮
+            hits = find_many_on_screen(adb_path, device_serial, [("act_timeout", True), "OK"], image_folder,
+                                       confidence_threshold=0.7)
+        if "act_timeout" in hits:
+            if "OK" in hits:
                 adb_press_and_release(1246, 685, adb_path, device_serial)
-            time.sleep(act_timeout_time)
-            if if_image_on_screen(adb_path, device_serial, "X", image_folder, confidence_threshold=0.7):
-                click_press_and_release(adb_path, device_serial, "X", image_folder, confidence_threshold=0.7)
+            clock.sleep(act_timeout_time)
+            x_coords = if_image_on_screen(adb_path, device_serial, "X", image_folder, confidence_threshold=0.7)
+            if x_coords:
+                adb_press_and_release(x_coords[0], x_coords[1], adb_path, device_serial)
             if timing == "start_fight":
                 adb_press_and_release(84, 990, adb_path, device_serial)
             elif timing == "return_map":
                 pass
-            time.sleep(back_to_main_place_time)
-            if if_image_on_screen(adb_path, device_serial, "X", image_folder, confidence_threshold=0.7):
-                click_press_and_release(adb_path, device_serial, "X", image_folder, confidence_threshold=0.7)
+            clock.sleep(back_to_main_place_time)
+            x_coords = if_image_on_screen(adb_path, device_serial, "X", image_folder, confidence_threshold=0.7)
+            if x_coords:
+                adb_press_and_release(x_coords[0], x_coords[1], adb_path, device_serial)
             if not self.timezone_block(change_timezone_enabled, adb_path, device_serial):
                 return -1
             if not click_press_and_release(adb_path, device_serial, "start_game", image_folder,
-                                           confidence_threshold=0.7):
+                                           confidence_threshold=0.7, stop_event=self.stop_event):
                 return -1
-            time.sleep(enter_legend_time)
+            clock.sleep(enter_legend_time)
             roll_some_length(adb_path, device_serial, long_roll_length, long_roll_time_ms, long_roll_times)
             roll_and_find_spec_legend_activity(adb_path, device_serial, self.template_name,
                                                image_folder,
@@ -164,10 +176,15 @@ class LegendaryScriptBase(ScriptBase, ABC):
         return None
 
     def detect_legend_refresh_power(self, adb_path, device_serial, image_folder, package_name, refresh_power_enabled,
-                                    use_power_recover_enabled, change_timezone_enabled, long_roll_times):
-        time.sleep(0.5)
-        if if_image_on_screen(adb_path, device_serial, "power_limited", image_folder,
-                              confidence_threshold=0.7):
+                                    use_power_recover_enabled, change_timezone_enabled, long_roll_times, state=None):
+        """:param state: 调用方已经识别出的 ScreenState；给出时直接使用，不再等待和重新截图"""
+        if state is not None:
+            power_limited = state == STATE_POWER_LIMITED
+        else:
+            clock.sleep(0.5)
+            power_limited = if_image_on_screen(adb_path, device_serial, "power_limited", image_folder,
+                                               confidence_threshold=0.7)
+        if power_limited:
             if (not refresh_power_enabled) and (not use_power_recover_enabled):
                 recover_time_zone(adb_path, device_serial, g_original_timezone)
                 self.log("\n由于同时限制使用白魔法或首领旗回复统率力，脚本自动停止。")
@@ -178,7 +195,7 @@ class LegendaryScriptBase(ScriptBase, ABC):
             if not self.refresh_power_legend(package_name, image_folder, adb_path, device_serial,
                                              change_timezone_enabled):
                 return -1
-            time.sleep(enter_legend_time)
+            clock.sleep(enter_legend_time)
             roll_some_length(adb_path, device_serial, long_roll_length, long_roll_time_ms, long_roll_times)
             roll_and_find_spec_legend_activity(adb_path, device_serial, self.template_name, image_folder,
                                                confidence_threshold=self.find_activity_confidence)
@@ -189,7 +206,8 @@ class LegendaryScriptBase(ScriptBase, ABC):
         refresh_power(self.driver, package_name, image_folder, adb_path, device_serial, is_legend=True)
         if not self.timezone_block(change_timezone_enabled, adb_path, device_serial):
             return False
-        if not click_press_and_release(adb_path, device_serial, "start_game", image_folder, confidence_threshold=0.7):
+        if not click_press_and_release(adb_path, device_serial, "start_game", image_folder, confidence_threshold=0.7,
+                                       stop_event=self.stop_event):
             return False
         return True
 
@@ -229,14 +247,15 @@ class LegendaryScriptBase(ScriptBase, ABC):
         self.log(f"专属配置: {', '.join(specific_options_log)}")
 
         i = 0
-        time_start = datetime.now()
+        time_start = clock.now()
 
         if not self.timezone_block(change_timezone_enabled, adb_path, device_serial):
             return "STOPPED"
-        if not click_press_and_release(adb_path, device_serial, "start_game", image_folder, confidence_threshold=0.7):
+        if not click_press_and_release(adb_path, device_serial, "start_game", image_folder, confidence_threshold=0.7,
+                                       stop_event=self.stop_event):
             return "STOPPED"
 
-        time.sleep(enter_legend_time)
+        clock.sleep(enter_legend_time)
         roll_some_length(adb_path, device_serial, long_roll_length, long_roll_time_ms, long_roll_times)
         roll_and_find_spec_legend_activity(adb_path, device_serial, self.template_name, image_folder,
                                            confidence_threshold=self.find_activity_confidence)
@@ -249,48 +268,47 @@ class LegendaryScriptBase(ScriptBase, ABC):
 
             self.log("-" * 30)
             self.log(f"第 {i + 1} 轮开始...")
-            time_delta = datetime.now() - time_start
+            time_delta = clock.now() - time_start
             deltaH, rem = divmod(time_delta.seconds, 3600)
             deltaM, deltaS = divmod(rem, 60)
             self.log(f"已运行: {time_delta.days}天 {deltaH:02d}时 {deltaM:02d}分 {deltaS:02d}秒")
 
             try:
                 while not self.is_stop_requested():
-                    timeout = datetime.now() + timedelta(seconds=15)
-                    while not if_image_on_screen(adb_path, device_serial, "start_fight_map", image_folder,
-                                                 confidence_threshold=0.7):
-                        if datetime.now() > timeout:
-                            break
-                        time.sleep(0.5)
+                    if wait_for(adb_path, device_serial, "start_fight_map", image_folder, timeout=15,
+                                stop_event=self.stop_event, confidence_threshold=0.7).stopped:
+                        break
                     adb_press_and_release(1627, 765, adb_path, device_serial)
 
-                    status = self.detect_legend_act_timeout(adb_path, device_serial, image_folder,
-                                                            change_timezone_enabled, long_roll_times,
-                                                            timing="start_fight")
-                    if status == -1: return "STOPPED"
-                    if status == 1: break
+                    # 一次截图判断是否弹出了“活动已结束”或“统率力不足”，只有命中时才进入对应的处理流程
+                    clock.sleep(1.5)
+                    state = get_screen_state(adb_path, device_serial, image_folder)
+                    if state == STATE_ACT_TIMEOUT:
+                        status = self.detect_legend_act_timeout(adb_path, device_serial, image_folder,
+                                                                change_timezone_enabled, long_roll_times,
+                                                                timing="start_fight", state=state)
+                        if status == -1: return "STOPPED"
+                        if status == 1: break
 
-                    status = self.detect_legend_refresh_power(adb_path, device_serial, image_folder, package_name,
-                                                              refresh_power_enabled, use_power_recover_enabled,
-                                                              change_timezone_enabled, long_roll_times)
-                    if status == -1: return "STOPPED"
-                    if status == 1: continue
+                    if state == STATE_POWER_LIMITED:
+                        status = self.detect_legend_refresh_power(adb_path, device_serial, image_folder,
+                                                                  package_name, refresh_power_enabled,
+                                                                  use_power_recover_enabled, change_timezone_enabled,
+                                                                  long_roll_times, state=state)
+                        if status == -1: return "STOPPED"
+                        if status == 1: continue
 
                     positions_to_tap = ordered_fight_strategy(position_order)
-                    while not if_image_on_screen(adb_path, device_serial, "return_map", image_folder,
-                                                 confidence_threshold=0.7):
-                        if self.is_stop_requested():
-                            break
-                        tap_cats_in_fight(positions_to_tap, adb_path, device_serial)
+                    FightExecutor(adb_path, device_serial, image_folder, log_callback=self.log).run(
+                        positions_to_tap, self.stop_event)
 
                     self._handle_post_battle(options, adb_path, device_serial, image_folder, package_name)
 
-                    adb_press_and_release(1861, 57, adb_path, device_serial)
-                    adb_press_and_release(1861, 57, adb_path, device_serial)
-                    adb_press_and_release(1861, 57, adb_path, device_serial)
-                    time.sleep(1)
+                    InputMacro().press(1861, 57).press(1861, 57).press(1861, 57).run(adb_path, device_serial)
+                    clock.sleep(1)
 
                     i += 1
+                    self.count_round()
 
                     status = self.detect_legend_act_timeout(adb_path, device_serial, image_folder,
                                                             change_timezone_enabled, long_roll_times,
@@ -1,6 +1,7 @@
 # scripts/薄荷系列/BoHe_BLUE_script.py
 from scripts.legend_base_script import LegendaryScriptBase
-from common.utils import if_image_on_screen, adb_press_and_release, tap_cats_in_fight, ordered_fight_strategy, \
+from common.FightExecutor import FightExecutor
+from common.utils import if_image_on_screen, adb_press_and_release, ordered_fight_strategy, \
     BoHe_confidence_threshold, legend_positions_order_default
 
 
@@ -39,10 +40,7 @@ class ConsumeScript(LegendaryScriptBase):
             if enter_EXpart_enabled:
                 adb_press_and_release(729, 703, adb_path, device_serial)
                 positions_to_tap = ordered_fight_strategy(position_order)
-                while not if_image_on_screen(adb_path, device_serial, "return_map", image_folder,
-                                             confidence_threshold=0.7):
-                    if self.is_stop_requested():
-                        break
-                    tap_cats_in_fight(positions_to_tap, adb_path, device_serial)
+                FightExecutor(adb_path, device_serial, image_folder, log_callback=self.log).run(
+                    positions_to_tap, self.stop_event)
             else:
                 adb_press_and_release(1189, 712, adb_path, device_serial)